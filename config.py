@@ -45,6 +45,42 @@ class Config:
     def LLM_MODEL(self):
         return self.data.get("LLM_MODEL", "deepseek-chat")
 
+    @property
+    def LLM_MAX_CONCURRENCY(self):
+        return self.data.get("LLM_MAX_CONCURRENCY", 6)  # Completions in flight across the whole process
+
+    @property
+    def LLM_TOKENS_PER_MINUTE(self):
+        return self.data.get("LLM_TOKENS_PER_MINUTE", 0)  # Token budget per minute; 0 = unlimited
+
+    @property
+    def LLM_TIMEOUT(self):
+        return self.data.get("LLM_TIMEOUT", 90)  # Seconds per completion
+
+    @property
+    def LLM_QUEUE_TIMEOUT(self):
+        return self.data.get("LLM_QUEUE_TIMEOUT", 120)  # Max seconds to wait for a slot before giving up
+
+    @property
+    def STREAM_UPDATE_INTERVAL(self):
+        return self.data.get("STREAM_UPDATE_INTERVAL", 1.5)  # Min seconds between progressive reply edits
+
+    @property
+    def STREAM_UPDATE_MIN_CHARS(self):
+        return self.data.get("STREAM_UPDATE_MIN_CHARS", 40)  # Min new characters before an edit
+
+    @property
+    def STREAM_MAX_UPDATES(self):
+        return self.data.get("STREAM_MAX_UPDATES", 18)  # Edits per reply (Feishu caps edits per message at 20)
+
+    @property
+    def LLM_CACHE_SIZE(self):
+        return self.data.get("LLM_CACHE_SIZE", 512)  # Cached parse/match answers; 0 disables the cache
+
+    @property
+    def LLM_CACHE_TTL(self):
+        return self.data.get("LLM_CACHE_TTL", 600)  # Seconds
+
     @property
     def FEEDS(self):
         return self.data.get("FEEDS", [])
@@ -68,3 +104,103 @@ class Config:
     @property
     def LOG_BACKUP_COUNT(self):
         return self.data.get("LOG_BACKUP_COUNT", 5)
+
+    @property
+    def IMAGE_OPTIMIZE(self):
+        return self.data.get("IMAGE_OPTIMIZE", True)
+
+    @property
+    def IMAGE_MAX_WIDTH(self):
+        return self.data.get("IMAGE_MAX_WIDTH", 1280)
+
+    @property
+    def IMAGE_QUALITY(self):
+        return self.data.get("IMAGE_QUALITY", 80)
+
+    @property
+    def IMAGE_FORMAT(self):
+        return self.data.get("IMAGE_FORMAT", "JPEG")  # JPEG / WEBP / PNG
+
+    @property
+    def DOC_PUBLISH_MODE(self):
+        return self.data.get("DOC_PUBLISH_MODE", "auto")  # auto / blocks / import
+
+    @property
+    def DOC_IMPORT_THRESHOLD(self):
+        return self.data.get("DOC_IMPORT_THRESHOLD", 1000)  # Block count above which auto mode imports
+
+    @property
+    def DIGEST_APPEND_MODE(self):
+        return self.data.get("DIGEST_APPEND_MODE", False)  # Append new articles to today's digest doc
+
+    @property
+    def DOC_JOURNAL_DIR(self):
+        return self.data.get("DOC_JOURNAL_DIR", "data/doc_journal")  # Resumable write journal
+
+    @property
+    def MINUTES_CHUNK_CHARS(self):
+        return self.data.get("MINUTES_CHUNK_CHARS", 15000)  # Longer transcripts use map-reduce
+
+    @property
+    def MINUTES_MAX_CONCURRENCY(self):
+        return self.data.get("MINUTES_MAX_CONCURRENCY", 4)
+
+    @property
+    def MINUTES_COMPACT(self):
+        return self.data.get("MINUTES_COMPACT", True)  # Compact transcripts before summarizing
+
+    @property
+    def MINUTES_TIME_GRANULARITY(self):
+        return self.data.get("MINUTES_TIME_GRANULARITY", 30)  # Seconds per timestamp bucket
+
+    @property
+    def MINUTES_CACHE_PATH(self):
+        return self.data.get("MINUTES_CACHE_PATH", "data/minutes_cache.db")  # Empty to disable
+
+    @property
+    def MINUTES_CREATE_TASKS(self):
+        return self.data.get("MINUTES_CREATE_TASKS", False)  # Otherwise only when the message says "建任务"
+
+    @property
+    def TASK_INDEX_ENABLED(self):
+        return self.data.get("TASK_INDEX_ENABLED", True)  # Serve task queries from a local synced index
+
+    @property
+    def TASK_INDEX_MAX_STALENESS(self):
+        return self.data.get("TASK_INDEX_MAX_STALENESS", 30)  # Seconds
+
+    @property
+    def TASK_INDEX_FULL_SYNC(self):
+        return self.data.get("TASK_INDEX_FULL_SYNC", 600)  # Seconds between full reloads (picks up deletions)
+
+    @property
+    def TASK_MATCH_TOP_K(self):
+        return self.data.get("TASK_MATCH_TOP_K", 10)  # Candidates sent to the LLM when no clear local match
+
+    @property
+    def REMINDER_ENABLED(self):
+        return self.data.get("REMINDER_ENABLED", False)  # DM owners as tasks come due (needs the task index)
+
+    @property
+    def REMINDER_LEAD_MINUTES(self):
+        return self.data.get("REMINDER_LEAD_MINUTES", 30)  # Remind this long before 截止日期
+
+    @property
+    def REMINDER_STATE_PATH(self):
+        return self.data.get("REMINDER_STATE_PATH", "data/reminders_sent.json")  # Sent reminders, survives restarts
+
+    @property
+    def TASK_SNAPSHOT_PATH(self):
+        return self.data.get("TASK_SNAPSHOT_PATH", "data/task_snapshot.db")  # Empty to disable 周报/统计
+
+    @property
+    def TIMEZONE(self):
+        return self.data.get("TIMEZONE", "")  # e.g. "Asia/Shanghai" for due-date parsing; empty = system local
+
+    @property
+    def TASK_GUID_FIELD(self):
+        return self.data.get("TASK_GUID_FIELD", "")  # Text field for the native task guid, e.g. "原生任务ID"; empty to disable
+
+    @property
+    def TASK_MODIFIED_FIELD(self):
+        return self.data.get("TASK_MODIFIED_FIELD", "最后更新时间")  # Modified-time field for incremental pulls
@@ -1,3 +1,5 @@
+import sys
+import os
 import json
 import logging
 import re
@@ -5,7 +7,11 @@ import requests
 import lark_oapi as lark
 from lark_oapi.ws import Client
 from lark_oapi.api.im.v1.model import P2ImMessageReceiveV1, ReplyMessageRequest, ReplyMessageRequestBody
-from openai import OpenAI
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_gateway import LLMGateway
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -32,7 +38,7 @@ LLM_MODEL = config.get("LLM_MODEL", "deepseek-chat")
 # 初始化客户端
 ws_client = None
 client = lark.Client.builder().app_id(APP_ID).app_secret(APP_SECRET).log_level(lark.LogLevel.INFO).build()
-llm_client = OpenAI(api_key=LLM_API_KEY, base_url=LLM_BASE_URL)
+llm = LLMGateway(LLM_API_KEY, LLM_BASE_URL, LLM_MODEL)
 
 # --- 工具函数 ---
 
@@ -104,7 +110,8 @@ def summarize_content(text):
     content_input = text[:15000] 
     
     try:
-        resp = llm_client.chat.completions.create(
+        resp = llm.complete(
+            label="Minutes",
             model=LLM_MODEL,
             messages=[
                 {"role": "system", "content": prompt},
@@ -1,17 +1,32 @@
 import json
+import re
 import logging
 import threading
 from datetime import datetime
 from lark_oapi.api.im.v1.model import P2ImMessageReceiveV1
+from utils.date_parser import DateParser, DueDate
+from task_parser import PRIORITY_LABELS, guess_quadrant, parse_task_lines, parse_task_table, read_table
 
 class MessageHandler:
-    def __init__(self, config, im_service, task_service, llm_service, minutes_handler, rss_service):
+    # Explicit create commands handled without the LLM: prefix -> create native task
+    QUICK_CREATE_PREFIXES = {
+        "建个群任务": True, "建个任务": True, "提醒我": True, "remind me to": True, "remind me": True,
+        "新建任务": False, "创建任务": False, "添加任务": False, "加个任务": False, "建任务": False, "todo": False,
+    }
+    # First line of a pasted task list ("批量建任务\n- @张三 修复Bug 高 明天\n- ...")
+    BULK_IMPORT_PREFIXES = ["批量建任务", "批量导入", "导入任务", "import tasks"]
+    BOT_NAMES = ["Dobby", "机器人", "Feishu Bot"]
+    QUESTION_RE = re.compile(r"[?？]|哪些|什么|怎么|吗$|多少|\b(?:what|how|which)\b", re.IGNORECASE)
+
+    def __init__(self, config, im_service, task_service, llm_service, minutes_handler, rss_service, doc_service=None):
         self.config = config
         self.im = im_service
         self.task = task_service
         self.llm = llm_service
         self.minutes = minutes_handler
         self.rss = rss_service
+        self.doc = doc_service  # For weekly report docs
+        self.dates = DateParser(config.TIMEZONE if config else None)
         self.processed_msg_ids = set()
         self.lock = threading.Lock()
 
@@ -45,6 +60,16 @@ class MessageHandler:
             mentions = getattr(msg, "mentions", []) or []
         except: return
 
+        # Attached CSV / XLSX (direct chat): bulk task import
+        if msg.message_type == "file":
+            if msg.chat_type != "group":
+                try:
+                    self._import_file(msg_id, content, msg.chat_id, sender_id)
+                except Exception as e:
+                    logging.error(f"Error importing file from {msg_id}: {e}")
+                    self.im.reply(msg_id, "❌ 导入失败")
+            return
+
         # 5. Group Chat Filter
         if msg.chat_type == "group":
             logging.info(f"Received group message in chat_id: {msg.chat_id}") 
@@ -66,80 +91,243 @@ class MessageHandler:
         try:
             # A. Help
             if not clean_text or clean_text.lower() in ["help", "帮助", "/start", "怎么用"]:
-                self.im.reply(msg_id, "👋 我是 Dobby。\n\n1. **项目管理**: 帮我建任务、查任务、完成任务。\n2. **会议纪要**: 发送妙记链接，我自动总结。\n3. **RSS早报**: 发送 'RSS' 或 '早报' 获取最新资讯。")
+                self.im.reply(msg_id, "👋 我是 Dobby。\n\n1. **项目管理**: 帮我建任务、查任务、完成任务。\n2. **会议纪要**: 发送妙记链接，我自动总结。\n3. **RSS早报**: 发送 'RSS' 或 '早报' 获取最新资讯。\n4. **任务统计**: 发送 '统计' 或 '周报'。\n5. **批量导入**: 发送 '批量建任务' + 每行一个任务，或私聊发送 CSV/XLSX。")
                 return
 
             # B. RSS Digest
             if clean_text.lower() in ["rss", "早报", "新闻", "digest"]:
-                self.im.reply(msg_id, "📰 正在抓取并生成 RSS 早报，请稍候...")
-                digest = self.rss.fetch_and_summarize()
-                self.im.reply(msg_id, digest)
+                reply_id = self.im.reply(msg_id, "📰 正在抓取并生成 RSS 早报，请稍候...")
+                if not reply_id:
+                    self.im.reply(msg_id, self.rss.fetch_and_summarize())
+                    return
+                updater = self.im.progressive_reply(reply_id)
+                try:
+                    digest = self.rss.fetch_and_summarize(on_progress=updater.push)
+                except Exception as e:
+                    digest = f"❌ 早报生成失败: {e}"
+                updater.finish(digest)
+                return
+
+            # C. Task statistics / weekly report (from the local snapshot)
+            if clean_text.lower() in ["统计", "任务统计", "stats"]:
+                self.im.reply(msg_id, self.task.handle_stats() + self._llm_cache_line())
+                return
+
+            if clean_text.lower() in ["周报", "任务周报", "weekly report"]:
+                self.im.reply(msg_id, self._weekly_report(sender_id))
+                return
+
+            # D. Bulk import of a pasted task list
+            first_line = clean_text.split("\n", 1)[0].strip().lower()
+            if any(first_line.startswith(p) for p in self.BULK_IMPORT_PREFIXES):
+                self.im.reply(msg_id, self._import_lines(text, mentions, msg.chat_id, sender_id))
                 return
 
-            # C. Minutes (Delegate to MinutesHandler)
-            if self.minutes.handle(msg_id, text, sender_id):
+            # E. Minutes (Delegate to MinutesHandler)
+            if self.minutes.handle(msg_id, text, sender_id, chat_id=msg.chat_id, mentions=mentions):
                 return
 
-            # D. Task Management (Process Intent)
+            # F. Task Management (Process Intent)
             response = self._process_task_command(clean_text, mentions, sender_id, sender_name)
             if response:
                 self.im.reply(msg_id, response)
         except Exception as e:
             logging.error(f"Error processing message {msg_id}: {e}")
 
+    def _is_bot(self, mention, bot_id):
+        return mention.name in self.BOT_NAMES or (bot_id and mention.id.open_id == bot_id)
+
+    def _owner_lookup(self, mentions, chat_id):
+        """{"@_user_1" / name: open_id} from the message mentions plus the chat's members."""
+        lookup = self.im.get_chat_members(chat_id) if chat_id else {}
+        bot_id = self.task.get_bot_id()
+        for m in mentions:
+            if self._is_bot(m, bot_id): continue
+            lookup[m.key] = m.id.open_id
+            lookup[m.name] = m.id.open_id
+        return lookup
+
+    def _import_rows(self, rows, skipped, sender_id):
+        if not rows: return "⚠️ 没有识别到任务"
+        unknown = sorted({name for r in rows for name in r["unknown_owners"]})
+        task_rows = [{
+            "task_name": r["task_name"],
+            "quadrant": r["quadrant"],
+            "due_ts": r["due_ts"],
+            "owner_ids": r["owners"] or [sender_id],
+            "priority": PRIORITY_LABELS.get(r["priority"]),
+        } for r in rows]
+        logging.info(f"📥 Importing {len(task_rows)} tasks")
+        reply = self.task.handle_import(task_rows, skipped)
+        if unknown:
+            reply += f"\n⚠️ 未找到负责人 (没有其他负责人的任务已指派给你): {'、'.join(unknown[:20])}"
+        return reply
+
+    def _import_lines(self, text, mentions, chat_id, sender_id):
+        """Pasted list: one task per line after the command line; mention keys stay in place so each line keeps its owners."""
+        bot_id = self.task.get_bot_id()
+        for m in mentions:
+            if self._is_bot(m, bot_id): text = text.replace(m.key, "")
+        body = text.strip().split("\n", 1)[1] if "\n" in text.strip() else ""
+        lines = [l for l in body.splitlines() if l.strip()]
+        rows = parse_task_lines("\n".join(lines), self._owner_lookup(mentions, chat_id), self.dates.now())
+        return self._import_rows(rows, len(lines) - len(rows), sender_id)
+
+    def _import_file(self, msg_id, content, chat_id, sender_id):
+        file_name = content.get("file_name", "")
+        if not file_name.lower().endswith((".csv", ".xlsx")): return
+        self.im.reply(msg_id, f"📥 正在导入 {file_name} ...")
+        data = self.im.download_file(msg_id, content.get("file_key"))
+        if data is None:
+            self.im.reply(msg_id, "❌ 文件下载失败")
+            return
+        try:
+            table = read_table(data, file_name)
+        except ValueError as e:
+            self.im.reply(msg_id, f"❌ {e}")
+            return
+        rows = parse_task_table(table, self._owner_lookup([], chat_id), self.dates.now())
+        self.im.reply(msg_id, self._import_rows(rows, 0, sender_id))
+
+    def _llm_cache_line(self):
+        lines = ""
+        cache = getattr(self.llm, "cache", None)
+        if cache:
+            s = cache.stats()
+            lines += f"\n\n🧠 LLM 缓存: 命中 {s['hits']}/{s['hits'] + s['misses']} ({s['hit_rate']:.0%}), 条目 {s['size']}, 淘汰 {s['evictions']}"
+        gateway = getattr(self.llm, "gateway", None)
+        if gateway:
+            g = gateway.stats()
+            lines += (f"\n🚦 LLM 调用: {g['calls']} 次, 进行中 {g['in_flight']}, 排队 {g['queued']} (峰值 {g['max_queued']}), "
+                      f"平均等待 {g['avg_wait']}s, 拒绝 {g['rejected']}, 失败 {g['errors']}")
+        return lines
+
+    def _weekly_report(self, sender_id):
+        markdown = self.task.weekly_report_markdown()
+        if not markdown: return "⚠️ 未启用任务统计"
+        if not self.doc: return markdown
+
+        title = f"任务周报 - {datetime.now().strftime('%Y-%m-%d')}"
+        doc_id = self.doc.publish_markdown(title, markdown)
+        if not doc_id: return "❌ 周报文档创建失败"
+        self.doc.transfer_ownership(doc_id, sender_id)
+        return f"✅ 周报已生成: [{title}](https://feishu.cn/docx/{doc_id})"
+
+    def _resolve_owners(self, names, mentions, sender_id):
+        bot_id = self.task.get_bot_id()
+        owners = []
+        mention_map = {m.name: m.id.open_id for m in mentions if m.name not in self.BOT_NAMES}
+        
+        for name in names or []:
+            if name in mention_map:
+                owners.append(mention_map[name])
+        
+        # Fallback owner logic
+        if not owners: owners = [sender_id]
+        if bot_id and bot_id in owners:
+            owners.remove(bot_id)
+        if not owners: owners = [sender_id]
+        return owners
+
+    def _parse_due(self, due_date):
+        if not due_date: return None
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+            try:
+                return self.dates.to_millis(DueDate(datetime.strptime(due_date, fmt), True, []))
+            except ValueError: pass
+        # Free text from the LLM ("明天", "next friday")
+        due = self.dates.parse(due_date)
+        return self.dates.to_millis(due) if due else None
+
+    def _create_due(self, params):
+        """The LLM's due date; if it gave none, a date left inside the create's own task name."""
+        due_ts = self._parse_due(params.get("due_date"))
+        if due_ts: return due_ts
+        due, _ = self.dates.extract(params.get("task_name") or "", strict=True)
+        return self.dates.to_millis(due) if due else None
+
+    def _quick_create(self, text, mentions, sender_id):
+        """
+        Explicit single-line create commands ("建任务：明天下午三点 评审方案"): parsed locally, no LLM.
+        Anything ambiguous (no separator after the prefix, a question, a date glued to the
+        task name) returns None and goes to the LLM instead.
+        """
+        stripped = text.strip()
+        if "\n" in stripped: return None
+        for prefix, native in self.QUICK_CREATE_PREFIXES.items():
+            m = re.match(re.escape(prefix) + r"(?:\s*[:：,，]\s*|\s+)(?P<body>.+)$", stripped, re.IGNORECASE)
+            if m:
+                body = m.group("body").strip()
+                break
+        else:
+            return None
+        if self.QUESTION_RE.search(body): return None
+
+        due, task_name = self.dates.extract(body, strict=True)
+        if not due and self.dates.parse(body):
+            return None  # A date the strict pass rejected: let the LLM decide
+        if len(task_name) < 2: return None
+        names = [m.name for m in mentions]
+        owners = self._resolve_owners(names, mentions, sender_id)
+        logging.info(f"⚡ Quick create (no LLM): {task_name} due={due.when if due else None}")
+        return self.task.handle_create(
+            task_name,
+            guess_quadrant(task_name),
+            self.dates.to_millis(due) if due else None,
+            owners,
+            native
+        )
+
     def _process_task_command(self, text, mentions, sender_id, sender_name):
+        # 0. Explicit create commands: no LLM needed
+        quick = self._quick_create(text, mentions, sender_id)
+        if quick:
+            return quick
+
         # 1. LLM Parse
         res = self.llm.parse(text, sender_name)
+        actions = [a for a in (res or {}).get("actions") or [] if isinstance(a, dict)]
         
-        # 2. Logic Dispatch
-        if res:
-            action = res.get("action")
-            p = res.get("params", {})
-            
-            if action == "query":
-                return self.task.handle_query(sender_id)
-            
-            if action == "update_status":
-                return self.task.handle_update_status(
+        # 2. Logic Dispatch (several actions of the same kind become one batch call)
+        if actions:
+            responses = []
+            creates = [a.get("params") or {} for a in actions if a.get("action") == "create"]
+            updates = [a.get("params") or {} for a in actions if a.get("action") == "update_status"]
+
+            if any(a.get("action") == "query" for a in actions):
+                responses.append(self.task.handle_query(sender_id))
+
+            if len(updates) == 1:
+                p = updates[0]
+                responses.append(self.task.handle_update_status(
                     open_id=sender_id, 
                     keyword=p.get("keyword"), 
-                    target_status=p.get("target_status", "已完成")
-                )
-            
-            if action == "create":
-                # Resolve Owners
-                bot_id = self.task.get_bot_id()
-                owners = []
-                mention_map = {m.name: m.id.open_id for m in mentions if m.name not in ["Dobby", "机器人", "Feishu Bot"]}
-                
-                for name in p.get("owners", []):
-                    if name in mention_map:
-                        owners.append(mention_map[name])
-                
-                # Fallback owner logic
-                if not owners: owners = [sender_id]
-                if bot_id and bot_id in owners:
-                    owners.remove(bot_id)
-                if not owners: owners = [sender_id]
-                
-                # Resolve Date
-                due = None
-                if p.get("due_date"):
-                    try:
-                        due = int(datetime.strptime(p.get("due_date"), "%Y-%m-%d %H:%M:%S").timestamp()*1000)
-                    except:
-                        try:
-                            due = int(datetime.strptime(p.get("due_date"), "%Y-%m-%d").timestamp()*1000)
-                        except: pass
-                
-                return self.task.handle_create(
-                    p.get("task_name"), 
-                    p.get("quadrant"), 
-                    due, 
-                    owners, 
-                    p.get("create_native_task", False)
-                )
+                    target_status=p.get("target_status") or "已完成"
+                ))
+            elif updates:
+                # Group by target status: one batch_update each
+                by_status = {}
+                for p in updates:
+                    by_status.setdefault(p.get("target_status") or "已完成", []).append(p.get("keyword"))
+                for status, keywords in by_status.items():
+                    responses.append(self.task.handle_batch_update_status(sender_id, keywords, status))
+
+            rows = [{
+                "task_name": p.get("task_name"),
+                "quadrant": p.get("quadrant"),
+                "due_ts": self._create_due(p),
+                "owner_ids": self._resolve_owners(p.get("owners"), mentions, sender_id),
+                "create_native": p.get("create_native_task", False)
+            } for p in creates if p.get("task_name")]
+            if len(rows) == 1:
+                r = rows[0]
+                responses.append(self.task.handle_create(r["task_name"], r["quadrant"], r["due_ts"], r["owner_ids"], r["create_native"]))
+            elif rows:
+                responses.append(self.task.handle_batch_create(rows))
+
+            if responses:
+                return "\n\n".join(responses)
         
         # 3. Fallback Regex/Default Logic
         # If LLM fails or returns unknown, treat as a simple task creation
-        return self.task.handle_create(text, "重要不紧急", None, [sender_id], False)
\ No newline at end of file
+        return self.task.handle_create(text, "重要不紧急", None, [sender_id], False)
@@ -2,12 +2,64 @@ import logging
 import datetime
 
 class MinutesHandler:
-    def __init__(self, minutes_service, doc_service, im_service):
+    REGENERATE_KEYWORDS = ["regenerate", "重新生成", "重新总结", "刷新"]
+    CREATE_TASK_KEYWORDS = ["建任务", "创建任务", "create tasks"]
+
+    def __init__(self, minutes_service, doc_service, im_service, cache=None, task_service=None, create_tasks=False):
         self.mm = minutes_service
         self.dm = doc_service
         self.im = im_service
+        self.cache = cache  # MinutesCache (optional)
+        self.task = task_service  # TaskService (optional), for action items
+        self.create_tasks = create_tasks  # Always create tasks, without the keyword
+
+    def _resolve_owner(self, name, name_map):
+        """Map an owner name from the summary to an open_id (exact, then partial match)."""
+        if not name:
+            return None
+        if name in name_map:
+            return name_map[name]
+        for member, open_id in name_map.items():
+            if name in member or member in name: return open_id
+        return None
+
+    def _create_action_items(self, action_items, sender_id, chat_id=None, mentions=None):
+        """Batch-create Bitable tasks for the summary's action items. Returns a status line."""
+        name_map = self.im.get_chat_members(chat_id) if chat_id else {}
+        bot_id = self.task.get_bot_id()
+        for m in mentions or []:
+            if m.id and m.id.open_id and m.id.open_id != bot_id:
+                name_map[m.name] = m.id.open_id
+
+        rows = []
+        for item in action_items:
+            if not isinstance(item, dict) or not item.get("task"): continue
+            task_name = item["task"]
+            owner = item.get("owner")
+            owner_id = self._resolve_owner(owner, name_map)
+            if not owner_id:
+                # Unknown assignee: keep the name in the task, assign to the requester
+                owner_id = sender_id
+                if owner: task_name = f"{task_name}（{owner}）"
+
+            due = None
+            if item.get("due_date"):
+                try:
+                    due = int(datetime.datetime.strptime(item["due_date"], "%Y-%m-%d").timestamp() * 1000)
+                except (TypeError, ValueError): pass
 
-    def handle(self, msg_id, text, sender_id):
+            rows.append({"task_name": task_name, "quadrant": item.get("quadrant"), "due_ts": due, "owner_ids": [owner_id]})
+
+        if not rows:
+            return "\nℹ️ 纪要中没有识别到待办事项。"
+        record_ids = self.task.batch_create(rows)
+        created = sum(1 for r in record_ids if r)
+        logging.info(f"🗂️ Created {created}/{len(rows)} tasks from minutes action items")
+        if created == len(rows):
+            return f"\n✅ 已从待办事项创建 {created} 个任务。"
+        return f"\n⚠️ 待办事项创建任务 {created}/{len(rows)} 成功。"
+
+    def handle(self, msg_id, text, sender_id, chat_id=None, mentions=None):
         """Handle minutes processing workflow"""
         
         # 1. Check if it's a minutes link
@@ -15,19 +67,51 @@ class MinutesHandler:
         if not minutes_token:
             return False
 
+        regenerate = any(k in text.lower() for k in self.REGENERATE_KEYWORDS)
+        tasks_requested = any(k in text.lower() for k in self.CREATE_TASK_KEYWORDS)
+        create_tasks = self.task is not None and (self.create_tasks or tasks_requested)
+
+        # Repost of an already processed link: answer with the existing doc right away
+        if self.cache and not regenerate:
+            cached = self.cache.latest(minutes_token)
+            if cached and cached.get("doc_id"):
+                doc_url = f"https://feishu.cn/docx/{cached['doc_id']}"
+                reply = f"✅ 该妙记已生成过云文档: [{cached.get('doc_title') or '会议纪要'}]({doc_url})\n💡 如需重新总结，请附上“重新生成”。"
+                # Explicitly asked for tasks: create them from the cached summary
+                # (with CREATE_TASKS on they were already created the first time)
+                if self.task is not None and tasks_requested and isinstance(cached.get("summary"), dict):
+                    try:
+                        reply += self._create_action_items(
+                            cached["summary"].get("action_items") or [], sender_id, chat_id, mentions)
+                    except Exception as e:
+                        reply += f"\n❌ 创建任务异常: {e}"
+                self.im.reply(msg_id, reply)
+                return True
+
         # 2. Send initial response
         initial_reply_id = self.im.reply(msg_id, "🎧 收到会议录音，正在处理中...")
+        # Stream the summary into the reply while it is generated
+        updater = self.im.progressive_reply(initial_reply_id) if initial_reply_id else None
+        on_progress = (lambda text: updater.push(f"🎧 正在生成会议纪要...\n\n{text}")) if updater else None
         
         final_response_text = ""
         
         try:
-            # 3. Fetch subtitle
-            subtitle = self.mm.fetch_subtitle(minutes_token)
+            # 3. Fetch subtitle: pages stream straight into compaction; a partial fetch yields nothing
+            transcript_hash, subtitle = self.mm.fetch_compacted(minutes_token)
             if not subtitle:
                 final_response_text = "❌ 无法读取妙记。请确认已授予机器人权限并分享链接。"
             else:
-                # 4. Summarize
-                summary_result = self.mm.summarize(subtitle)
+                # 4. Summarize (reuse a cached summary of the same transcript unless regenerating)
+                cached = self.cache.get(minutes_token, transcript_hash) if self.cache else None
+                if cached and cached.get("summary") and not regenerate:
+                    logging.info(f"♻️ Reusing cached summary for minutes {minutes_token}")
+                    summary_result = cached["summary"]
+                else:
+                    summary_result = self.mm.summarize(subtitle, compact=False, on_progress=on_progress)
+                    # Don't cache failed summaries
+                    if self.cache and isinstance(summary_result, dict) and summary_result.get("title") != "错误":
+                        self.cache.put(minutes_token, subtitle, summary=summary_result, transcript_hash=transcript_hash)
                 
                 if isinstance(summary_result, dict):
                     summary_content = summary_result.get("content", "")
@@ -43,10 +127,13 @@ class MinutesHandler:
                     today_str = datetime.datetime.now().strftime("%Y-%m-%d")
                     doc_title = f"{summary_title} - {today_str}"
                     
-                    doc_id = self.dm.create_document(doc_title)
+                    # Block writes or one-shot import, depending on size
+                    doc_id = self.dm.publish_markdown(doc_title, summary_content)
                     if doc_id:
-                        self.dm.add_content(doc_id, summary_content)
                         doc_url = f"https://feishu.cn/docx/{doc_id}"
+                        if self.cache:
+                            self.cache.put(minutes_token, subtitle, summary=summary_result, doc_id=doc_id, doc_title=doc_title,
+                                           transcript_hash=transcript_hash)
                         
                         final_response_text = f"✅ 会议纪要已生成云文档: [{doc_title}]({doc_url})"
                         
@@ -55,6 +142,14 @@ class MinutesHandler:
                             final_response_text += "\n✅ 所有权已转移给你。"
                         else:
                             final_response_text += "\n⚠️ 所有权转移失败，请检查机器人是否具备足够权限（如：云文档所有者转移）。"
+
+                        # 7. Action items -> Bitable tasks
+                        if create_tasks and isinstance(summary_result, dict):
+                            try:
+                                final_response_text += self._create_action_items(
+                                    summary_result.get("action_items") or [], sender_id, chat_id, mentions)
+                            except Exception as e:
+                                final_response_text += f"\n❌ 创建任务异常: {e}"
                     else:
                         final_response_text += "\n\n❌ 文档创建失败，请检查权限。"
                 except Exception as e:
@@ -63,9 +158,9 @@ class MinutesHandler:
         except Exception as e:
             final_response_text = f"❌ 处理妙记时发生异常: {e}"
         
-        # 7. Update message
-        if initial_reply_id:
-            self.im.update(initial_reply_id, final_response_text)
+        # 8. Update message
+        if updater:
+            updater.finish(final_response_text)
         else:
             self.im.reply(msg_id, final_response_text)
             
@@ -9,7 +9,13 @@ from services.minutes_service import MinutesService
 from services.doc_service_v2 import DocServiceV2 as DocService
 from services.im_service import IMService
 from services.llm_service import LLMParser
+from services.llm_cache import LLMCache
+from services.llm_gateway import LLMGateway
 from services.rss_service_v2 import RSSServiceV2 as RSSService
+from services.minutes_cache import MinutesCache
+from services.task_index import TaskIndex
+from services.reminder_scheduler import ReminderScheduler
+from services.task_snapshot import TaskSnapshot
 from handlers.minutes_handler import MinutesHandler
 from handlers.message_handler import MessageHandler
 
@@ -32,39 +38,95 @@ def main():
         .log_level(lark.LogLevel.INFO) \
         .build()
 
+    # One LLM client for the whole process: pooled connections, global concurrency / token limits
+    llm_gateway = LLMGateway(
+        config.LLM_API_KEY,
+        config.LLM_BASE_URL,
+        config.LLM_MODEL,
+        max_concurrency=config.LLM_MAX_CONCURRENCY,
+        tokens_per_minute=config.LLM_TOKENS_PER_MINUTE,
+        timeout=config.LLM_TIMEOUT,
+        queue_timeout=config.LLM_QUEUE_TIMEOUT
+    ) if config.LLM_API_KEY else None
+
     # Initialize LLMParser
     llm_service = LLMParser(
         api_key=config.LLM_API_KEY,
         base_url=config.LLM_BASE_URL,
-        model=config.LLM_MODEL
+        model=config.LLM_MODEL,
+        cache=LLMCache(config.LLM_CACHE_SIZE, config.LLM_CACHE_TTL),
+        gateway=llm_gateway
     )
 
     # 4. Init Services
     # Core Services
-    im_service = IMService(client)
-    doc_service = DocService(config.APP_ID, config.APP_SECRET)
+    im_service = IMService(
+        client,
+        update_interval=config.STREAM_UPDATE_INTERVAL,
+        update_min_chars=config.STREAM_UPDATE_MIN_CHARS,
+        max_updates=config.STREAM_MAX_UPDATES
+    )
+    doc_service = DocService(
+        config.APP_ID,
+        config.APP_SECRET,
+        publish_mode=config.DOC_PUBLISH_MODE,
+        import_threshold=config.DOC_IMPORT_THRESHOLD,
+        journal_dir=config.DOC_JOURNAL_DIR
+    )
     
     # Feature Services
     # TaskService now requires llm_service for semantic matching
     task_service = TaskService(client, config, llm_service=llm_service) 
+    # Local SQLite snapshot for 周报/统计
+    if config.TASK_SNAPSHOT_PATH:
+        task_service.snapshot = TaskSnapshot(config.TASK_SNAPSHOT_PATH)
+    if config.TASK_INDEX_ENABLED:
+        task_service.index = TaskIndex(
+            task_service,
+            max_staleness=config.TASK_INDEX_MAX_STALENESS,
+            full_sync_interval=config.TASK_INDEX_FULL_SYNC,
+            modified_field=config.TASK_MODIFIED_FIELD
+        )
+        if task_service.snapshot:
+            task_service.index.listeners.append(task_service.snapshot.on_task_changed)
+        task_service.index.start()
+
+        # Due-date reminders, fed by index changes (no table polling of its own)
+        if config.REMINDER_ENABLED:
+            reminders = ReminderScheduler(im_service, lead_minutes=config.REMINDER_LEAD_MINUTES,
+                                          state_path=config.REMINDER_STATE_PATH, timezone=config.TIMEZONE)
+            task_service.index.listeners.append(reminders.on_task_changed)
+            reminders.start(list(task_service.index.records.values()))
     
     # RSS Service
     rss_service = RSSService(config, llm_service, doc_service)
     
+    # Minutes cache: transcripts, summaries, docs and per-chunk notes
+    minutes_cache = MinutesCache(config.MINUTES_CACHE_PATH) if config.MINUTES_CACHE_PATH else None
+    
     # Minutes Service (Previously missing initialization)
     minutes_service = MinutesService(
         app_id=config.APP_ID,
         app_secret=config.APP_SECRET,
         llm_key=config.LLM_API_KEY,
         llm_base=config.LLM_BASE_URL,
-        llm_model=config.LLM_MODEL
+        llm_model=config.LLM_MODEL,
+        chunk_chars=config.MINUTES_CHUNK_CHARS,
+        max_workers=config.MINUTES_MAX_CONCURRENCY,
+        compact=config.MINUTES_COMPACT,
+        time_granularity=config.MINUTES_TIME_GRANULARITY,
+        chunk_cache=minutes_cache,
+        gateway=llm_gateway
     )
 
     # 5. Init Handlers
     # MinutesHandler requires specific services, not client/config
-    minutes_handler = MinutesHandler(minutes_service, doc_service, im_service)
+    minutes_handler = MinutesHandler(
+        minutes_service, doc_service, im_service, cache=minutes_cache,
+        task_service=task_service, create_tasks=config.MINUTES_CREATE_TASKS
+    )
     
-    message_handler = MessageHandler(config, im_service, task_service, llm_service, minutes_handler, rss_service)
+    message_handler = MessageHandler(config, im_service, task_service, llm_service, minutes_handler, rss_service, doc_service=doc_service)
 
     # 5. Register Event Callback
     event_handler = lark.EventDispatcherHandler.builder("", "") \
@@ -0,0 +1,70 @@
+import sys
+import os
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.markdown_compiler import MarkdownCompiler
+from services.doc_service import DocService
+
+SECTION = """## ⏱️ 时间线回顾 {i}
+**00:{i:02d} - 05:30** 开场介绍及背景同步，讨论了 *首页性能* 与 `login_api` 的 [监控面板](https://example.com/dash/{i})。
+后续由 **张三** 跟进。
+
+- 核心议题 {i}
+  - 细节 A：接口 P99 从 **800ms** 降到 ~~1200ms~~ 300ms
+  - 细节 B：需要补充 `trace_id`
+    - 子细节：排查日志
+- [ ] 待办：张三 本周五前提交方案
+- [x] 已完成：李四 修复登录 bug
+1. 决策一
+2. 决策二
+
+> 引用：这次会议的关键结论是先灰度再全量。
+> 第二行引用
+
+| 负责人 | 事项 | 截止 |
+|---|---|---|
+| 张三 | 方案 | 周五 |
+| 李四 | 回归 | 周一 |
+
+```python
+def handler(event):
+    return event
+```
+
+---
+"""
+
+
+def build_document(sections):
+    return "".join(SECTION.format(i=i % 60) for i in range(sections))
+
+
+def count_blocks(nodes):
+    return sum(1 + count_blocks(n.get("children", [])) for n in nodes)
+
+
+def bench(name, fn, text, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        nodes = fn(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    size_mb = len(text.encode("utf-8")) / 1024 / 1024
+    print(f"{name:<28} {best * 1000:8.1f} ms  {size_mb / best:7.2f} MB/s  "
+          f"{len(nodes):6d} top-level  {count_blocks(nodes):6d} blocks")
+
+
+if __name__ == "__main__":
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    text = build_document(sections)
+    print(f"📄 Synthetic minutes: {sections} sections, {len(text.splitlines())} lines, "
+          f"{len(text.encode('utf-8')) / 1024:.0f} KB")
+
+    legacy = DocService("", "")
+    bench("legacy parse_markdown_to_blocks", legacy.parse_markdown_to_blocks, text, rounds)
+    bench("MarkdownCompiler (streaming)", lambda t: list(MarkdownCompiler().compile(t)), text, rounds)
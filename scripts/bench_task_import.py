@@ -0,0 +1,74 @@
+import sys
+import os
+import csv
+import io
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_parser import parse_task_lines, parse_task_table, read_table
+
+NAMES = ["张三", "李四", "王五", "赵六"]
+LINES = [
+    "- @{owner} 修复登录Bug 高 明天下午三点",
+    "{i}. @{owner} 写 Q3 规划方案 下周五前",
+    "* 给客户发邮件确认需求 中 后天",
+    "- @{owner} @{owner2} 线上报错排查 马上",
+    "{i}、看看这篇性能优化文章 低",
+    "- @{owner} review onboarding doc next monday 10am",
+    "- 整理会议纪要 2025-12-31",
+    "- @{owner} 月底前 提交报销",
+]
+ROWS = [
+    ["修复登录Bug", "{owner}", "高", "2025-12-31", ""],
+    ["写 Q3 规划方案", "{owner}、{owner2}", "中", "下周五", "重要不紧急"],
+    ["给客户发邮件", "{owner}", "", "明天下午3点", ""],
+    ["看看性能优化文章", "", "低", "", ""],
+]
+
+
+def build_text(n):
+    return "\n".join(LINES[i % len(LINES)].format(i=i + 1, owner=NAMES[i % 4], owner2=NAMES[(i + 1) % 4]) for i in range(n))
+
+
+def build_csv(n):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["任务", "负责人", "优先级", "截止日期", "四象限"])
+    for i in range(n):
+        writer.writerow([c.format(owner=NAMES[i % 4], owner2=NAMES[(i + 1) % 4]) for c in ROWS[i % len(ROWS)]])
+    return buf.getvalue().encode("utf-8")
+
+
+def bench(name, fn, n, rounds):
+    best, rows = None, []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        rows = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    with_due = sum(1 for r in rows if r["due_ts"])
+    with_owner = sum(1 for r in rows if r["owners"])
+    print(f"{name:<20} {n:6d} rows  {best * 1000:8.1f} ms  {n / best:9.0f} rows/s  "
+          f"due {with_due:5d}  owners {with_owner:5d}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = 5
+    lookup = {name: f"ou_{i}" for i, name in enumerate(NAMES)}
+
+    text = build_text(n)
+    data = build_csv(n)
+    bench("pasted list", lambda: parse_task_lines(text, lookup), n, rounds)
+    bench("csv (read + parse)", lambda: parse_task_table(read_table(data, "tasks.csv"), lookup), n, rounds)
+
+    rows = parse_task_lines(text, lookup)
+    chunks = (len(rows) + 499) // 500
+    print(f"\n{len(rows)} rows -> {chunks} Bitable batch_create call(s) of <= 500 records")
+    print("sample:", rows[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import sys
+import os
+import time
+from datetime import datetime
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.date_parser import DateParser
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "date_parser_cases.tsv")
+
+
+def load_fixtures(path):
+    now, sections, section = None, {"day": [], "time": [], "full": [], "none": [], "strict": []}, None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            if line.startswith("NOW\t"):
+                now = datetime.strptime(line.split("\t")[1], "%Y-%m-%d %H:%M")
+            elif line.startswith("[") and line.endswith("]"):
+                section = line[1:-1]
+            else:
+                sections[section].append(line.split("\t"))
+    return now, sections
+
+
+def fmt(due):
+    if not due: return "-"
+    return due.when.strftime("%Y-%m-%d %H:%M") if due.has_time else due.when.strftime("%Y-%m-%d")
+
+
+def build_cases(sections):
+    """(text, expected, expected_remaining or None, strict)"""
+    cases = []
+    for _, text, date in sections["day"]:
+        cases.append((text, date, "", False))
+    # Times are only checked combined with a day
+    for day_lang, day_text, date in sections["day"]:
+        for time_lang, time_text, clock in sections["time"]:
+            if day_lang != time_lang: continue
+            sep = " " if day_lang == "en" or (day_text[-1].isdigit() and time_text[0].isdigit()) else ""
+            cases.append((f"{day_text}{sep}{time_text}", f"{date} {clock}", "", False))
+    for text, expected, remaining in sections["full"]:
+        cases.append((text, expected, remaining, False))
+    for (text,) in sections["none"]:
+        cases.append((text, "-", None, False))
+    for text, expected, remaining in sections["strict"]:
+        cases.append((text, expected, remaining, True))
+    return cases
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else FIXTURES
+    now, sections = load_fixtures(path)
+    parser = DateParser()
+    cases = build_cases(sections)
+
+    failures = []
+    start = time.perf_counter()
+    for text, expected, remaining, strict in cases:
+        due, rest = parser.extract(text, now, strict=strict)
+        if fmt(due) != expected or (remaining is not None and rest != remaining):
+            failures.append((text, expected, remaining, fmt(due), rest))
+    elapsed = time.perf_counter() - start
+
+    for text, expected, remaining, got, rest in failures[:50]:
+        print(f"❌ {text!r}: expected {expected} | {remaining!r}, got {got} | {rest!r}")
+    print(f"\n{len(cases) - len(failures)}/{len(cases)} passed "
+          f"({elapsed / len(cases) * 1e6:.0f} µs per parse, NOW={now:%Y-%m-%d %H:%M %a})")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
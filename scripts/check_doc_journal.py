@@ -0,0 +1,75 @@
+import sys
+import os
+import tempfile
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.doc_service_v2 import DocServiceV2
+
+
+class OfflineDocService(DocServiceV2):
+    """DocServiceV2 with the Feishu calls replaced by an in-memory document store."""
+
+    def __init__(self, journal_dir):
+        super().__init__("", "", journal_dir=journal_dir)
+        self.docs = {}
+        self.fail_writes = False
+
+    def create_document(self, title="Meeting Minutes"):
+        doc_id = f"doc{len(self.docs) + 1}"
+        self.docs[doc_id] = []
+        return doc_id
+
+    def get_tenant_token(self):
+        return "offline"
+
+    def _post_descendants(self, doc_id, parent_id, nodes, headers, index=-1, client_token=None):
+        if self.fail_writes: return None
+        ids = [f"{doc_id}_b{len(self.docs[doc_id]) + i}" for i in range(len(nodes))]
+        self.docs[doc_id].extend(n["text"] for n in nodes)
+        return ids
+
+
+def text(s):
+    return {"block_type": 2, "text": s}
+
+
+def check(name, ok, detail=""):
+    ok = bool(ok)
+    print(f"{'✅' if ok else '❌'} {name}{'' if ok else f' ({detail})'}")
+    return ok
+
+
+def main():
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        doc = OfflineDocService(tmp)
+
+        # Same title, no resume_key: an interrupted write must not capture the next caller's document
+        doc.fail_writes = True
+        first, ids, _ = doc.write_document("任务周报 - 2025-06-09", [text("alice")])
+        doc.fail_writes = False
+        second, ids2, _ = doc.write_document("任务周报 - 2025-06-09", [text("bob")])
+        results.append(check("same title, different callers -> separate documents",
+                             first != second and doc.docs[second] == ["bob"], f"{first} {second} {doc.docs}"))
+
+        # Same resume_key: the unfinished document is completed with its journaled content
+        doc.fail_writes = True
+        first, _, _ = doc.write_document("📅 AI 早报", [text("v1")], meta={"n": 1}, resume_key="rss-digest:2025-06-09")
+        doc.fail_writes = False
+        again, ids, meta = doc.write_document("📅 AI 早报", [text("v2")], meta={"n": 2}, resume_key="rss-digest:2025-06-09")
+        results.append(check("same resume_key -> resumed from the journal",
+                             again == first and doc.docs[first] == ["v1"] and meta == {"n": 1} and ids,
+                             f"{first} {again} {doc.docs} {meta}"))
+
+        # Other keys don't see it
+        other, _, _ = doc.write_document("📅 AI 早报", [text("x")], resume_key="rss-digest:2025-06-10")
+        results.append(check("different resume_key -> new document", other != first, other))
+
+    print(f"\n{sum(results)}/{len(results)} passed")
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
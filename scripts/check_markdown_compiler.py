@@ -0,0 +1,54 @@
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.markdown_compiler import compile_markdown
+
+# (markdown line, expected runs as "text" or "text:style+style")
+INLINE_CASES = [
+    ("plain text", ["plain text"]),
+    ("**粗体**和*斜体*", ["粗体:bold", "和", "斜体:italic"]),
+    ("a *b* c", ["a ", "b:italic", " c"]),
+    ("这是*重点*内容", ["这是", "重点:italic", "内容"]),
+    ("__重要__ 事项", ["重要:bold", " 事项"]),
+    ("__two words__ x", ["two words:bold", " x"]),
+    ("~~旧~~ 新", ["旧:strikethrough", " 新"]),
+    ("调用 `login_api` 接口", ["调用 ", "login_api:inline_code", " 接口"]),
+    ("[面板](https://example.com)", ["面板:link"]),
+    # Intraword / arithmetic delimiters stay literal
+    ("2*3*4 = 24", ["2*3*4 = 24"]),
+    ("call __init__ now", ["call __init__ now"]),
+    ("a__b__c", ["a__b__c"]),
+    ("*a*b", ["*a*b"]),
+    ("snake_case_name", ["snake_case_name"]),
+]
+
+
+def runs(line):
+    node = compile_markdown(line)[0]
+    key = next(k for k in node if k not in ("block_type", "children"))
+    out = []
+    for e in node[key].get("elements", []):
+        run = e.get("text_run") or {}
+        styles = sorted(k for k, v in (run.get("text_element_style") or {}).items() if v)
+        out.append(run.get("content", "") + (":" + "+".join(styles) if styles else ""))
+    return out
+
+
+def main():
+    failures = []
+    for line, expected in INLINE_CASES:
+        got = runs(line)
+        if got != expected:
+            failures.append((line, expected, got))
+
+    for line, expected, got in failures:
+        print(f"❌ {line!r}: expected {expected}, got {got}")
+    print(f"\n{len(INLINE_CASES) - len(failures)}/{len(INLINE_CASES)} passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
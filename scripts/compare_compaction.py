@@ -0,0 +1,87 @@
+import sys
+import os
+import time
+import difflib
+import logging
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.minutes_service import MinutesService
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+
+def load_transcript(service, source):
+    """source: a minutes link/token, or a path to a saved transcript file."""
+    if os.path.exists(source):
+        with open(source, "r", encoding="utf-8") as f:
+            return f.read()
+    token = service.extract_minutes_token(source) or source
+    return service.fetch_subtitle(token)
+
+
+def section_lines(content, marker):
+    """Bullet lines under the section whose heading contains marker (e.g. 待办)."""
+    lines, inside = [], False
+    for line in content.split("\n"):
+        stripped = line.strip()
+        if marker in stripped and not stripped.startswith(("-", "*")):
+            inside = True
+            continue
+        if inside and stripped and not stripped.startswith(("-", "*")) and stripped[0].isdigit():
+            break
+        if inside and stripped.startswith(("-", "*")):
+            lines.append(stripped)
+    return lines
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python scripts/compare_compaction.py <妙记链接 | token | transcript.txt>")
+        return
+
+    config = Config()
+    service = MinutesService(
+        app_id=config.APP_ID,
+        app_secret=config.APP_SECRET,
+        llm_key=config.LLM_API_KEY,
+        llm_base=config.LLM_BASE_URL,
+        llm_model=config.LLM_MODEL,
+        time_granularity=config.MINUTES_TIME_GRANULARITY
+    )
+
+    text = load_transcript(service, sys.argv[1])
+    if not text:
+        print("❌ 无法获取录音文本")
+        return
+
+    start = time.time()
+    raw = service.summarize(text, compact=False)
+    raw_seconds = time.time() - start
+
+    start = time.time()
+    compacted = service.summarize(text)
+    compacted_seconds = time.time() - start
+    stats = service.last_compaction or {}
+
+    raw_content = raw.get("content", "")
+    compacted_content = compacted.get("content", "")
+    similarity = difflib.SequenceMatcher(None, raw_content, compacted_content).ratio()
+
+    print("\n" + "=" * 30)
+    print("🗜️ Transcript compaction report")
+    print("=" * 30)
+    print(f"Chars:      {stats.get('original_chars')} -> {stats.get('compacted_chars')} (ratio {stats.get('ratio')})")
+    print(f"Latency:    {raw_seconds:.1f}s (raw) vs {compacted_seconds:.1f}s (compacted)")
+    print(f"Similarity: {similarity:.2f} (difflib ratio of the two summaries)")
+    for marker in ["待办", "决策"]:
+        print(f"{marker}:       {len(section_lines(raw_content, marker))} (raw) vs "
+              f"{len(section_lines(compacted_content, marker))} (compacted)")
+    print("\n--- Raw summary ---\n" + raw_content)
+    print("\n--- Compacted summary ---\n" + compacted_content)
+
+
+if __name__ == "__main__":
+    main()
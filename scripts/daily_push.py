@@ -41,7 +41,13 @@ def main():
 
     # 3. Init Services
     im_service = IMService(client)
-    doc_service = DocService(config.APP_ID, config.APP_SECRET)
+    doc_service = DocService(
+        config.APP_ID,
+        config.APP_SECRET,
+        publish_mode=config.DOC_PUBLISH_MODE,
+        import_threshold=config.DOC_IMPORT_THRESHOLD,
+        journal_dir=config.DOC_JOURNAL_DIR
+    )
     llm_service = LLMParser(
         api_key=config.LLM_API_KEY,
         base_url=config.LLM_BASE_URL,
@@ -128,6 +128,14 @@ def setup_table_fields(token, app_token):
     })
     print("  - ✅ '截止日期' 列创建完成")
 
+    # --- 2.5 新增 "最后更新时间" (Modified Time) ---
+    # type 1002 = 最后更新时间 (自动维护)，任务索引按它做增量同步 (TASK_MODIFIED_FIELD)
+    requests.post(url_fields, headers=headers, json={
+        "field_name": "最后更新时间",
+        "type": 1002
+    })
+    print("  - ✅ '最后更新时间' 列创建完成")
+
     print("\n🎉 所有初始化工作完成！")
 
 if __name__ == "__main__":
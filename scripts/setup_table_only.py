@@ -100,6 +100,17 @@ def setup_table_fields(token, app_token):
     else:
         print("  - ℹ️ '截止日期' 列已存在，跳过")
 
+    # --- 2.5 新增 "最后更新时间" (Modified Time) ---
+    # type 1002 = 最后更新时间 (自动维护)，任务索引按它做增量同步 (TASK_MODIFIED_FIELD)
+    if not any(f["field_name"] == "最后更新时间" for f in fields):
+        requests.post(url_fields, headers=headers, json={
+            "field_name": "最后更新时间",
+            "type": 1002
+        })
+        print("  - ✅ '最后更新时间' 列创建完成")
+    else:
+        print("  - ℹ️ '最后更新时间' 列已存在，跳过")
+
     print("\n🎉 表格结构配置完成！")
 
 if __name__ == "__main__":
@@ -1,10 +1,16 @@
+import sys
+import os
 import json
 import re
 import requests
 from urllib.parse import urlparse
 import lark_oapi as lark
 from lark_oapi.api.minutes.v1.model import *
-from openai import OpenAI
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_gateway import LLMGateway
 
 # Load Config
 try:
@@ -27,7 +33,7 @@ client = lark.Client.builder() \
     .log_level(lark.LogLevel.INFO) \
     .build()
 
-llm_client = OpenAI(api_key=LLM_API_KEY, base_url=LLM_BASE_URL)
+llm = LLMGateway(LLM_API_KEY, LLM_BASE_URL, LLM_MODEL)
 
 def extract_token(url):
     """
@@ -95,7 +101,8 @@ def summarize_with_ai(text):
 """
 
     try:
-        response = llm_client.chat.completions.create(
+        response = llm.complete(
+            label="Minutes",
             model=LLM_MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
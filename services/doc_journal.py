@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+
+class WriteJournal:
+    """
+    On-disk journal of in-progress document writes, one JSON file per document.
+
+    Each write (one add_block_tree/add_content call) is keyed by a hash of its
+    target and content and stores its payload, so a later run can finish it
+    even if it would generate different content (e.g. a new LLM digest). It
+    records which batches are already committed; each batch has a
+    deterministic client_token, so a retry is a no-op on the Feishu side if
+    the first attempt went through. A document is only found again through
+    the resume_key its creator passed (titles repeat across meetings and
+    users). Journals are removed once every write for the document is done,
+    and dropped after `max_age` seconds otherwise.
+    """
+
+    def __init__(self, directory="data/doc_journal", max_age=7 * 86400):
+        self.directory = directory
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def write_key(parent_id, index, payload):
+        raw = json.dumps([parent_id, index, payload], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def client_token(doc_id, write_key, batch_no):
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"feishu-docx:{doc_id}:{write_key}:{batch_no}"))
+
+    def _path(self, doc_id):
+        return os.path.join(self.directory, f"{doc_id}.json")
+
+    def _load(self, doc_id):
+        try:
+            with open(self._path(doc_id), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Read journal {doc_id} failed: {e}")
+            return None
+
+    def _save(self, doc_id, entry):
+        entry["updated"] = int(time.time())
+        tmp = self._path(doc_id) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, self._path(doc_id))
+
+    def open_document(self, doc_id, title, resume_key=None):
+        """Register a new document; resume_key (caller-chosen identity) makes it findable by find_unfinished."""
+        with self.lock:
+            entry = self._load(doc_id) or {"title": title, "writes": {}}
+            entry["title"] = title
+            entry["resume_key"] = resume_key
+            self._save(doc_id, entry)
+
+    def find_unfinished(self, resume_key):
+        """Return the doc_id of an unfinished document opened with this resume_key, if any (stale journals are dropped)."""
+        with self.lock:
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"): continue
+                doc_id = name[:-len(".json")]
+                entry = self._load(doc_id)
+                if not entry: continue
+                if self.max_age and time.time() - entry.get("updated", 0) > self.max_age:
+                    logging.warning(f"⚠️ Dropping stale write journal for '{entry.get('title')}' ({doc_id})")
+                    os.remove(self._path(doc_id))
+                    continue
+                if resume_key and entry.get("resume_key") == resume_key:
+                    return doc_id
+        return None
+
+    def pending_writes(self, doc_id):
+        """{write_key: write} for the unfinished writes of a document, oldest first."""
+        with self.lock:
+            entry = self._load(doc_id) or {}
+            return dict(entry.get("writes", {}))
+
+    def begin_write(self, doc_id, write_key, kind, nodes, parent_id=None, index=-1, meta=None):
+        """Record a write and its payload (kind: "tree" for add_block_tree, "content" for add_content)."""
+        with self.lock:
+            entry = self._load(doc_id) or {"title": None, "writes": {}}
+            if write_key not in entry["writes"]:
+                entry["writes"][write_key] = {"kind": kind, "parent_id": parent_id, "index": index,
+                                              "nodes": nodes, "meta": meta, "batches": {}}
+                self._save(doc_id, entry)
+
+    def committed_batches(self, doc_id, write_key):
+        """{batch_no: result} for batches of this write that are already committed."""
+        with self.lock:
+            entry = self._load(doc_id) or {}
+            write = entry.get("writes", {}).get(write_key, {})
+            return {int(k): v for k, v in write.get("batches", {}).items()}
+
+    def commit_batch(self, doc_id, write_key, batch_no, result):
+        with self.lock:
+            entry = self._load(doc_id) or {"title": None, "writes": {}}
+            write = entry["writes"].setdefault(write_key, {"batches": {}})
+            write["batches"][str(batch_no)] = result
+            self._save(doc_id, entry)
+
+    def finish_write(self, doc_id, write_key):
+        """Drop a completed write; remove the journal once nothing is pending for the document."""
+        with self.lock:
+            entry = self._load(doc_id)
+            if not entry: return
+            entry.get("writes", {}).pop(write_key, None)
+            if entry.get("writes"):
+                self._save(doc_id, entry)
+            else:
+                try:
+                    os.remove(self._path(doc_id))
+                except FileNotFoundError:
+                    pass
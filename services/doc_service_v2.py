@@ -2,13 +2,21 @@ import requests
 import json
 import logging
 import mimetypes
-from io import BytesIO
+import time
+import uuid
+from services.markdown_compiler import compile_markdown, render_markdown
+from services.doc_journal import WriteJournal
 
 class DocServiceV2:
-    def __init__(self, app_id, app_secret):
+    WRITE_RETRIES = 3
+
+    def __init__(self, app_id, app_secret, publish_mode="auto", import_threshold=1000, journal_dir="data/doc_journal"):
         self.app_id = app_id
         self.app_secret = app_secret
         self.token = None
+        self.publish_mode = publish_mode  # "blocks" / "import" / "auto"
+        self.import_threshold = import_threshold  # auto: blocks above this go through import
+        self.journal = WriteJournal(journal_dir) if journal_dir else None
 
     def get_tenant_token(self):
         url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
@@ -39,9 +47,80 @@ class DocServiceV2:
             logging.error(f"Create doc exception: {e}")
             return None
 
+    def write_document(self, title, nodes, meta=None, resume_key=None):
+        """
+        Create a document and write nodes into it. Returns (doc_id, created_ids, meta);
+        created_ids is None if the write is incomplete.
+
+        resume_key opts in to resuming: a stable identity of the caller's
+        document (e.g. "rss-digest:<date>"), never just the title. If a previous
+        attempt with the same key left an unfinished document, that document is
+        completed from its journaled payload instead and the new nodes are
+        dropped; the returned meta is the one stored with that write (e.g. its
+        image map), so the caller post-processes what was actually written.
+        Without a key every call creates a new document.
+        """
+        doc_id = self.journal.find_unfinished(resume_key) if self.journal else None
+        if doc_id:
+            logging.info(f"♻️ Resuming unfinished document '{title}' ({doc_id})")
+            resumed = self.resume_writes(doc_id)
+            if resumed is None:
+                return doc_id, None, meta
+            if resumed:
+                return (doc_id,) + resumed[0]
+            # Created but nothing written yet: write the new nodes into it
+        else:
+            doc_id = self.create_document(title)
+            if not doc_id: return None, None, meta
+            if self.journal:
+                self.journal.open_document(doc_id, title, resume_key)
+        return doc_id, self.add_block_tree(doc_id, nodes, meta=meta), meta
+
+    def resume_writes(self, doc_id):
+        """
+        Finish the journaled writes of a document from their stored payloads.
+        Returns [(created_ids, meta)] per resumed write, or None if one failed again.
+        """
+        if not self.journal: return []
+        resumed = []
+        for write_key in self.journal.pending_writes(doc_id):
+            # Nested writes of an oversized subtree finish inside their parent's replay
+            write = self.journal.pending_writes(doc_id).get(write_key)
+            if not write: continue
+            if write.get("kind") == "content":
+                created = self.add_content(doc_id, write["nodes"], meta=write.get("meta"))
+            else:
+                created = self.add_block_tree(doc_id, write["nodes"], parent_id=write.get("parent_id"),
+                                              index=write.get("index", -1), meta=write.get("meta"))
+            if created is None:
+                return None
+            resumed.append((created, write.get("meta")))
+        return resumed
+
+    def _post_idempotent(self, url, headers, payload, client_token):
+        """
+        POST a block write with a client_token, retrying transient failures.
+        The same token is reused on every attempt, so retries never duplicate blocks.
+        Returns the response data dict or None.
+        """
+        params = {"document_revision_id": -1, "client_token": client_token}
+        for attempt in range(self.WRITE_RETRIES):
+            try:
+                resp = requests.post(url, headers=headers, params=params, json=payload)
+                if resp.status_code == 200 and resp.json().get("code") == 0:
+                    return resp.json().get("data", {})
+                logging.error(f"Block write failed (attempt {attempt + 1}): {resp.text}")
+                if resp.status_code < 500 and resp.status_code != 429:
+                    return None  # Not retryable
+            except Exception as e:
+                logging.error(f"Block write exception (attempt {attempt + 1}): {e}")
+            if attempt + 1 < self.WRITE_RETRIES:
+                time.sleep(2 ** attempt)
+        return None
+
     # --- Enhanced Image Flow Methods ---
 
-    def upload_file(self, file_name, file_data, parent_type, parent_node):
+    def upload_file(self, file_name, file_data, parent_type, parent_node, extra=None):
         """Generic upload to Drive"""
         token = self.get_tenant_token()
         if not token: return None
@@ -56,6 +135,8 @@ class DocServiceV2:
             'parent_node': parent_node,
             'size': len(file_data)
         }
+        if extra:
+            data['extra'] = json.dumps(extra)
         
         try:
             resp = requests.post(url, headers=headers, files=files, data=data)
@@ -96,6 +177,160 @@ class DocServiceV2:
             logging.error(f"Update block exception: {e}")
             return False
 
+    def delete_children(self, doc_id, parent_id, start_index, end_index):
+        """Delete the children [start_index, end_index) of a block."""
+        token = self.get_tenant_token()
+        if not token: return False
+
+        url = f"https://open.feishu.cn/open-apis/docx/v1/documents/{doc_id}/blocks/{parent_id}/children/batch_delete"
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+        try:
+            resp = requests.delete(url, headers=headers, params={"document_revision_id": -1},
+                                   json={"start_index": start_index, "end_index": end_index})
+            if resp.status_code != 200 or resp.json().get("code") != 0:
+                logging.error(f"Delete blocks under {parent_id} failed: {resp.text}")
+                return False
+            return True
+        except Exception as e:
+            logging.error(f"Delete blocks exception: {e}")
+            return False
+
+    # --- Import Task Flow (whole document in one upload) ---
+
+    def import_document(self, title, markdown, timeout=60, poll_interval=1.0):
+        """
+        Create a docx from a locally rendered Markdown file via the Drive
+        import-task API: upload once, create the task, poll until done.
+        Returns the new document_id or None.
+        """
+        file_data = markdown.encode("utf-8")
+        file_token = self.upload_file(f"{title}.md", file_data, "ccm_import_open", "",
+                                      extra={"obj_type": "docx", "file_extension": "md"})
+        if not file_token: return None
+
+        token = self.get_tenant_token()
+        if not token: return None
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+        payload = {
+            "file_extension": "md",
+            "file_token": file_token,
+            "type": "docx",
+            "file_name": title,
+            "point": {"mount_type": 1, "mount_key": ""}
+        }
+
+        try:
+            resp = requests.post("https://open.feishu.cn/open-apis/drive/v1/import_tasks", headers=headers, json=payload)
+            if resp.status_code != 200 or resp.json().get("code") != 0:
+                logging.error(f"Create import task failed: {resp.text}")
+                return None
+            ticket = resp.json()["data"]["ticket"]
+
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                time.sleep(poll_interval)
+                r = requests.get(f"https://open.feishu.cn/open-apis/drive/v1/import_tasks/{ticket}", headers=headers)
+                result = r.json().get("data", {}).get("result", {}) if r.status_code == 200 else {}
+                status = result.get("job_status")
+                if status == 0:
+                    return result.get("token")
+                if status not in (1, 2, None):  # 1 = init, 2 = processing
+                    logging.error(f"Import task {ticket} failed: {result.get('job_error_msg')} ({status})")
+                    return None
+            logging.error(f"Import task {ticket} timed out after {timeout}s")
+        except Exception as e:
+            logging.error(f"Import task exception: {e}")
+        return None
+
+    # --- Existing Documents ---
+
+    def find_document_by_title(self, title, max_pages=4):
+        """Find a bot-owned docx by exact title, newest first. Returns its token or None."""
+        token = self.get_tenant_token()
+        if not token: return None
+
+        url = "https://open.feishu.cn/open-apis/drive/v1/files"
+        headers = {"Authorization": f"Bearer {token}"}
+        page_token = None
+        for _ in range(max_pages):
+            params = {"page_size": 50, "direction": "DESC", "order_by": "CreatedTime"}
+            if page_token:
+                params["page_token"] = page_token
+            try:
+                resp = requests.get(url, headers=headers, params=params)
+                if resp.status_code != 200:
+                    logging.error(f"List files failed: {resp.text}")
+                    return None
+                data = resp.json().get("data", {})
+                for f in data.get("files", []):
+                    if f.get("type") == "docx" and f.get("name") == title:
+                        return f.get("token")
+                if not data.get("has_more"):
+                    return None
+                page_token = data.get("page_token")
+            except Exception as e:
+                logging.error(f"List files exception: {e}")
+                return None
+        return None
+
+    def list_blocks(self, doc_id):
+        """Return every block of a document in document order, or None on failure."""
+        token = self.get_tenant_token()
+        if not token: return None
+
+        url = f"https://open.feishu.cn/open-apis/docx/v1/documents/{doc_id}/blocks"
+        headers = {"Authorization": f"Bearer {token}"}
+        blocks = []
+        page_token = None
+        while True:
+            params = {"page_size": 500}
+            if page_token:
+                params["page_token"] = page_token
+            try:
+                resp = requests.get(url, headers=headers, params=params)
+                if resp.status_code != 200 or resp.json().get("code") != 0:
+                    logging.error(f"List blocks failed: {resp.text}")
+                    return None
+                data = resp.json().get("data", {})
+                blocks.extend(data.get("items", []))
+                if not data.get("has_more"):
+                    return blocks
+                page_token = data.get("page_token")
+            except Exception as e:
+                logging.error(f"List blocks exception: {e}")
+                return None
+
+    def should_import(self, nodes):
+        if self.publish_mode == "import": return True
+        if self.publish_mode == "blocks": return False
+        return sum(self._subtree_size(n) for n in nodes) > self.import_threshold
+
+    def publish_markdown(self, title, markdown):
+        """
+        Create a document from Markdown using the block path or the import path,
+        according to publish_mode and document size. Returns the document_id.
+        """
+        nodes = self.parse_markdown_to_blocks(markdown)
+        if self.should_import(nodes):
+            logging.info(f"📥 Publishing '{title}' via import task ({len(nodes)} top-level blocks)")
+            doc_id = self.import_document(title, markdown)
+            if doc_id: return doc_id
+            logging.warning("⚠️ Import failed, falling back to block writes.")
+
+        doc_id, created_ids, _ = self.write_document(title, nodes)
+        if not doc_id or created_ids is None:
+            return None
+        return doc_id
+
+    def render_markdown(self, nodes, image_urls=None):
+        return render_markdown(nodes, image_urls)
+
     # --- Block Creators ---
     
     def create_heading_block(self, text, level=2, link_url=None):
@@ -141,9 +376,177 @@ class DocServiceV2:
             "image": img_prop
         }
 
-    def add_content(self, doc_id, blocks):
+    def parse_markdown_to_blocks(self, text):
+        """Compile Markdown into a nested block tree for add_block_tree."""
+        return compile_markdown(text)
+
+    # --- Nested Block Tree Writer ---
+
+    DESCENDANT_LIMIT = 1000  # Max blocks per create-descendant request
+
+    def _subtree_size(self, node):
+        return 1 + sum(self._subtree_size(c) for c in node.get("children", []))
+
+    def _flatten_tree(self, nodes, descendants, order, prefix):
+        """
+        Assign temporary ids and flatten the tree (pre-order). Returns the top-level temp ids.
+        Ids are prefix + pre-order position, so a retry with the same client_token sends
+        the same ids and the block_id_relations it gets back still map.
+        """
+        top_ids = []
+        for node in nodes:
+            temp_id = f"{prefix}_{len(order)}"
+            block = {k: v for k, v in node.items() if k != "children"}
+            block["block_id"] = temp_id
+            descendants.append(block)
+            order.append(temp_id)
+            child_ids = self._flatten_tree(node.get("children", []), descendants, order, prefix)
+            block["children"] = child_ids
+            top_ids.append(temp_id)
+        return top_ids
+
+    def _split_tables(self, nodes):
+        """
+        A table is one create-descendant subtree and can't be split across
+        requests, so top-level tables over DESCENDANT_LIMIT become several
+        tables of whole rows, each repeating the header row.
+        """
+        out = []
+        for node in nodes:
+            if node.get("block_type") != 31 or self._subtree_size(node) <= self.DESCENDANT_LIMIT:
+                out.append(node)
+                continue
+            prop = node.get("table", {}).get("property", {})
+            columns = prop.get("column_size") or 1
+            cells = node.get("children", [])
+            rows = [cells[i:i + columns] for i in range(0, len(cells), columns)]
+            header = rows.pop(0) if prop.get("header_row") and len(rows) > 1 else []
+            header_size = sum(self._subtree_size(c) for c in header)
+
+            first = len(out)
+            chunk, chunk_size = [], 1 + header_size
+            for row in rows:
+                row_size = sum(self._subtree_size(c) for c in row)
+                if 1 + header_size + row_size > self.DESCENDANT_LIMIT:
+                    raise ValueError(f"Table row of {row_size} blocks exceeds the {self.DESCENDANT_LIMIT}-block write limit")
+                if chunk and chunk_size + row_size > self.DESCENDANT_LIMIT:
+                    out.append(self._table_chunk(node, header, chunk))
+                    chunk, chunk_size = [], 1 + header_size
+                chunk.append(row)
+                chunk_size += row_size
+            if chunk:
+                out.append(self._table_chunk(node, header, chunk))
+            logging.info(f"✂️ Split a {len(rows) + bool(header)}-row table into {len(out) - first} tables")
+        return out
+
+    def _table_chunk(self, table, header, rows):
+        prop = dict(table.get("table", {}).get("property", {}))
+        prop["row_size"] = len(rows) + (1 if header else 0)
+        return {
+            **{k: v for k, v in table.items() if k != "children"},
+            "table": {**table.get("table", {}), "property": prop},
+            "children": [c for row in ([header] if header else []) + rows for c in row],
+        }
+
+    def _post_descendants(self, doc_id, parent_id, nodes, headers, index=-1, client_token=None):
+        client_token = client_token or str(uuid.uuid4())
+        descendants, order = [], []
+        children_id = self._flatten_tree(nodes, descendants, order, f"tmp_{client_token.replace('-', '')}")
+        url = f"https://open.feishu.cn/open-apis/docx/v1/documents/{doc_id}/blocks/{parent_id}/descendant"
+        payload = {"children_id": children_id, "index": index, "descendants": descendants}
+
+        data = self._post_idempotent(url, headers, payload, client_token)
+        if data is None:
+            return None
+        id_map = {r.get("temporary_block_id"): r.get("block_id") for r in data.get("block_id_relations", [])}
+        return [id_map.get(t) for t in order]
+
+    def add_block_tree(self, doc_id, nodes, parent_id=None, index=-1, meta=None):
+        """
+        Write a nested block tree (lists, callouts, tables...) through the
+        create-descendant API, packing as many top-level nodes per request as
+        the limit allows. index is the insert position under the parent (-1 = append).
+
+        Batches are journaled: a failed write stops at the first failing batch,
+        and calling again with the same arguments (or resume_writes) skips
+        committed batches. meta is stored with the journaled write for resume_writes.
+        Tables too large for one request are written as several tables
+        (see _split_tables). Returns the real block ids in pre-order, matching
+        the written tree, or None if the write is incomplete.
+        """
+        token = self.get_tenant_token()
+        if not token: return None
+
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=utf-8"
+        }
+        write_key = WriteJournal.write_key(parent_id, index, nodes)
+        committed = {}
+        if self.journal:
+            self.journal.begin_write(doc_id, write_key, "tree", nodes, parent_id, index, meta)
+            committed = self.journal.committed_batches(doc_id, write_key)
+            if committed:
+                logging.info(f"♻️ Resuming write on {doc_id}: {len(committed)} batches already committed")
+
+        parent_id = parent_id or doc_id
+        created_ids = []
+        position = index
+        batch_no = 0
+
+        def write(batch, post):
+            # Returns False once a batch fails so the caller stops (no holes)
+            nonlocal position, batch_no
+            current = batch_no
+            batch_no += 1
+            if current in committed:
+                ids = committed[current]
+            else:
+                ids = post(self.journal.client_token(doc_id, write_key, current) if self.journal else None)
+                if ids is None:
+                    logging.error(f"Write on {doc_id} stopped at batch {current}; retry to resume.")
+                    return False
+                if self.journal:
+                    self.journal.commit_batch(doc_id, write_key, current, ids)
+            if position >= 0:
+                position += len(batch)
+            created_ids.extend(ids)
+            return True
+
+        def flush(batch):
+            if not batch: return True
+            return write(batch, lambda ct: self._post_descendants(doc_id, parent_id, batch, headers, position, ct))
+
+        batch, batch_size = [], 0
+        for node in self._split_tables(nodes):
+            size = self._subtree_size(node)
+            if size > self.DESCENDANT_LIMIT:
+                # Oversized subtree: create the node alone, then write its children under it
+                if not flush(batch): return None
+                batch, batch_size = [], 0
+                head = {k: v for k, v in node.items() if k != "children"}
+                if not write([head], lambda ct: self._post_descendants(doc_id, parent_id, [head], headers, position, ct)):
+                    return None
+                child_ids = self.add_block_tree(doc_id, node["children"], parent_id=created_ids[-1])
+                if child_ids is None: return None
+                created_ids.extend(child_ids)
+                continue
+            if batch and batch_size + size > self.DESCENDANT_LIMIT:
+                if not flush(batch): return None
+                batch, batch_size = [], 0
+            batch.append(node)
+            batch_size += size
+        if not flush(batch): return None
+
+        if self.journal:
+            self.journal.finish_write(doc_id, write_key)
+        return created_ids
+
+    def add_content(self, doc_id, blocks, meta=None):
         """
         Add content and RETURN the list of created block info (including block_ids).
+        Journaled like add_block_tree: stops at the first failed batch (None) and
+        resumes from it when called again with the same blocks.
         """
         token = self.get_tenant_token()
         if not token: return None
@@ -153,28 +556,35 @@ class DocServiceV2:
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json; charset=utf-8"
         }
+        write_key = WriteJournal.write_key(None, -1, blocks)
+        committed = {}
+        if self.journal:
+            self.journal.begin_write(doc_id, write_key, "content", blocks, meta=meta)
+            committed = self.journal.committed_batches(doc_id, write_key)
         
         created_blocks_info = []
         
         # Batch insert (Limit 50)
         batch_size = 50
-        for i in range(0, len(blocks), batch_size):
+        for batch_no, i in enumerate(range(0, len(blocks), batch_size)):
+            if batch_no in committed:
+                created_blocks_info.extend(committed[batch_no])
+                continue
+
             batch = blocks[i:i+batch_size]
-            payload = {"children": batch}
-            
-            try:
-                resp = requests.post(url, headers=headers, json=payload)
-                if resp.status_code != 200:
-                    logging.error(f"Add blocks failed: {resp.text}")
-                    continue # Try next batch? Or abort?
-                
-                data = resp.json().get("data", {})
-                children = data.get("children", [])
-                created_blocks_info.extend(children)
-                
-            except Exception as e:
-                 logging.error(f"Add blocks exception: {e}")
+            client_token = self.journal.client_token(doc_id, write_key, batch_no) if self.journal else str(uuid.uuid4())
+            data = self._post_idempotent(url, headers, {"children": batch}, client_token)
+            if data is None:
+                logging.error(f"Add blocks stopped at batch {batch_no}; retry to resume.")
+                return None
+
+            children = data.get("children", [])
+            if self.journal:
+                self.journal.commit_batch(doc_id, write_key, batch_no, children)
+            created_blocks_info.extend(children)
 
+        if self.journal:
+            self.journal.finish_write(doc_id, write_key)
         return created_blocks_info
 
     def transfer_ownership(self, doc_id, owner_open_id):
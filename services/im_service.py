@@ -6,12 +6,19 @@ from lark_oapi.api.im.v1.model import (
     UpdateMessageRequest, 
     UpdateMessageRequestBody,
     CreateMessageRequest,
-    CreateMessageRequestBody
+    CreateMessageRequestBody,
+    GetChatMembersRequest,
+    GetMessageResourceRequest
 )
+from services.message_updater import ThrottledUpdater
 
 class IMService:
-    def __init__(self, client):
+    def __init__(self, client, update_interval=1.5, update_min_chars=40, max_updates=18):
         self.client = client
+        # Progressive (streamed) replies: edit cadence and per-message edit budget
+        self.update_interval = update_interval
+        self.update_min_chars = update_min_chars
+        self.max_updates = max_updates
 
     def send(self, receive_id, text, receive_id_type="chat_id"):
         """Send a proactive message"""
@@ -63,3 +70,45 @@ class IMService:
             logging.error(f"Failed to update message {msg_id}: {resp.code} - {resp.msg}")
             return False
         return True
+
+    def progressive_reply(self, msg_id):
+        """ThrottledUpdater that edits an existing reply as streamed content arrives"""
+        return ThrottledUpdater(self, msg_id, self.update_interval, self.update_min_chars, self.max_updates)
+
+    def download_file(self, msg_id, file_key):
+        """Download a file attached to a message; returns bytes or None"""
+        req = GetMessageResourceRequest.builder() \
+            .message_id(msg_id) \
+            .file_key(file_key) \
+            .type("file") \
+            .build()
+
+        resp = self.client.im.v1.message_resource.get(req)
+        if not resp.success():
+            logging.error(f"Failed to download file {file_key}: {resp.code} - {resp.msg}")
+            return None
+        return resp.file.read()
+
+    def get_chat_members(self, chat_id):
+        """Return {name: open_id} for every member of a chat"""
+        members = {}
+        page_token = None
+        while True:
+            builder = GetChatMembersRequest.builder() \
+                .chat_id(chat_id) \
+                .member_id_type("open_id") \
+                .page_size(100)
+            if page_token:
+                builder = builder.page_token(page_token)
+
+            resp = self.client.im.v1.chat_members.get(builder.build())
+            if not resp.success():
+                logging.error(f"Failed to get members of {chat_id}: {resp.code} - {resp.msg}")
+                return members
+
+            for m in resp.data.items or []:
+                if m.name and m.member_id:
+                    members[m.name] = m.member_id
+            if not resp.data.has_more:
+                return members
+            page_token = resp.data.page_token
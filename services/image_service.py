@@ -0,0 +1,104 @@
+import logging
+from io import BytesIO
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, images are uploaded as-is without it
+    Image = None
+
+# Magic bytes -> (format, extension)
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "PNG", "png"),
+    (b"\xff\xd8\xff", "JPEG", "jpg"),
+    (b"GIF87a", "GIF", "gif"),
+    (b"GIF89a", "GIF", "gif"),
+    (b"BM", "BMP", "bmp"),
+]
+
+_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif", "BMP": "bmp"}
+
+
+def sniff_format(data):
+    """Detect the real image format from its header, ignoring what the origin claims."""
+    if not data:
+        return None
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP"
+    for magic, fmt, _ in _SIGNATURES:
+        if data.startswith(magic):
+            return fmt
+    return None
+
+
+class ImageOptimizer:
+    """
+    Downscale and re-encode images before they are uploaded to Drive.
+    Disabled (pass-through) when Pillow is missing or IMAGE_OPTIMIZE is false.
+    """
+
+    def __init__(self, max_width=1280, quality=80, target_format="JPEG", enabled=True):
+        self.max_width = max_width
+        self.quality = quality
+        self.target_format = (target_format or "JPEG").upper()
+        self.enabled = enabled and Image is not None
+        if enabled and Image is None:
+            logging.warning("⚠️ Pillow not installed, image optimization disabled.")
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_width=config.IMAGE_MAX_WIDTH,
+            quality=config.IMAGE_QUALITY,
+            target_format=config.IMAGE_FORMAT,
+            enabled=config.IMAGE_OPTIMIZE,
+        )
+
+    def optimize(self, data):
+        """
+        Returns (bytes, file_name). Falls back to the original bytes whenever
+        re-encoding fails or would not make the file smaller.
+        """
+        src_format = sniff_format(data)
+        original_name = f"image.{_EXTENSIONS.get(src_format, 'jpg')}"
+        if not self.enabled or not src_format:
+            return data, original_name
+
+        try:
+            img = Image.open(BytesIO(data))
+            # Animated images lose their frames when re-encoded, leave them alone
+            if getattr(img, "is_animated", False):
+                return data, original_name
+
+            resized = False
+            if self.max_width and img.width > self.max_width:
+                height = max(1, round(img.height * self.max_width / img.width))
+                img = img.resize((self.max_width, height), Image.LANCZOS)
+                resized = True
+
+            target = self.target_format
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            if target == "JPEG":
+                if has_alpha:
+                    # JPEG has no alpha channel: flatten onto white
+                    img = img.convert("RGBA")
+                    background = Image.new("RGB", img.size, (255, 255, 255))
+                    background.paste(img, mask=img.split()[-1])
+                    img = background
+                elif img.mode != "RGB":
+                    img = img.convert("RGB")
+            elif img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if has_alpha else "RGB")
+
+            out = BytesIO()
+            save_kwargs = {"optimize": True}
+            if target in ("JPEG", "WEBP"):
+                save_kwargs["quality"] = self.quality
+            img.save(out, format=target, **save_kwargs)
+            result = out.getvalue()
+
+            if not resized and len(result) >= len(data):
+                return data, original_name
+            return result, f"image.{_EXTENSIONS.get(target, 'jpg')}"
+        except Exception as e:
+            logging.warning(f"⚠️ Image optimization failed, uploading original: {e}")
+            return data, original_name
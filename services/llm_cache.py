@@ -0,0 +1,77 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_SPACE_RE = re.compile(r"\s+")
+# Question marks are kept: "完成了" (a statement) and "完成了？" (a query) are different intents
+_TRAILING_RE = re.compile(r"[\s。．.！!~～，,、…吧呢啊呀哈]+(?=[?？]*$)")
+
+
+def normalize_text(text):
+    """Case, whitespace and trailing punctuation/particles don't change the answer: "查一下任务吧！" == "查一下任务"."""
+    text = _SPACE_RE.sub(" ", (text or "").strip().lower())
+    return _TRAILING_RE.sub("", text) or text
+
+
+def cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    In-memory LRU cache with a TTL for LLM results.
+
+    Bounded by `max_entries` (least recently used entries are evicted first);
+    values are stored as JSON strings so callers always get a fresh copy they
+    can mutate. Hit/miss counters are exposed through `stats()`.
+    """
+
+    def __init__(self, max_entries=512, ttl=600, log_every=100):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.log_every = log_every
+        self.entries = OrderedDict()  # key -> (expires_at, json)
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] < time.time():
+                del self.entries[key]
+                self.expired += 1
+                entry = None
+            if entry:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            lookups = self.hits + self.misses
+        if self.log_every and lookups % self.log_every == 0:
+            logging.info(f"🧠 LLM cache: {self.stats()}")
+        return json.loads(entry[1]) if entry else None
+
+    def put(self, key, value):
+        if value is None or self.max_entries <= 0: return
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, json.dumps(value, ensure_ascii=False))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
@@ -0,0 +1,244 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import httpx
+from openai import OpenAI
+
+
+class LLMBusyError(RuntimeError):
+    """The call waited longer than the queue timeout for a concurrency slot or token budget."""
+
+
+def log_usage(label, response):
+    """Log prompt tokens served from the provider's prefix cache (DeepSeek and OpenAI field names)."""
+    usage = getattr(response, "usage", None)
+    if not usage: return
+    cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details else None
+    logging.info(f"🧾 {label} tokens: prompt {getattr(usage, 'prompt_tokens', 0)} (cached {cached or 0}), "
+                 f"completion {getattr(usage, 'completion_tokens', 0)}")
+
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", '"': '"', "\\": "\\", "/": "/"}
+
+
+def partial_json_string(buffer, key):
+    """
+    Decoded value of string field `key` in a JSON object that is still being
+    streamed: returns what has arrived so far (None until the field starts).
+    """
+    m = re.search(r'"%s"\s*:\s*"' % re.escape(key), buffer)
+    if not m: return None
+    out, i = [], m.end()
+    while i < len(buffer):
+        c = buffer[i]
+        if c == '"':
+            break
+        if c != "\\":
+            out.append(c)
+            i += 1
+            continue
+        if i + 1 >= len(buffer):
+            break  # Escape split across chunks
+        e = buffer[i + 1]
+        if e == "u":
+            if i + 6 > len(buffer): break
+            out.append(chr(int(buffer[i + 2:i + 6], 16)))
+            i += 6
+        else:
+            out.append(_ESCAPES.get(e, e))
+            i += 2
+    return "".join(out)
+
+
+def complete_json_strings(buffer, key):
+    """All fully received string values of `key` (e.g. every article "title" so far)."""
+    return [json.loads(f'"{v}"') for v in re.findall(r'"%s"\s*:\s*"((?:[^"\\]|\\.)*)"' % re.escape(key), buffer)]
+
+
+class LLMGateway:
+    """
+    The one LLM client of a process: a single pooled HTTP client shared by
+    LLMParser, MinutesService and the scripts.
+
+    Every completion takes a slot from a global concurrency limit and, when
+    `tokens_per_minute` is set, room in a sliding one-minute token budget.
+    Calls that cannot get both within `queue_timeout` fail fast with
+    LLMBusyError (callers already fall back on errors) instead of piling up
+    and timing out together. Budget reservations use a rough estimate and are
+    corrected with the real usage once the response arrives.
+    """
+
+    def __init__(self, api_key, base_url=None, model=None, max_concurrency=4, tokens_per_minute=0,
+                 timeout=60, queue_timeout=120, max_connections=16):
+        self.model = model
+        self.timeout = timeout  # Per-call HTTP timeout (seconds)
+        self.queue_timeout = queue_timeout
+        self.tokens_per_minute = tokens_per_minute  # 0 = no token budget
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            http_client=httpx.Client(limits=httpx.Limits(max_connections=max_connections,
+                                                          max_keepalive_connections=max_connections))
+        )
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.cond = threading.Condition()
+        self.window = deque()  # [ts, tokens] spent or reserved in the last minute
+        self.queued = self.in_flight = self.max_queued = 0
+        self.calls = self.errors = self.rejected = 0
+        self.wait_total = self.wait_max = 0.0
+
+    # --- Budget ---
+
+    @staticmethod
+    def estimate_tokens(messages, max_tokens=None):
+        # ~2 characters per token is conservative for mixed Chinese/English text
+        chars = sum(len(m.get("content") or "") for m in messages)
+        return chars // 2 + (max_tokens or 512)
+
+    def _window_tokens(self, now):
+        while self.window and now - self.window[0][0] >= 60:
+            self.window.popleft()
+        return sum(entry[1] for entry in self.window)
+
+    def _reserve(self, tokens, deadline):
+        """Block until `tokens` fit in the per-minute budget; returns the window entry to correct later."""
+        if not self.tokens_per_minute:
+            return None
+        tokens = min(tokens, self.tokens_per_minute)  # A single oversized call must still be able to run
+        with self.cond:
+            while True:
+                now = time.time()
+                used = self._window_tokens(now)
+                if used + tokens <= self.tokens_per_minute:
+                    entry = [now, tokens]
+                    self.window.append(entry)
+                    return entry
+                if now >= deadline:
+                    raise LLMBusyError(f"LLM token budget exhausted ({used}/{self.tokens_per_minute} per minute)")
+                # Wake when the oldest entry leaves the window (or a correction frees budget)
+                self.cond.wait(min(deadline, self.window[0][0] + 60) - now)
+
+    def _settle(self, entry, usage):
+        total = getattr(usage, "total_tokens", None) if usage else None
+        if entry is None or total is None: return
+        with self.cond:
+            entry[1] = total
+            self.cond.notify_all()
+
+    # --- Calls ---
+
+    @contextmanager
+    def _slot(self, messages, label, max_tokens=None):
+        """Wait for budget and a concurrency slot (or raise LLMBusyError); yields the budget entry."""
+        start = time.time()
+        deadline = start + self.queue_timeout
+        with self.cond:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        entry = None
+        try:
+            entry = self._reserve(self.estimate_tokens(messages, max_tokens), deadline)
+            if not self.slots.acquire(timeout=max(0, deadline - time.time())):
+                raise LLMBusyError(f"No LLM slot within {self.queue_timeout}s ({self.max_concurrency} in flight)")
+        except LLMBusyError:
+            with self.cond:
+                self.queued -= 1
+                self.rejected += 1
+                if entry:
+                    entry[1] = 0  # Give the reservation back
+                    self.cond.notify_all()
+            raise
+
+        waited = time.time() - start
+        with self.cond:
+            self.queued -= 1
+            self.in_flight += 1
+            self.calls += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        if waited > 1:
+            logging.info(f"⏳ {label} waited {waited:.1f}s for an LLM slot")
+        try:
+            yield entry
+        except Exception:
+            with self.cond:
+                self.errors += 1
+            raise
+        finally:
+            self.slots.release()
+            with self.cond:
+                self.in_flight -= 1
+
+    def complete(self, messages, label="LLM", model=None, timeout=None, **kwargs):
+        """chat.completions.create through the shared limits; returns the raw response."""
+        with self._slot(messages, label, kwargs.get("max_tokens")) as entry:
+            response = self.client.chat.completions.create(
+                model=model or self.model,
+                messages=messages,
+                timeout=timeout or self.timeout,
+                **kwargs
+            )
+        self._settle(entry, getattr(response, "usage", None))
+        log_usage(label, response)
+        return response
+
+    def stream(self, messages, label="LLM", on_delta=None, model=None, timeout=None, delta_interval=0.3, **kwargs):
+        """
+        Streaming completion under the same limits; the slot is held until the
+        stream ends. on_delta(text_so_far) is called at most every
+        `delta_interval` seconds (callers re-parse the whole text, so not per
+        token). Returns the full text.
+        """
+        parts, usage, last_delta = [], None, 0.0
+        with self._slot(messages, label, kwargs.get("max_tokens")) as entry:
+            chunks = self.client.chat.completions.create(
+                model=model or self.model,
+                messages=messages,
+                timeout=timeout or self.timeout,
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            )
+            for chunk in chunks:
+                usage = getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta: continue
+                parts.append(delta)
+                now = time.time()
+                if on_delta and now - last_delta >= delta_interval:
+                    last_delta = now
+                    try:
+                        on_delta("".join(parts))
+                    except Exception as e:
+                        logging.error(f"❌ {label} stream callback failed: {e}")
+        self._settle(entry, usage)
+        log_usage(label, SimpleNamespace(usage=usage))
+        return "".join(parts)
+
+    def text(self, messages, label="LLM", **kwargs):
+        return self.complete(messages, label=label, **kwargs).choices[0].message.content
+
+    def stats(self):
+        with self.cond:
+            return {
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "max_queued": self.max_queued,
+                "calls": self.calls,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "avg_wait": round(self.wait_total / self.calls, 3) if self.calls else 0.0,
+                "max_wait": round(self.wait_max, 3),
+                "tokens_last_minute": self._window_tokens(time.time()),
+            }
@@ -1,43 +1,22 @@
 import json
 import logging
-import os
+import re
 from datetime import datetime
-from openai import OpenAI
+from services.llm_gateway import LLMGateway, complete_json_strings
+from services.llm_cache import LLMCache, cache_key, normalize_text
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 
-class LLMParser:
-    def __init__(self, api_key=None, base_url=None, model=None):
-        self.api_key = api_key
-        self.base_url = base_url
-        self.model = model or "gpt-3.5-turbo" # Default fallback, user can change to deepseek-chat etc.
-        self.client = None
-        
-        if self.api_key:
-            try:
-                self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
-                logging.info(f"🧠 LLM Client initialized (Model: {self.model})")
-            except Exception as e:
-                logging.error(f"❌ LLM Init failed: {e}")
+# Durations relative to the current minute ("2小时后", "in 30 minutes"): the answer changes within a day, never cached
+_RELATIVE_TIME_RE = re.compile(r"\d+\s*(?:个)?(?:分钟|小时|min|hour|hr)|半(?:个)?小时|一会|稍后|in (?:an?|\d+) (?:min|hour)", re.IGNORECASE)
 
-    def parse(self, text, context_user="unknown"):
-        """
-        解析用户指令，返回结构化 JSON
-        """
-        # 1. 如果没有 LLM 客户端，返回 None (让调用者回退到正则)
-        if not self.client:
-            logging.warning("⚠️ No LLM Client active. Fallback to Regex.")
-            return None
 
-        # 2. 构建 Prompt
-        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        system_prompt = f"""
+# Static prompts come first and stay byte-identical across requests, so the provider's
+# prefix (context) cache can reuse them; per-request context goes into the user message.
+PARSE_SYSTEM_PROMPT = """
 ### ROLE
 You are an intelligent Project Management Assistant for a Feishu/Lark group chat.
-Current Time: {current_date}
-User: {context_user}
 
 ### GOAL
 Analyze the user's natural language input, determine the Intent (Create, Update, or Query), and extract relevant entities into a strict JSON format.
@@ -69,7 +48,7 @@ Analyze the user's natural language input, determine the Intent (Create, Update,
    - *Default to "重要不紧急" if unsure.*
 3. **due_date**:
    - Convert relative dates (e.g., "next Friday", "tomorrow", "下周一", "tonight", "in 2 hours", "at 8pm") to `YYYY-MM-DD HH:MM:SS` (if time is specified) or `YYYY-MM-DD` (if only date).
-   - Base calculations on `Current Time`.
+   - Base calculations on `Current Time` from the CONTEXT block of the user message.
    - If no date is mentioned, return `null`.
 4. **keyword** (For updates):
    - Extract the **core subject** of the task being marked as done.
@@ -78,53 +57,133 @@ Analyze the user's natural language input, determine the Intent (Create, Update,
    - **Boolean**. Defaults to **false**.
    - Set to **true** ONLY if the user explicitly mentions keywords like: "task", "reminder", "alert", "群任务", "提醒我", "建个任务".
 
+6. **Multiple tasks**:
+   - One message may contain several tasks (e.g. "把登录bug和首页优化都完成了", or a pasted list).
+   - Emit ONE entry per task in `actions`, each with its own params. Never merge tasks into one task_name.
+
 ### OUTPUT SCHEMA (Strict JSON)
-{{
-  "action": "create" | "query" | "update_status",
-  "params": {{
-    "task_name": "string (Refined, clear content)",
-    "quadrant": "重要且紧急" | "重要不紧急" | "紧急不重要" | "不重要不紧急",
-    "due_date": "YYYY-MM-DD HH:MM:SS" or "YYYY-MM-DD" or null,
-    "owners": ["string (Extract @mentions or names if specifically assigned)"],
-    "keyword": "string (The target task subject for updates)",
-    "target_status": "已完成",
-    "create_native_task": boolean
-  }}
-}}
+{
+  "actions": [
+    {
+      "action": "create" | "query" | "update_status",
+      "params": {
+        "task_name": "string (Refined, clear content)",
+        "quadrant": "重要且紧急" | "重要不紧急" | "紧急不重要" | "不重要不紧急",
+        "due_date": "YYYY-MM-DD HH:MM:SS" or "YYYY-MM-DD" or null,
+        "owners": ["string (Extract @mentions or names if specifically assigned)"],
+        "keyword": "string (The target task subject for updates)",
+        "target_status": "已完成",
+        "create_native_task": boolean
+      }
+    }
+  ]
+}
 
 ### FEW-SHOT EXAMPLES
 U: "Server is down! Fix it immediately!"
-A: {{"action": "create", "params": {{"task_name": "Fix server down issue", "quadrant": "重要且紧急", "due_date": "{current_date}", "create_native_task": false}}}}
+A: {"actions": [{"action": "create", "params": {"task_name": "Fix server down issue", "quadrant": "重要且紧急", "due_date": "(Current Time)", "create_native_task": false}}]}
 
 U: "提醒我八点吃药"
-A: {{"action": "create", "params": {{"task_name": "八点吃药", "quadrant": "重要且紧急", "due_date": "(Calculate YYYY-MM-DD 08:00:00)", "create_native_task": true}}}}
+A: {"actions": [{"action": "create", "params": {"task_name": "八点吃药", "quadrant": "重要且紧急", "due_date": "(Calculate YYYY-MM-DD 08:00:00)", "create_native_task": true}}]}
 
 U: "把 '首页UI优化' 那个任务搞定了"
-A: {{"action": "update_status", "params": {{"keyword": "首页UI优化", "target_status": "已完成"}}}}
+A: {"actions": [{"action": "update_status", "params": {"keyword": "首页UI优化", "target_status": "已完成"}}]}
 
 U: "Read this article https://bit.ly/3x sometime next week, create a reminder."
-A: {{"action": "create", "params": {{"task_name": "Read article https://bit.ly/3x", "quadrant": "重要不紧急", "due_date": "(Calculate date for next week)", "create_native_task": true}}}}
+A: {"actions": [{"action": "create", "params": {"task_name": "Read article https://bit.ly/3x", "quadrant": "重要不紧急", "due_date": "(Calculate date for next week)", "create_native_task": true}}]}
 
 U: "建个群任务：明天下午开会"
-A: {{"action": "create", "params": {{"task_name": "明天下午开会", "quadrant": "紧急不重要", "due_date": "(Calculate date for tomorrow)", "create_native_task": true}}}}
+A: {"actions": [{"action": "create", "params": {"task_name": "明天下午开会", "quadrant": "紧急不重要", "due_date": "(Calculate date for tomorrow)", "create_native_task": true}}]}
+
+U: "把登录bug和首页优化都完成了"
+A: {"actions": [{"action": "update_status", "params": {"keyword": "登录bug", "target_status": "已完成"}}, {"action": "update_status", "params": {"keyword": "首页优化", "target_status": "已完成"}}]}
+
+U: "建任务：1. 写周报 2. 约客户A开会 3. 整理报销单"
+A: {"actions": [{"action": "create", "params": {"task_name": "写周报", "quadrant": "重要不紧急", "due_date": null, "create_native_task": false}}, {"action": "create", "params": {"task_name": "约客户A开会", "quadrant": "紧急不重要", "due_date": null, "create_native_task": false}}, {"action": "create", "params": {"task_name": "整理报销单", "quadrant": "紧急不重要", "due_date": null, "create_native_task": false}}]}
 
 U: "What tasks do I have?"
-A: {{"action": "query", "params": {{}}}}
+A: {"actions": [{"action": "query", "params": {}}]}
 """
 
+MATCH_SYSTEM_PROMPT = """
+### ROLE
+You are a Semantic Task Matcher.
+
+### GOAL
+Identify which task from the CANDIDATE LIST the user is referring to in their QUERY.
+
+### INPUT
+1. User Query: The user's natural language command.
+2. Candidate List: A list of available tasks.
+
+### RULES
+1. **Semantic Matching**: Look for meaning, not just keywords. "Fix login" matches "Login page exception".
+2. **Ambiguity**: If multiple tasks are very similar, pick the most plausible one or the one with higher urgency implied. If strictly impossible to distinguish, return null.
+3. **No Match**: If the user's query doesn't match ANY task, return null.
+4. **Strict JSON Output**: Return ONLY a JSON object with a single key "matched_id". Value is the ID string or null.
+"""
+
+
+class LLMParser:
+    PROMPT_VERSION = 3  # Bump when the parse/match prompts change, so cached answers are not reused
+
+    def __init__(self, api_key=None, base_url=None, model=None, cache=None, gateway=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model or "gpt-3.5-turbo" # Default fallback, user can change to deepseek-chat etc.
+        self.gateway = gateway  # Shared LLMGateway (pooled client + global limits)
+        self.cache = cache if cache is not None else LLMCache()
+        
+        if not self.gateway and self.api_key:
+            try:
+                self.gateway = LLMGateway(self.api_key, self.base_url, self.model)
+            except Exception as e:
+                logging.error(f"❌ LLM Init failed: {e}")
+        if self.gateway:
+            logging.info(f"🧠 LLM Client initialized (Model: {self.model})")
+
+    def parse(self, text, context_user="unknown"):
+        """
+        解析用户指令，返回结构化 JSON: {"actions": [{"action", "params"}]}
+        """
+        # 1. 如果没有 LLM 客户端，返回 None (让调用者回退到正则)
+        if not self.gateway:
+            logging.warning("⚠️ No LLM Client active. Fallback to Regex.")
+            return None
+
+        # 2. 缓存: 相同指令 + 用户 + 当天 (相对日期按天计算)
+        now = datetime.now()
+        key = None
+        if not _RELATIVE_TIME_RE.search(text):
+            key = cache_key("parse", self.PROMPT_VERSION, self.model, normalize_text(text), context_user, now.strftime("%Y-%m-%d"))
+            cached = self.cache.get(key)
+            if cached is not None:
+                logging.info(f"🧠 LLM Analysis (cached): {cached}")
+                return cached
+
+        # 3. 构建 Prompt: 动态上下文放在 user 消息里，system prompt 保持不变以命中前缀缓存
+        current_date = now.strftime("%Y-%m-%d %H:%M:%S")
+        user_prompt = f"### CONTEXT\nCurrent Time: {current_date}\nUser: {context_user}\n\n### INPUT\n{text}"
+
+
         try:
-            response = self.client.chat.completions.create(
+            response = self.gateway.complete(
+                label="Parse",
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
+                    {"role": "system", "content": PARSE_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt}
                 ],
                 response_format={"type": "json_object"}, # Require JSON mode if supported
                 temperature=0.1
             )
             content = response.choices[0].message.content
             result = json.loads(content)
+            # Accept the older single-action shape too
+            if "actions" not in result and result.get("action"):
+                result = {"actions": [result]}
             logging.info(f"🧠 LLM Analysis: {result}")
+            if key: self.cache.put(key, result)
             return result
         
         except Exception as e:
@@ -140,39 +199,28 @@ A: {{"action": "query", "params": {{}}}}
         Returns:
             str: The record_id of the matched task, or None.
         """
-        if not self.client or not candidate_tasks:
+        if not self.gateway or not candidate_tasks:
             return None
 
+        # Same query against the same candidate set -> same answer
+        candidates_hash = cache_key(sorted((t["id"], t["name"], t["status"]) for t in candidate_tasks))
+        key = cache_key("match", self.PROMPT_VERSION, self.model, normalize_text(user_query), candidates_hash)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logging.info(f"🎯 Semantic Match (cached): '{user_query}' -> {cached['matched_id']}")
+            return cached["matched_id"]
+
         # Format candidates for the prompt
         candidates_str = "\n".join([f"- [ID: {t['id']}] {t['name']} (Status: {t['status']})" for t in candidate_tasks])
 
-        system_prompt = f"""
-### ROLE
-You are a Semantic Task Matcher.
-
-### GOAL
-Identify which task from the CANDIDATE LIST the user is referring to in their QUERY.
-
-### INPUT
-1. User Query: The user's natural language command.
-2. Candidate List: A list of available tasks.
-
-### RULES
-1. **Semantic Matching**: Look for meaning, not just keywords. "Fix login" matches "Login page exception".
-2. **Ambiguity**: If multiple tasks are very similar, pick the most plausible one or the one with higher urgency implied. If strictly impossible to distinguish, return null.
-3. **No Match**: If the user's query doesn't match ANY task, return null.
-4. **Strict JSON Output**: Return ONLY a JSON object with a single key "matched_id". Value is the ID string or null.
-
-### CANDIDATE LIST
-{candidates_str}
-"""
 
         try:
-            response = self.client.chat.completions.create(
+            response = self.gateway.complete(
+                label="Match",
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"User Query: {user_query}"}
+                    {"role": "system", "content": MATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"### CANDIDATE LIST\n{candidates_str}\n\nUser Query: {user_query}"}
                 ],
                 response_format={"type": "json_object"},
                 temperature=0.0
@@ -180,16 +228,18 @@ Identify which task from the CANDIDATE LIST the user is referring to in their QU
             result = json.loads(response.choices[0].message.content)
             matched_id = result.get("matched_id")
             logging.info(f"🎯 Semantic Match: '{user_query}' -> {matched_id}")
+            self.cache.put(key, {"matched_id": matched_id})
             return matched_id
         except Exception as e:
             logging.error(f"❌ Semantic Match Error: {e}")
             return None
 
-    def analyze_rss(self, articles_text):
+    def analyze_rss(self, articles_text, on_progress=None):
         """
         Analyze RSS articles and return structured JSON.
+        on_progress(titles) streams the completion and reports the article titles received so far.
         """
-        if not self.client:
+        if not self.gateway:
             return None
 
         system_prompt = """
@@ -220,16 +270,28 @@ Identify which task from the CANDIDATE LIST the user is referring to in their QU
         user_prompt = f"Articles:\n{articles_text}"
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.3
-            )
-            return json.loads(response.choices[0].message.content)
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+            if on_progress:
+                content = self.gateway.stream(
+                    messages,
+                    label="RSS",
+                    on_delta=lambda buffer: on_progress(complete_json_strings(buffer, "title")),
+                    model=self.model,
+                    response_format={"type": "json_object"},
+                    temperature=0.3
+                )
+            else:
+                content = self.gateway.text(
+                    messages,
+                    label="RSS",
+                    model=self.model,
+                    response_format={"type": "json_object"},
+                    temperature=0.3
+                )
+            return json.loads(content)
         except Exception as e:
             logging.error(f"❌ RSS Analysis Error: {e}")
             return None
@@ -0,0 +1,398 @@
+import re
+
+# Feishu docx block types
+BLOCK_TEXT = 2
+BLOCK_HEADING_BASE = 2  # heading{n} = 2 + n
+BLOCK_BULLET = 12
+BLOCK_ORDERED = 13
+BLOCK_CODE = 14
+BLOCK_QUOTE = 15
+BLOCK_TODO = 17
+BLOCK_DIVIDER = 22
+BLOCK_TABLE = 31
+BLOCK_TABLE_CELL = 32
+
+# Subset of the docx code-block language enum
+CODE_LANGUAGES = {
+    "": 1, "text": 1, "plaintext": 1,
+    "bash": 7, "sh": 7, "c#": 8, "csharp": 8, "c++": 9, "cpp": 9, "c": 10, "css": 12,
+    "dockerfile": 18, "go": 22, "html": 24, "json": 28, "java": 29,
+    "javascript": 30, "js": 30, "kotlin": 32, "lua": 36, "makefile": 38, "markdown": 39, "md": 39,
+    "nginx": 40, "php": 43, "python": 49, "py": 49, "ruby": 52, "rust": 53,
+    "sql": 56, "scala": 57, "shell": 60, "swift": 61, "typescript": 63, "ts": 63,
+    "xml": 66, "yaml": 67, "yml": 67,
+}
+
+# `*italic*` and `__bold__` must not touch an ASCII word character outside the
+# delimiters ("2*3*4", "a__b__c"); CJK neighbours are fine ("这是*重点*内容").
+# A bare identifier between double underscores is a dunder name ("__init__"), not bold.
+_INLINE_RE = re.compile(
+    r"(?P<code>`+)(?P<code_body>.+?)(?P=code)"
+    r"|\*\*(?P<bold>.+?)\*\*"
+    r"|(?<![A-Za-z0-9_])__(?![A-Za-z0-9_]+__)(?P<bold2>.+?)__(?![A-Za-z0-9_])"
+    r"|~~(?P<strike>.+?)~~"
+    r"|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)\)"
+    r"|(?<![A-Za-z0-9_*])\*(?P<italic>[^\s*](?:.*?[^\s*])?)\*(?![A-Za-z0-9_*])"
+)
+_HEADING_RE = re.compile(r"^(#{1,9})\s+(.*?)\s*#*\s*$")
+_LIST_RE = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+(.*)$")
+_TODO_RE = re.compile(r"^\[([ xX])\]\s+(.*)$")
+_DIVIDER_RE = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)\s*([\w#+-]*)")
+_TABLE_SEP_RE = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+
+
+def parse_inline(text, style=None):
+    """
+    Parse inline Markdown into Feishu text elements, merging adjacent runs
+    that share a style so each block carries as few elements as possible.
+    """
+    runs = []
+    _collect_runs(text, style or {}, runs)
+
+    elements = []
+    last_style = None
+    for content, run_style in runs:
+        if not content: continue
+        if elements and run_style == last_style:
+            elements[-1]["text_run"]["content"] += content
+            continue
+        text_run = {"content": content}
+        if run_style:
+            text_run["text_element_style"] = dict(run_style)
+        elements.append({"type": 1, "text_run": text_run})
+        last_style = run_style
+    return elements or [{"type": 1, "text_run": {"content": ""}}]
+
+
+def _collect_runs(text, style, runs):
+    pos = 0
+    for m in _INLINE_RE.finditer(text):
+        if m.start() > pos:
+            runs.append((text[pos:m.start()], style))
+        if m.group("code_body") is not None:
+            runs.append((m.group("code_body"), {**style, "inline_code": True}))
+        elif m.group("bold") is not None or m.group("bold2") is not None:
+            _collect_runs(m.group("bold") or m.group("bold2"), {**style, "bold": True}, runs)
+        elif m.group("strike") is not None:
+            _collect_runs(m.group("strike"), {**style, "strikethrough": True}, runs)
+        elif m.group("link_text") is not None:
+            _collect_runs(m.group("link_text"), {**style, "link": {"url": m.group("link_url")}}, runs)
+        elif m.group("italic") is not None:
+            _collect_runs(m.group("italic"), {**style, "italic": True}, runs)
+        pos = m.end()
+    if pos < len(text):
+        runs.append((text[pos:], style))
+
+
+def _text_node(block_type, key, text, **extra):
+    return {"block_type": block_type, key: {"elements": parse_inline(text), **extra}}
+
+
+def _split_row(line):
+    line = line.strip()
+    if line.startswith("|"): line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"): line = line[:-1]
+    return [c.strip().replace("\\|", "|") for c in re.split(r"(?<!\\)\|", line)]
+
+
+class MarkdownCompiler:
+    """
+    Single-pass streaming compiler from Markdown to Feishu docx block trees.
+
+    Feed lines one at a time; completed top-level nodes are returned as soon as
+    they can no longer change. Nested blocks live under "children" in the same
+    format DocServiceV2.add_block_tree expects.
+    """
+
+    def __init__(self):
+        self._paragraph = []   # pending paragraph lines
+        self._quote = []       # pending quote lines
+        self._list_stack = []  # [(indent, node)]
+        self._list_root = None
+        self._code = None      # (fence, language, lines)
+        self._table = None     # list of rows
+        self._pending_header = None  # possible table header line
+
+    def compile(self, source):
+        """Generator over top-level nodes. source: a string or an iterable of lines."""
+        lines = source.splitlines() if isinstance(source, str) else source
+        for line in lines:
+            yield from self.feed(line.rstrip("\n"))
+        yield from self.close()
+
+    def feed(self, line):
+        out = []
+
+        # Code fences swallow everything until closed
+        if self._code is not None:
+            fence, language, body = self._code
+            if line.strip().startswith(fence):
+                out.append({
+                    "block_type": BLOCK_CODE,
+                    "code": {
+                        "elements": [{"type": 1, "text_run": {"content": "\n".join(body)}}],
+                        "style": {"language": CODE_LANGUAGES.get(language.lower(), 1)}
+                    }
+                })
+                self._code = None
+            else:
+                body.append(line)
+            return out
+
+        # Tables: a header line only becomes a table once the separator follows
+        if self._pending_header is not None:
+            header = self._pending_header
+            self._pending_header = None
+            if _TABLE_SEP_RE.match(line) and "-" in line:
+                self._flush_paragraph(out)
+                self._table = [_split_row(header)]
+                return out
+            self._paragraph.append(header.strip())
+        if self._table is not None:
+            if "|" in line and line.strip():
+                self._table.append(_split_row(line))
+                return out
+            self._flush_table(out)
+
+        stripped = line.strip()
+        if not stripped:
+            self._flush_all(out)
+            return out
+
+        fence = _FENCE_RE.match(line)
+        if fence:
+            self._flush_all(out)
+            self._code = (fence.group(1), fence.group(2), [])
+            return out
+
+        list_match = _LIST_RE.match(line)
+        if list_match and not _DIVIDER_RE.match(line):
+            self._flush_paragraph(out)
+            self._flush_quote(out)
+            self._add_list_item(list_match, out)
+            return out
+
+        if self._list_root is not None and line[:1].isspace():
+            # Lazy continuation of the current list item
+            node = self._list_stack[-1][1]
+            _append_inline(node[_block_key(node)]["elements"], "\n" + stripped)
+            return out
+
+        if _DIVIDER_RE.match(line):
+            self._flush_all(out)
+            out.append({"block_type": BLOCK_DIVIDER, "divider": {}})
+            return out
+
+        heading = _HEADING_RE.match(stripped)
+        if heading:
+            self._flush_all(out)
+            level = len(heading.group(1))
+            out.append(_text_node(BLOCK_HEADING_BASE + level, f"heading{level}", heading.group(2)))
+            return out
+
+        if stripped.startswith(">"):
+            self._flush_list(out)
+            self._flush_paragraph(out)
+            self._quote.append(stripped[1:].lstrip())
+            return out
+
+        self._flush_list(out)
+        self._flush_quote(out)
+        if "|" in stripped:
+            self._pending_header = line
+            return out
+        self._paragraph.append(stripped)
+        return out
+
+    def close(self):
+        out = []
+        if self._code is not None:
+            # Unterminated fence: close it at end of input
+            out.extend(self.feed(self._code[0]))
+        if self._pending_header is not None:
+            self._paragraph.append(self._pending_header.strip())
+            self._pending_header = None
+        self._flush_table(out)
+        self._flush_all(out)
+        return out
+
+    # --- Internal ---
+
+    def _add_list_item(self, m, out):
+        indent = len(m.group(1).expandtabs(4))
+        marker, content = m.group(2), m.group(3)
+
+        todo = _TODO_RE.match(content) if marker in "-*+" else None
+        if todo:
+            node = _text_node(BLOCK_TODO, "todo", todo.group(2), style={"done": todo.group(1) != " "})
+        elif marker in "-*+":
+            node = _text_node(BLOCK_BULLET, "bullet", content)
+        else:
+            node = _text_node(BLOCK_ORDERED, "ordered", content)
+
+        while self._list_stack and self._list_stack[-1][0] >= indent:
+            self._list_stack.pop()
+        if self._list_stack:
+            self._list_stack[-1][1].setdefault("children", []).append(node)
+        else:
+            if self._list_root is not None:
+                out.append(self._list_root)
+            self._list_root = node
+        self._list_stack.append((indent, node))
+
+    def _flush_list(self, out):
+        if self._list_root is not None:
+            out.append(self._list_root)
+        self._list_root = None
+        self._list_stack = []
+
+    def _flush_paragraph(self, out):
+        if self._paragraph:
+            out.append(_text_node(BLOCK_TEXT, "text", "\n".join(self._paragraph)))
+            self._paragraph = []
+
+    def _flush_quote(self, out):
+        if self._quote:
+            out.append(_text_node(BLOCK_QUOTE, "quote", "\n".join(self._quote)))
+            self._quote = []
+
+    def _flush_table(self, out):
+        if not self._table: return
+        rows = self._table
+        self._table = None
+        column_size = max(len(r) for r in rows)
+        cells = []
+        for row in rows:
+            for col in range(column_size):
+                text = row[col] if col < len(row) else ""
+                cells.append({
+                    "block_type": BLOCK_TABLE_CELL,
+                    "table_cell": {},
+                    "children": [_text_node(BLOCK_TEXT, "text", text)]
+                })
+        out.append({
+            "block_type": BLOCK_TABLE,
+            "table": {"property": {"row_size": len(rows), "column_size": column_size, "header_row": True}},
+            "children": cells
+        })
+
+    def _flush_all(self, out):
+        self._flush_list(out)
+        self._flush_quote(out)
+        self._flush_paragraph(out)
+
+
+def _block_key(node):
+    return next(k for k in node if k not in ("block_type", "children"))
+
+
+def _append_inline(elements, text):
+    new = parse_inline(text)
+    last = elements[-1]["text_run"] if elements else None
+    first = new[0]["text_run"]
+    if last is not None and last.get("text_element_style") == first.get("text_element_style"):
+        last["content"] += first["content"]
+        new = new[1:]
+    elements.extend(new)
+
+
+def compile_markdown(text):
+    """Compile a whole Markdown document into a list of top-level block nodes."""
+    return list(MarkdownCompiler().compile(text))
+
+
+# --- Rendering (block tree -> Markdown), used by the Drive import path ---
+
+_LANGUAGE_NAMES = {}
+for _name, _code in CODE_LANGUAGES.items():
+    _LANGUAGE_NAMES.setdefault(_code, _name)
+
+
+def render_inline(elements):
+    parts = []
+    for e in elements:
+        run = e.get("text_run")
+        if not run: continue
+        content = run.get("content", "")
+        style = run.get("text_element_style") or {}
+        if not content: continue
+        if style.get("inline_code"):
+            content = f"`{content}`"
+        else:
+            if style.get("bold"): content = f"**{content}**"
+            if style.get("italic"): content = f"*{content}*"
+            if style.get("strikethrough"): content = f"~~{content}~~"
+        if style.get("link"):
+            content = f"[{content}]({style['link'].get('url', '')})"
+        parts.append(content)
+    return "".join(parts)
+
+
+def render_markdown(nodes, image_urls=None):
+    """
+    Render a block tree back to Markdown. image_urls maps top-level node
+    indexes to the source URL of image placeholder blocks.
+    """
+    lines = []
+    for i, node in enumerate(nodes):
+        url = (image_urls or {}).get(i)
+        _render_node(node, lines, 0, url)
+    return "\n".join(lines).strip() + "\n"
+
+
+def _render_node(node, lines, depth, image_url=None):
+    key = _block_key(node)
+    body = node.get(key) or {}
+    indent = "  " * depth
+    children = node.get("children", [])
+
+    if key.startswith("heading"):
+        level = min(int(key[len("heading"):]), 6)
+        lines.extend([f"{'#' * level} {render_inline(body.get('elements', []))}", ""])
+    elif key in ("bullet", "ordered", "todo"):
+        if key == "bullet":
+            marker = "-"
+        elif key == "ordered":
+            marker = "1."
+        else:
+            marker = "- [x]" if body.get("style", {}).get("done") else "- [ ]"
+        text = render_inline(body.get("elements", [])).replace("\n", "\n" + indent + "  ")
+        lines.append(f"{indent}{marker} {text}")
+        for child in children:
+            _render_node(child, lines, depth + 1)
+        if depth == 0: lines.append("")
+    elif key == "code":
+        language = _LANGUAGE_NAMES.get(body.get("style", {}).get("language", 1), "")
+        lines.extend([f"```{language if language not in ('', 'text') else ''}",
+                      render_inline_plain(body.get("elements", [])), "```", ""])
+    elif key == "quote":
+        text = render_inline(body.get("elements", []))
+        lines.extend(["> " + l for l in text.split("\n")] + [""])
+    elif key == "divider":
+        lines.extend(["---", ""])
+    elif key == "image":
+        if image_url:
+            lines.extend([f"![image]({image_url})", ""])
+    elif key == "table":
+        column_size = body.get("property", {}).get("column_size", 1) or 1
+        cells = [" ".join(render_inline(c.get("text", {}).get("elements", [])) for c in cell.get("children", []))
+                 for cell in children]
+        rows = [cells[r:r + column_size] for r in range(0, len(cells), column_size)]
+        for r, row in enumerate(rows):
+            lines.append("| " + " | ".join(c.replace("|", "\\|") for c in row) + " |")
+            if r == 0:
+                lines.append("|" + "---|" * column_size)
+        lines.append("")
+    elif key == "callout":
+        for child in children:
+            sub = []
+            _render_node(child, sub, 0)
+            lines.extend("> " + l if l else ">" for l in sub)
+        lines.append("")
+    else:
+        lines.extend([render_inline(body.get("elements", [])), ""])
+
+
+def render_inline_plain(elements):
+    return "".join(e.get("text_run", {}).get("content", "") for e in elements)
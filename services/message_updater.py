@@ -0,0 +1,75 @@
+import logging
+import threading
+import time
+
+
+class ThrottledUpdater:
+    """
+    Progressive edits of one bot reply while an LLM response streams in.
+
+    `push(text)` only records the latest text; a worker thread edits the
+    message at most every `interval` seconds and only when at least
+    `min_chars` new characters arrived, so the stream is never blocked on
+    HTTP. Feishu allows a limited number of edits per message, so at most
+    `max_updates` edits are made in total and the last one is always kept
+    for `finish(final_text)`.
+    """
+
+    def __init__(self, im_service, msg_id, interval=1.5, min_chars=40, max_updates=18):
+        self.im = im_service
+        self.msg_id = msg_id
+        self.interval = interval
+        self.min_chars = min_chars
+        self.max_updates = max_updates
+        self.updates = 0
+        self.pending = None
+        self.sent = ""
+        self.last_sent_at = 0.0
+        self.done = False
+        self.cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"reply-updater-{msg_id}", daemon=True)
+        self._thread.start()
+
+    def push(self, text):
+        with self.cond:
+            if self.done: return
+            self.pending = text
+            self.cond.notify()
+
+    def _due(self):
+        """Seconds until the pending text may be sent, or None if there is nothing worth sending."""
+        if self.pending is None or self.updates >= self.max_updates - 1:
+            return None
+        # A short extension of what is already shown is not worth an edit (status lines always are)
+        if self.pending == self.sent or (self.pending.startswith(self.sent) and len(self.pending) - len(self.sent) < self.min_chars):
+            return None
+        return max(0.0, self.last_sent_at + self.interval - time.time())
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.done:
+                    wait = self._due()
+                    if wait == 0.0: break
+                    self.cond.wait(wait)
+                if self.done: return
+                text, self.pending = self.pending, None
+                self.updates += 1
+                self.last_sent_at = time.time()
+            self._send(text)
+
+    def _send(self, text):
+        try:
+            if self.im.update(self.msg_id, text):
+                self.sent = text
+        except Exception as e:
+            logging.error(f"❌ Progressive update of {self.msg_id} failed: {e}")
+
+    def finish(self, text):
+        """Stop streaming updates and write the final text (uses the reserved last edit)."""
+        with self.cond:
+            self.done = True
+            self.cond.notify()
+        self._thread.join(timeout=self.interval + 10)
+        logging.info(f"✍️ Reply {self.msg_id}: {self.updates} progressive update(s)")
+        return self.im.update(self.msg_id, text)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class MinutesCache:
+    """
+    SQLite cache of processed minutes, keyed by minutes token and transcript hash.
+    Stores the fetched transcript, the summary JSON and the created doc, plus
+    per-chunk map-reduce summaries keyed by chunk content hash.
+    """
+
+    def __init__(self, path="data/minutes_cache.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS minutes (
+                token TEXT NOT NULL,
+                transcript_hash TEXT NOT NULL,
+                transcript TEXT,
+                summary TEXT,
+                doc_id TEXT,
+                doc_title TEXT,
+                updated_at INTEGER,
+                PRIMARY KEY (token, transcript_hash)
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_summaries (
+                chunk_hash TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                updated_at INTEGER
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def transcript_hash(transcript):
+        return hashlib.sha256((transcript or "").encode("utf-8")).hexdigest()
+
+    def _row(self, row):
+        if not row: return None
+        return {
+            "token": row[0],
+            "transcript_hash": row[1],
+            "transcript": row[2],
+            "summary": json.loads(row[3]) if row[3] else None,
+            "doc_id": row[4],
+            "doc_title": row[5],
+            "updated_at": row[6],
+        }
+
+    _COLUMNS = "token, transcript_hash, transcript, summary, doc_id, doc_title, updated_at"
+
+    def latest(self, token):
+        """Most recent entry for a minutes token, or None."""
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {self._COLUMNS} FROM minutes WHERE token = ? ORDER BY updated_at DESC LIMIT 1", (token,)
+            ).fetchone()
+        return self._row(row)
+
+    def get(self, token, transcript_hash):
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {self._COLUMNS} FROM minutes WHERE token = ? AND transcript_hash = ?", (token, transcript_hash)
+            ).fetchone()
+        return self._row(row)
+
+    def put(self, token, transcript, summary=None, doc_id=None, doc_title=None, transcript_hash=None):
+        """transcript_hash: hash of the raw transcript when `transcript` is a compacted copy."""
+        h = transcript_hash or self.transcript_hash(transcript)
+        with self.lock:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO minutes ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (token, h, transcript, json.dumps(summary, ensure_ascii=False) if summary is not None else None,
+                 doc_id, doc_title, int(time.time()))
+            )
+            self.conn.commit()
+        return h
+
+    def get_chunk(self, chunk_hash):
+        with self.lock:
+            row = self.conn.execute("SELECT summary FROM chunk_summaries WHERE chunk_hash = ?", (chunk_hash,)).fetchone()
+        return row[0] if row else None
+
+    def put_chunk(self, chunk_hash, summary):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO chunk_summaries (chunk_hash, summary, updated_at) VALUES (?, ?, ?)",
+                (chunk_hash, summary, int(time.time()))
+            )
+            self.conn.commit()
@@ -1,17 +1,38 @@
+import hashlib
+import json
 import logging
 import re
+import sys
+import threading
 import requests
-from openai import OpenAI
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from services.transcript_compactor import TranscriptCompactor
+from services.llm_gateway import LLMGateway, partial_json_string
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 
+# One transcript segment; start/end in milliseconds
+Segment = namedtuple("Segment", ["start", "end", "speaker", "text"])
+
+class TranscriptFetchError(RuntimeError):
+    """A transcript page could not be fetched; the transcript would be incomplete."""
+
+
 class MinutesService:
-    def __init__(self, app_id, app_secret, llm_key, llm_base, llm_model):
+    def __init__(self, app_id, app_secret, llm_key, llm_base, llm_model, chunk_chars=15000, max_workers=4, topic_gap_seconds=8,
+                 compact=True, time_granularity=30, chunk_cache=None, gateway=None):
         self.app_id = app_id
         self.app_secret = app_secret
-        self.llm_client = OpenAI(api_key=llm_key, base_url=llm_base)
+        self.llm = gateway or LLMGateway(llm_key, llm_base, llm_model)  # Shared pooled client + global limits
         self.llm_model = llm_model
+        self.chunk_chars = chunk_chars  # Transcripts longer than this go through map-reduce
+        self.max_workers = max_workers  # Concurrency cap for chunk summaries
+        self.topic_gap_seconds = topic_gap_seconds  # Pause that counts as a topic boundary
+        self.compactor = TranscriptCompactor(granularity=time_granularity) if compact else None
+        self.last_compaction = None  # Stats of the most recent compaction
+        self.chunk_cache = chunk_cache  # MinutesCache: per-chunk summaries by content hash
 
     def get_tenant_token(self):
         url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
@@ -37,98 +58,339 @@ class MinutesService:
         except:
             return "00:00"
 
-    def fetch_subtitle(self, token):
+    def _speaker_name(self, item):
+        speaker = item.get("speaker") or item.get("speaker_name") or item.get("user_name")
+        if isinstance(speaker, dict):
+            speaker = speaker.get("user_name") or speaker.get("name")
+        # Spaces/colons would break the `[mm:ss] speaker: content` line format
+        return re.sub(r"[\s:：\[\]]", "", speaker) if isinstance(speaker, str) else None
+
+    def iter_segments(self, token, page_size=500):
+        """
+        Stream transcript segments page by page. Only one page of JSON is held
+        at a time; each item becomes a compact Segment(start, end, speaker, text)
+        with millisecond times (None for untimed fallback text).
+        Raises TranscriptFetchError if any page fails, so a partial transcript
+        is never mistaken for the whole meeting.
+        """
         access_token = self.get_tenant_token()
-        if not access_token: return None
+        if not access_token:
+            raise TranscriptFetchError("无法获取 tenant_access_token")
         
         # Use the new transcript endpoint
         url = f"https://open.feishu.cn/open-apis/minutes/v1/minutes/{token}/transcript"
         headers = {"Authorization": f"Bearer {access_token}"}
-        
-        try:
-            resp = requests.get(url, headers=headers)
+        page_token = None
+        page = 0
+
+        while True:
+            params = {"page_size": page_size}
+            if page_token:
+                params["page_token"] = page_token
+            page += 1
+            try:
+                resp = requests.get(url, headers=headers, params=params)
+            except Exception as e:
+                raise TranscriptFetchError(f"第 {page} 页请求异常: {e}") from e
             if resp.status_code != 200:
-                logging.error(f"❌ 获取妙记失败: Code {resp.status_code} - {resp.text}")
-                return None
-            
+                raise TranscriptFetchError(f"第 {page} 页获取失败: Code {resp.status_code} - {resp.text}")
+
             # Try to parse JSON
             try:
                 data = resp.json()
-                if data.get("code") != 0:
-                    logging.error(f"❌ 获取妙记API错误: {data}")
-                    return None
-                    
-                resp_data = data.get("data", {})
-                
-                # 1. Try to extract structured data with timestamps
-                # Potential fields: sentences, paragraph_list, list
-                candidates = ["sentences", "paragraph_list", "list"]
-                items = []
-                for key in candidates:
-                    if key in resp_data:
-                        items = resp_data[key]
-                        break
-                
-                if items and isinstance(items, list):
-                    full_text_with_time = []
-                    for item in items:
-                        content = item.get("content", "")
-                        # Timestamp fields can be start_time, start, stop_time, etc.
-                        start_ms = item.get("start_time") or item.get("start") or 0
-                        time_str = self._format_time(start_ms)
-                        full_text_with_time.append(f"[{time_str}] {content}")
-                    return "\n".join(full_text_with_time)
+            except Exception:
+                if page_token:
+                    raise TranscriptFetchError(f"第 {page} 页不是 JSON")
+                # Not JSON? Return raw text
+                for line in resp.text.split("\n"):
+                    yield Segment(None, None, None, line)
+                return
+
+            if data.get("code") != 0:
+                raise TranscriptFetchError(f"第 {page} 页 API 错误: {data}")
+            resp_data = data.get("data", {})
+            del data, resp
 
+            # 1. Structured data with timestamps
+            # Potential fields: sentences, paragraph_list, list
+            items = None
+            for key in ["sentences", "paragraph_list", "list"]:
+                if key in resp_data:
+                    items = resp_data[key]
+                    break
+
+            if items and isinstance(items, list):
+                for item in items:
+                    yield self._to_segment(item)
+            elif page_token is None:
                 # 2. Fallback to plain text fields if no list found
-                if "content" in resp_data:
-                    return resp_data["content"]
-                if "text" in resp_data:
-                    return resp_data["text"]
-                
-                # 3. Fallback: Return the string representation
-                return f"RAW_JSON_RESPONSE: {resp.text}"
-                
-            except Exception:
-                return resp.text # Not JSON? Return raw text
-                
-        except Exception as e:
-            logging.error(f"❌ 获取妙记异常: {e}")
+                text = resp_data.get("content") or resp_data.get("text")
+                if text is None:
+                    # 3. Fallback: Return the string representation
+                    text = f"RAW_JSON_RESPONSE: {json.dumps(resp_data, ensure_ascii=False)}"
+                for line in text.split("\n"):
+                    yield Segment(None, None, None, line)
+                return
+
+            if not resp_data.get("has_more") or not resp_data.get("page_token"):
+                return
+            page_token = resp_data.get("page_token")
+
+    def _to_segment(self, item):
+        # Timestamp fields can be start_time, start, stop_time, etc.
+        start = item.get("start_time") or item.get("start") or 0
+        end = item.get("stop_time") or item.get("end_time") or item.get("end") or start
+        speaker = self._speaker_name(item)
+        try:
+            start, end = int(start), int(end)
+        except (TypeError, ValueError):
+            start, end = 0, 0
+        # Speaker names repeat on every segment: intern them
+        return Segment(start, end, sys.intern(speaker) if speaker else None, item.get("content", ""))
+
+    def format_segment(self, seg):
+        if seg.start is None:
+            return seg.text
+        time_str = self._format_time(seg.start)
+        if seg.speaker:
+            return f"[{time_str}] {seg.speaker}: {seg.text}"
+        return f"[{time_str}] {seg.text}"
+
+    def stream_transcript(self, token):
+        """Formatted `[mm:ss] speaker: content` lines, generated as pages arrive."""
+        return (self.format_segment(seg) for seg in self.iter_segments(token))
+
+    def fetch_subtitle(self, token):
+        try:
+            text = "\n".join(self.stream_transcript(token))
+        except TranscriptFetchError as e:
+            logging.error(f"❌ 获取妙记失败: {e}")
             return None
+        return text or None
 
-    def summarize(self, text):
-        if not text: return {"title": "无标题", "content": "❌ 无法获取内容"}
-        
-        prompt = """
+    def fetch_compacted(self, token):
+        """
+        Stream transcript pages straight into the compactor, hashing the raw
+        lines on the way (same hash as MinutesCache.transcript_hash of the full
+        text). The raw transcript is never held in memory.
+        Returns (transcript_hash, text), or (None, None) if the fetch failed.
+        """
+        hasher = hashlib.sha256()
+        first = [True]
+
+        def hashed(lines):
+            for line in lines:
+                hasher.update((line if first[0] else "\n" + line).encode("utf-8"))
+                first[0] = False
+                yield line
+
+        try:
+            lines = hashed(self.stream_transcript(token))
+            if self.compactor:
+                text, self.last_compaction = self.compactor.compact(lines)
+            else:
+                text = "\n".join(lines)
+        except TranscriptFetchError as e:
+            logging.error(f"❌ 获取妙记失败: {e}")
+            return None, None
+        if first[0]:
+            return None, None  # Empty transcript
+        return hasher.hexdigest(), text
+
+    SUMMARY_PROMPT = """
 你是一个专业的会议纪要秘书。请根据以下会议录音文本（包含时间戳），整理出一份结构化的会议纪要。
 
 请务必严格按照以下 JSON 格式返回结果（不要包含 markdown 代码块标记，直接返回 JSON）：
 
 {
     "title": "一句话概括会议主题（15字以内，作为文件名）",
-    "content": "这里是完整的 Markdown 格式会议纪要内容，包含以下部分：\n1. **📌 核心议题**: ...\n2. **📝 关键细节**: ...\n3. **⏱️ 时间线回顾**: 按照话题切换，列出关键节点。格式如：`00:00 - 05:30 开场介绍及背景同步...`\n4. **✅ 待办事项 (Action Items)**: ...\n5. **💡 关键决策**: ..."
+    "content": "这里是完整的 Markdown 格式会议纪要内容，包含以下部分：\n1. **📌 核心议题**: ...\n2. **📝 关键细节**: ...\n3. **⏱️ 时间线回顾**: 按照话题切换，列出关键节点。格式如：`00:00 - 05:30 开场介绍及背景同步...`\n4. **✅ 待办事项 (Action Items)**: ...\n5. **💡 关键决策**: ...",
+    "action_items": [
+        {"task": "待办事项内容（简洁可执行）", "owner": "负责人姓名，未提及则为 null", "due_date": "YYYY-MM-DD，未提及则为 null", "quadrant": "重要且紧急" | "重要不紧急" | "紧急不重要" | "不重要不紧急"}
+    ]
 }
 
 ### 录音文本:
 """
-        content_input = text[:15000] 
+
+    CHUNK_PROMPT = """
+你是一个专业的会议纪要秘书。下面是一场长会议中的一段录音文本（包含时间戳），段号在文本开头注明。
+请只根据这一段，用 Markdown 要点输出（不要寒暄，不要编造）：
+- **时间范围**: 本段起止时间
+- **话题**: 按时间顺序列出讨论的话题，格式如 `00:00 - 05:30 话题...`
+- **细节**: 关键数据、观点和分歧
+- **待办**: 提到的 Action Items 及负责人、截止时间
+- **决策**: 本段达成的结论
+
+### 录音文本:
+"""
+
+    MAX_REDUCE_LEVELS = 3  # Intermediate reduce passes before the final summary
+
+    # Prepended to the user message (not the system prompt) so SUMMARY_PROMPT stays a stable cached prefix
+    REDUCE_PROMPT_PREFIX = """
+以下不是原始录音，而是同一场会议按时间顺序切分后的分段纪要。请合并去重，覆盖全部时间段。
+"""
+
+    def summarize(self, text, compact=True, on_progress=None):
+        """on_progress(markdown): optional callback with the partial summary while it streams in."""
+        if not text: return {"title": "无标题", "content": "❌ 无法获取内容"}
+
+        # Drop fillers / repeats and merge speaker turns before spending tokens
+        if compact and self.compactor:
+            text, self.last_compaction = self.compactor.compact(text)
+
+        # Short transcripts: single pass
+        if len(text) <= self.chunk_chars:
+            return self._summarize_single(text, on_progress=on_progress)
+
+        # Long transcripts: map (parallel chunk notes) -> reduce (final JSON)
+        try:
+            notes = self._map_chunks(self.split_transcript(text), on_progress)
+            # Very long meetings may need more than one reduce level; stop when notes no
+            # longer shrink (the LLM can return notes as long as their input) or after
+            # MAX_REDUCE_LEVELS, and let the final pass take what is left
+            size, levels = len("\n\n".join(notes)), 0
+            while size > self.chunk_chars and len(notes) > 1 and levels < self.MAX_REDUCE_LEVELS:
+                reduced = self._map_chunks(self._group_notes(notes), on_progress)
+                levels += 1
+                reduced_size = len("\n\n".join(reduced))
+                if not reduced or reduced_size >= size:
+                    logging.warning(f"⚠️ Reduce level {levels} did not shrink notes ({size} -> {reduced_size} chars), stopping")
+                    break
+                notes, size = reduced, reduced_size
+            return self._summarize_single("\n\n".join(notes), prefix=self.REDUCE_PROMPT_PREFIX, on_progress=on_progress)
+        except Exception as e:
+            return {"title": "错误", "content": f"❌ AI 总结失败: {e}"}
+
+    def split_transcript(self, text):
+        """
+        Split a `[mm:ss] content` transcript (a string or a stream of lines)
+        into chunks of at most chunk_chars, cutting at the first long pause
+        (a likely topic switch) once a chunk is past its soft limit, and never
+        inside a line. Cuts depend only on local content, so editing or
+        extending a transcript leaves the other chunks unchanged.
+        """
+        lines = text.split("\n") if isinstance(text, str) else text
+        chunks = []
+        current, size = [], 0
+        soft_limit = int(self.chunk_chars * 0.7)
+        prev_seconds = None
+
+        for line in lines:
+            seconds = self._parse_timestamp(line)
+            gap = seconds - prev_seconds if seconds is not None and prev_seconds is not None else 0
+            if seconds is not None:
+                prev_seconds = seconds
+
+            over_soft = size >= soft_limit and gap >= self.topic_gap_seconds
+            over_hard = size + len(line) + 1 > self.chunk_chars
+            if current and (over_soft or over_hard):
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            # A single line longer than a chunk is split by characters
+            while len(line) > self.chunk_chars:
+                chunks.append(line[:self.chunk_chars])
+                line = line[self.chunk_chars:]
+            current.append(line)
+            size += len(line) + 1
+
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def _parse_timestamp(self, line):
+        m = re.match(r"^\[(\d+):(\d{2})(?::(\d{2}))?\]", line)
+        if not m: return None
+        parts = [int(p) for p in m.groups() if p is not None]
+        seconds = 0
+        for p in parts:
+            seconds = seconds * 60 + p
+        return seconds
+
+    def _group_notes(self, notes):
+        groups, current, size = [], [], 0
+        for note in notes:
+            if current and size + len(note) > self.chunk_chars:
+                groups.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(note)
+            size += len(note) + 2
+        if current:
+            groups.append("\n\n".join(current))
+        return groups
+
+    def _chunk_hash(self, chunk):
+        # Prompt and model are part of the key so prompt changes invalidate old notes
+        raw = f"{self.llm_model}\n{self.CHUNK_PROMPT}\n{chunk}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _map_chunks(self, chunks, on_progress=None):
+        """
+        Summarize chunks in parallel. With a chunk cache, chunks whose content
+        hash was already summarized are reused, so a corrected or extended
+        transcript only re-summarizes the chunks that changed.
+        """
+        total = len(chunks)
+        hashes = [self._chunk_hash(c) for c in chunks]
+        notes = [self.chunk_cache.get_chunk(h) if self.chunk_cache else None for h in hashes]
+        todo = [i for i, n in enumerate(notes) if n is None]
+        logging.info(f"🧩 Summarizing {len(todo)}/{total} chunks (max {self.max_workers} in parallel, {total - len(todo)} cached)...")
+
+        done, lock = [total - len(todo)], threading.Lock()
+
+        def summarize(i):
+            note = self._summarize_chunk(chunks[i], i + 1, total)
+            if on_progress:
+                with lock:
+                    done[0] += 1
+                    on_progress(f"🧩 分段摘要 {done[0]}/{total} 完成...")
+            return note
+
+        if todo:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                results = list(pool.map(summarize, todo))
+            for i, note in zip(todo, results):
+                notes[i] = note
+                if note and self.chunk_cache:
+                    self.chunk_cache.put_chunk(hashes[i], note)
+
+        return [f"## 第 {i + 1}/{total} 段\n{n}" for i, n in enumerate(notes) if n]
+
+    def _summarize_chunk(self, chunk, index, total):
+        resp = self.llm.complete(
+            label=f"Minutes chunk {index}/{total}",
+            model=self.llm_model,
+            messages=[
+                {"role": "system", "content": self.CHUNK_PROMPT},
+                {"role": "user", "content": f"（第 {index}/{total} 段）\n{chunk}"}
+            ],
+            temperature=0.3
+        )
+        return resp.choices[0].message.content
+
+    def _summarize_single(self, content_input, prefix="", on_progress=None):
         try:
-            resp = self.llm_client.chat.completions.create(
-                model=self.llm_model,
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": content_input}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"} 
-            )
-            
-            import json
+            messages = [
+                {"role": "system", "content": self.SUMMARY_PROMPT},
+                {"role": "user", "content": prefix + content_input}
+            ]
+            if on_progress:
+                # Stream and surface the "content" field as soon as it starts arriving
+                def on_delta(buffer):
+                    content = partial_json_string(buffer, "content")
+                    if content: on_progress(content)
+                raw_content = self.llm.stream(messages, label="Minutes summary", on_delta=on_delta, model=self.llm_model,
+                                              temperature=0.3, response_format={"type": "json_object"})
+            else:
+                raw_content = self.llm.text(messages, label="Minutes summary", model=self.llm_model,
+                                            temperature=0.3, response_format={"type": "json_object"})
+
             try:
-                result = json.loads(resp.choices[0].message.content)
+                result = json.loads(raw_content)
                 return result
             except json.JSONDecodeError:
                 # Fallback if LLM doesn't return valid JSON
-                raw_content = resp.choices[0].message.content
                 return {
                     "title": "会议纪要",
                     "content": raw_content
@@ -136,4 +398,3 @@ class MinutesService:
 
         except Exception as e:
             return {"title": "错误", "content": f"❌ AI 总结失败: {e}"}
-
@@ -0,0 +1,147 @@
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, time as dt_time
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+
+class ReminderScheduler:
+    """
+    Due-date reminders driven by a min-heap of (remind_at, record_id).
+
+    The worker thread sleeps until the earliest reminder and is woken early
+    when an earlier one is added. Task changes arrive through `on_task_changed`
+    (registered as a TaskIndex listener), so there is no table polling here.
+    Changed or completed tasks leave stale heap entries behind; they are
+    dropped when they reach the top (lazy deletion), keeping updates O(log n).
+
+    Sent reminders are kept in a JSON file at `state_path`, so a restart does
+    not send them again. Date-only due dates (midnight in `timezone`, the
+    configured TIMEZONE; system local if empty) count as the end of that day.
+    """
+
+    def __init__(self, im_service, lead_minutes=30, grace_minutes=60, state_path=None, timezone=None):
+        self.im = im_service
+        self.tz = ZoneInfo(timezone) if timezone and ZoneInfo else None
+        self.lead = lead_minutes * 60
+        self.grace = grace_minutes * 60  # Reminders later than this (e.g. after downtime) are skipped
+        self.state_path = state_path
+        self.heap = []
+        self.scheduled = {}  # record_id -> (remind_at, name, owners, due_ms, date_only)
+        self.fired = self._load_fired()  # record_id -> remind_at already sent, so resyncs/restarts don't repeat it
+        self.cond = threading.Condition()
+        self._thread = None
+
+    def _load_fired(self):
+        if not self.state_path: return {}
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.error(f"Read reminder state failed: {e}")
+            return {}
+
+    def _save_fired(self):
+        # Called with self.cond held
+        if not self.state_path: return
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.fired, f)
+            os.replace(tmp, self.state_path)
+        except Exception as e:
+            logging.error(f"Save reminder state failed: {e}")
+
+    def on_task_changed(self, record_id, record):
+        """Listener for task updates; record is None when the task was deleted."""
+        entry = self._entry(record) if record else None
+        with self.cond:
+            if not entry:
+                self.scheduled.pop(record_id, None)
+                if self.fired.pop(record_id, None) is not None:
+                    self._save_fired()
+                return
+            if self.fired.get(record_id) == entry[0]:
+                return
+            current = self.scheduled.get(record_id)
+            if current and current[0] == entry[0]:
+                self.scheduled[record_id] = entry  # Same time: just refresh name/owners
+                return
+            self.scheduled[record_id] = entry
+            heapq.heappush(self.heap, (entry[0], record_id))
+            if self.heap[0][1] == record_id:
+                self.cond.notify()  # New earliest reminder: re-arm the sleep
+
+    def _entry(self, record):
+        f = record.fields or {}
+        due = f.get("截止日期")
+        owners = [o.get("id") for o in f.get("负责人") or [] if isinstance(o, dict) and o.get("id")]
+        if not due or not owners or f.get("状态") == "已完成":
+            return None
+        name = f.get("任务描述")
+        if isinstance(name, list):
+            name = "".join(item.get("text", "") for item in name if isinstance(item, dict))
+        due = int(due)
+        # Date-only due dates are stored as midnight in the table's timezone: due by the end of that day
+        date_only = datetime.fromtimestamp(due / 1000, self.tz).time() == dt_time(0)
+        deadline = due / 1000 + (86400 - 60 if date_only else 0)
+        return (deadline - self.lead, name or "", owners, due, date_only)
+
+    def _next_due(self):
+        """Block until a reminder is due; return (record_id, entry)."""
+        with self.cond:
+            while True:
+                if not self.heap:
+                    self.cond.wait()
+                    continue
+                remind_at, record_id = self.heap[0]
+                entry = self.scheduled.get(record_id)
+                if not entry or entry[0] != remind_at:
+                    heapq.heappop(self.heap)  # Stale: task changed, completed or deleted
+                    continue
+                now = time.time()
+                if remind_at > now:
+                    self.cond.wait(remind_at - now)
+                    continue
+                heapq.heappop(self.heap)
+                del self.scheduled[record_id]
+                self.fired[record_id] = remind_at
+                self._save_fired()
+                if now - remind_at > self.grace:
+                    logging.info(f"⏰ Skipping stale reminder for {record_id}")
+                    continue
+                return record_id, entry
+
+    def _remind(self, record_id, entry):
+        _, name, owners, due, date_only = entry
+        due_str = datetime.fromtimestamp(due / 1000, self.tz).strftime("%Y-%m-%d" if date_only else "%Y-%m-%d %H:%M")
+        text = f"⏰ 任务即将到期\n📌 {name}\n📅 截止: {due_str}"
+        for owner in owners:
+            self.im.send(owner, text, receive_id_type="open_id")
+        logging.info(f"⏰ Reminded {len(owners)} owner(s) of {record_id}")
+
+    def run(self):
+        while True:
+            record_id, entry = self._next_due()
+            try:
+                self._remind(record_id, entry)
+            except Exception as e:
+                logging.error(f"❌ Reminder for {record_id} failed: {e}")
+
+    def start(self, records=()):
+        """Load existing tasks (AppTableRecords) and start the worker thread."""
+        for r in records:
+            self.on_task_changed(r.record_id, r)
+        logging.info(f"⏰ Reminder scheduler started with {len(self.scheduled)} pending reminders")
+        self._thread = threading.Thread(target=self.run, name="task-reminders", daemon=True)
+        self._thread.start()
@@ -14,7 +14,8 @@ class RSSService:
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
 
-    def fetch_and_summarize(self):
+    def fetch_and_summarize(self, on_progress=None):
+        """on_progress(text): optional status callback while the LLM analysis streams in."""
         if not self.feeds:
             return "⚠️ 未配置 RSS 订阅源 (config.json -> FEEDS)"
 
@@ -67,7 +68,12 @@ class RSSService:
             articles_text += f"Index: {i}\nSource: {art['source']}\nTitle: {art['title']}\nLink: {art['link']}\nSummary: {art['summary'][:300]}\n\n"
 
         # 5. LLM Analyze
-        analysis = self.llm.analyze_rss(articles_text)
+        report = None
+        if on_progress:
+            on_progress(f"📰 已抓取 {len(articles)} 篇文章，AI 正在整理...")
+            report = lambda titles: on_progress(
+                f"📰 已抓取 {len(articles)} 篇文章，AI 已整理 {len(titles)} 篇:\n" + "\n".join(f"- {t}" for t in titles))
+        analysis = self.llm.analyze_rss(articles_text, on_progress=report)
         if not analysis:
             return "❌ AI 分析失败，请查看日志。"
 
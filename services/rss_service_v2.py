@@ -4,19 +4,26 @@ import logging
 import requests
 import re
 from datetime import datetime, timedelta
+from urllib.parse import unquote
 from bs4 import BeautifulSoup
+from services.image_service import ImageOptimizer
 
 class RSSServiceV2:
+    TOC_HEADING = "今日更新目录"
+
     def __init__(self, config, llm_service, doc_service):
         self.feeds = config.FEEDS
         self.llm = llm_service
         self.doc = doc_service
         self.time_window = timedelta(hours=24)
+        self.image_optimizer = ImageOptimizer.from_config(config)
+        self.append_mode = config.DIGEST_APPEND_MODE
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
 
-    def fetch_and_summarize(self):
+    def fetch_and_summarize(self, on_progress=None):
+        """on_progress(text): optional status callback while the LLM analysis streams in."""
         if not self.feeds:
             return "⚠️ 未配置 RSS 订阅源 (config.json -> FEEDS)"
 
@@ -50,99 +57,193 @@ class RSSServiceV2:
         logging.info(f"✅ Fetched {len(articles)} articles.")
         if not articles: return "📭 过去 24 小时没有新内容。"
 
+        date_str = now.strftime("%Y-%m-%d")
+        doc_title = f"📅 AI 早报 - {date_str}"
+
+        # Append mode: reuse today's doc and only process articles it doesn't have yet
+        existing = self._load_existing_digest(doc_title) if self.append_mode else None
+        if existing and self._resume_pending(existing):
+            existing = self._load_existing_digest(doc_title)
+        if existing:
+            articles = [a for a in articles if unquote(a['link']) not in existing['links']]
+            logging.info(f"📎 Today's digest exists ({existing['doc_id']}), {len(articles)} new articles to append.")
+            if not articles:
+                return self._build_message(date_str, existing['toc_lines'], existing['doc_id'])
+
         # LLM Analyze
         articles_text = ""
         for i, art in enumerate(articles):
             articles_text += f"Index: {i}\nSource: {art['source']}\nTitle: {art['title']}\nLink: {art['link']}\nSummary: {art['summary'][:300]}\n\n"
 
-        analysis = self.llm.analyze_rss(articles_text)
+        report = None
+        if on_progress:
+            on_progress(f"📰 已抓取 {len(articles)} 篇新文章，AI 正在整理...")
+            report = lambda titles: on_progress(
+                f"📰 已抓取 {len(articles)} 篇新文章，AI 已整理 {len(titles)} 篇:\n" + "\n".join(f"- {t}" for t in titles))
+        analysis = self.llm.analyze_rss(articles_text, on_progress=report)
         if not analysis: return "❌ AI 分析失败。"
 
-        # Create Doc
-        date_str = now.strftime("%Y-%m-%d")
-        doc_title = f"📅 AI 早报 - {date_str}"
-        doc_id = self.doc.create_document(doc_title)
-        if not doc_id: return "❌ 文档创建失败。"
-
         # 2. Build Blocks & Track Images
-        blocks = []
-        image_map = {} # { block_index: img_url }
-        toc_message_lines = [] # To store TOC for chat message
-        
-        analyzed_items = analysis.get("articles", [])
-        
+        start_number = len(existing['toc_lines']) if existing else 0
+        toc_blocks, detail_blocks, image_map, toc_message_lines = self._build_sections(
+            analysis.get("articles", []), articles, start_number)
+
+        if existing:
+            return self._append_to_digest(existing, toc_blocks, detail_blocks, image_map, toc_message_lines, date_str)
+
         # --- SECTION 1: Table of Contents (Updated "Daily Insight" area) ---
-        if analyzed_items:
-            blocks.append(self.doc.create_heading_block("今日更新目录", 2))
-            
-            for i, item in enumerate(analyzed_items):
-                idx = item.get("original_index")
-                if idx is None or idx >= len(articles): continue
-                
-                author = item.get("author", articles[idx].get("source", "Unknown"))
-                title = item.get("title", articles[idx]["title"])
-                
-                # Format: 1. [Author] Title
-                toc_line = f"{i+1}. [{author}] {title}"
-                    
-                blocks.append(self.doc.create_text_block(toc_line))
-                toc_message_lines.append(toc_line)
-                
+        blocks = []
+        if toc_blocks:
+            blocks.append(self.doc.create_heading_block(self.TOC_HEADING, 2))
+            blocks.extend(toc_blocks)
             blocks.append(self.doc.create_divider_block())
 
         # --- SECTION 2: Article Details ---
-        for item in analyzed_items:
-            # ... (rest is same)
+        offset = len(blocks)
+        blocks.extend(detail_blocks)
+        image_map = {offset + k: v for k, v in image_map.items()}
+
+        # 3a. Large digests: render locally and create the whole doc in one import
+        if self.doc.should_import(blocks):
+            doc_id = self._import_digest(doc_title, blocks, image_map)
+            if doc_id:
+                return self._build_message(date_str, toc_message_lines, doc_id)
+            logging.warning("⚠️ Import failed, falling back to block writes.")
+
+        # 3b. Create Doc & Add Blocks (single descendant request for a typical digest)
+        # (an unfinished doc from a failed run is completed with its own content and images instead)
+        meta = {"image_map": image_map, "toc_lines": toc_message_lines}
+        doc_id, created_ids, meta = self.doc.write_document(doc_title, blocks, meta=meta,
+                                                            resume_key=f"rss-digest:{date_str}")
+        if not doc_id: return "❌ 文档创建失败。"
+        if not created_ids: return "❌ 内容写入失败，重试将从中断处继续。"
+
+        # 4. Upload & Replace Images (The 3-step fix)
+        self._upload_images(doc_id, created_ids, self._image_map(meta))
+
+        return self._build_message(date_str, meta.get("toc_lines", toc_message_lines), doc_id)
+
+    IMAGE_MARKER = "{{{{image:{}}}}}"  # Stands in for an image in imported Markdown
+    _IMAGE_MARKER_RE = re.compile(r"\{\{image:(\d+)\}\}")
+
+    def _import_digest(self, doc_title, blocks, image_map):
+        """
+        Import path for large digests. Markdown import would only link the source
+        images, so each image placeholder is rendered as a marker line; after the
+        import every marker is swapped for an image block that gets the same
+        optimized upload as the block path.
+        """
+        nodes = [self.doc.create_text_block(self.IMAGE_MARKER.format(i)) if i in image_map else b
+                 for i, b in enumerate(blocks)]
+        doc_id = self.doc.import_document(doc_title, self.doc.render_markdown(nodes))
+        if not doc_id or not image_map: return doc_id
+
+        doc_blocks = self.doc.list_blocks(doc_id)
+        page = next((b for b in doc_blocks or [] if b.get("block_id") == doc_id), None)
+        if not page:
+            logging.warning(f"⚠️ Could not read imported digest {doc_id}, images skipped.")
+            return doc_id
+        texts = {b.get("block_id"): "".join(e.get("text_run", {}).get("content", "") for e in self._block_elements(b))
+                 for b in doc_blocks}
+
+        created_ids = [None] * len(blocks)
+        children = page.get("children", [])
+        # Bottom-up, so positions above the current marker stay valid
+        for pos in range(len(children) - 1, -1, -1):
+            m = self._IMAGE_MARKER_RE.fullmatch(texts.get(children[pos], "").strip())
+            if not m or int(m.group(1)) not in image_map: continue
+            ids = self.doc.add_block_tree(doc_id, [self.doc.create_image_block(None)], index=pos)
+            if not ids: continue
+            self.doc.delete_children(doc_id, doc_id, pos + 1, pos + 2)
+            created_ids[int(m.group(1))] = ids[0]
+
+        self._upload_images(doc_id, created_ids, image_map)
+        return doc_id
+
+    def _image_map(self, meta):
+        # Journaled meta went through JSON: block indexes come back as strings
+        return {int(k): v for k, v in ((meta or {}).get("image_map") or {}).items()}
+
+    def _resume_pending(self, existing):
+        """Finish writes a failed append left on today's digest (images and TOC lines included)."""
+        doc_id = existing["doc_id"]
+        resumed = self.doc.resume_writes(doc_id)
+        if not resumed: return False
+        logging.info(f"♻️ Finished {len(resumed)} interrupted write(s) on {doc_id}")
+        for created_ids, meta in resumed:
+            self._upload_images(doc_id, created_ids, self._image_map(meta))
+            if (meta or {}).get("toc_blocks"):
+                self.doc.add_block_tree(doc_id, meta["toc_blocks"], index=existing["toc_end"])
+        return True
+
+    def _build_sections(self, analyzed_items, articles, start_number=0):
+        """Returns (toc_blocks, detail_blocks, image_map, toc_lines); image_map indexes detail_blocks."""
+        toc_blocks = []
+        detail_blocks = []
+        image_map = {} # { block_index: img_url }
+        toc_message_lines = [] # To store TOC for chat message
+
+        for i, item in enumerate(analyzed_items):
             idx = item.get("original_index")
             if idx is None or idx >= len(articles): continue
             original_art = articles[idx]
-            
-            # Title (Clickable H3)
+
+            author_name = item.get("author", original_art.get("source", "Unknown"))
             title_text = f"{item.get('title', original_art['title'])}"
-            blocks.append(self.doc.create_heading_block(title_text, 3, link_url=original_art['link']))
+
+            # TOC Format: 1. [Author] Title
+            toc_line = f"{start_number + i + 1}. [{author_name}] {title_text}"
+            toc_blocks.append(self.doc.create_text_block(toc_line))
+            toc_message_lines.append(toc_line)
+
+            # Title (Clickable H3)
+            detail_blocks.append(self.doc.create_heading_block(title_text, 3, link_url=original_art['link']))
             
             # Meta info: Author & Category
-            author_name = item.get("author", original_art.get("source", "Unknown"))
             category = item.get("category", "General")
             meta_text = f"👤 {author_name} | 🏷️ {category}"
-            blocks.append(self.doc.create_text_block(meta_text)) 
+            detail_blocks.append(self.doc.create_text_block(meta_text)) 
             
             # Image Placeholder (Create empty image block)
             img_url = original_art.get('image')
             if img_url:
-                blocks.append(self.doc.create_image_block(None))
-                image_map[len(blocks) - 1] = img_url # Track index in the flat list
+                detail_blocks.append(self.doc.create_image_block(None))
+                image_map[len(detail_blocks) - 1] = img_url # Track index in the flat list
             
             # Summary (Text) - Use RSS Original Content (Cleaned)
             summary_text = original_art.get("summary", "无内容")
-            blocks.append(self.doc.create_text_block(summary_text))
+            detail_blocks.append(self.doc.create_text_block(summary_text))
             
             # Link (Explicit)
-            blocks.append(self.doc.create_text_block("🔗 阅读原文", original_art['link']))
+            detail_blocks.append(self.doc.create_text_block("🔗 阅读原文", original_art['link']))
             
             # Divider
-            blocks.append(self.doc.create_divider_block())
+            detail_blocks.append(self.doc.create_divider_block())
 
-        # 3. Add Blocks to Doc
-        created_blocks = self.doc.add_content(doc_id, blocks)
-        if not created_blocks: return "❌ 内容写入失败。"
+        return toc_blocks, detail_blocks, image_map, toc_message_lines
 
-        # 4. Upload & Replace Images (The 3-step fix)
+    def _upload_images(self, doc_id, created_ids, image_map):
         logging.info(f"🖼️ Starting image upload for {len(image_map)} images...")
         
-        # ... (image upload loop same as before)
+        bytes_before = 0
+        bytes_after = 0
         for blk_idx, img_url in image_map.items():
-            if blk_idx >= len(created_blocks): continue
+            if blk_idx >= len(created_ids): continue
             
-            block_id = created_blocks[blk_idx].get("block_id")
+            block_id = created_ids[blk_idx]
             if not block_id: continue
             
             # Download Real Image
             try:
                 down = requests.get(img_url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
                 if down.status_code == 200:
+                    # Downscale / re-encode before upload
+                    img_data, file_name = self.image_optimizer.optimize(down.content)
+                    bytes_before += len(down.content)
+                    bytes_after += len(img_data)
+
                     # Upload using block_id as parent (Step 2)
-                    real_token = self.doc.upload_file("image.jpg", down.content, "docx_image", block_id)
+                    real_token = self.doc.upload_file(file_name, img_data, "docx_image", block_id)
                     
                     if real_token:
                         # Update Block (Step 3)
@@ -150,6 +251,78 @@ class RSSServiceV2:
             except Exception as e:
                 logging.error(f"Failed to process image {img_url}: {e}")
 
+        if bytes_before:
+            saved = bytes_before - bytes_after
+            logging.info(f"🖼️ Image bytes: {bytes_before} -> {bytes_after} (saved {saved}, {saved * 100 // bytes_before}%)")
+
+    # --- Incremental Append Mode ---
+
+    def _load_existing_digest(self, doc_title):
+        """
+        Look up today's digest doc and read back its article links and TOC.
+        Returns None if there is no doc or its layout isn't recognized.
+        """
+        doc_id = self.doc.find_document_by_title(doc_title)
+        if not doc_id: return None
+        blocks = self.doc.list_blocks(doc_id)
+        if not blocks: return None
+
+        by_id = {b.get("block_id"): b for b in blocks}
+        top_level = by_id.get(doc_id, {}).get("children", [])
+
+        links = set()
+        toc_lines = []
+        toc_end = None
+        in_toc = False
+        for pos, block_id in enumerate(top_level):
+            block = by_id.get(block_id, {})
+            block_type = block.get("block_type")
+            elements = self._block_elements(block)
+            text = "".join(e.get("text_run", {}).get("content", "") for e in elements)
+
+            if block_type == 4 and text.strip() == self.TOC_HEADING:
+                in_toc = True
+            elif in_toc:
+                if block_type == 22:
+                    toc_end = pos
+                    in_toc = False
+                elif block_type == 2:
+                    toc_lines.append(text)
+                elif block_type == 13:  # Imported docs turn "1. ..." lines into ordered items
+                    toc_lines.append(f"{len(toc_lines) + 1}. {text}")
+            elif block_type == 5:
+                for e in elements:
+                    url = ((e.get("text_run", {}).get("text_element_style") or {}).get("link") or {}).get("url")
+                    if url: links.add(unquote(url))
+
+        if toc_end is None:
+            logging.warning(f"⚠️ Digest {doc_id} has no recognizable TOC, creating a new one.")
+            return None
+        return {"doc_id": doc_id, "links": links, "toc_lines": toc_lines, "toc_end": toc_end}
+
+    def _block_elements(self, block):
+        for key, value in block.items():
+            if isinstance(value, dict) and "elements" in value:
+                return value["elements"]
+        return []
+
+    def _append_to_digest(self, existing, toc_blocks, detail_blocks, image_map, toc_message_lines, date_str):
+        doc_id = existing["doc_id"]
+        if not detail_blocks:
+            return self._build_message(date_str, existing["toc_lines"], doc_id)
+
+        # Details go at the end, then the new TOC lines right before the divider closing the TOC.
+        # Details first: their links are what the next run diffs against.
+        # The TOC lines ride along in the journal so a resumed detail write can still insert them
+        created_ids = self.doc.add_block_tree(doc_id, detail_blocks,
+                                              meta={"image_map": image_map, "toc_blocks": toc_blocks})
+        if not created_ids: return "❌ 内容写入失败，重试将从中断处继续。"
+        self.doc.add_block_tree(doc_id, toc_blocks, index=existing["toc_end"])
+
+        self._upload_images(doc_id, created_ids, image_map)
+        return self._build_message(date_str, existing["toc_lines"] + toc_message_lines, doc_id)
+
+    def _build_message(self, date_str, toc_message_lines, doc_id):
         doc_url = f"https://feishu.cn/docx/{doc_id}"
         
         # Construct final message
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+
+from lark_oapi.api.bitable.v1.model import AppTableRecord
+
+
+class TaskIndex:
+    """
+    In-memory copy of the task table, keyed by owner and status.
+
+    Kept in sync by incremental pulls (records modified since the last sync,
+    filtered on `modified_field`) plus a periodic full reload to drop deleted
+    records. Reads never see data older than `max_staleness` seconds; writes
+    made through TaskService are applied immediately (write-through).
+    """
+
+    DAY_MS = 86400 * 1000
+
+    def __init__(self, task_service, max_staleness=30, full_sync_interval=600, modified_field="最后更新时间"):
+        self.task = task_service
+        self.max_staleness = max_staleness
+        self.full_sync_interval = full_sync_interval
+        self.modified_field = modified_field
+        self.lock = threading.RLock()
+        self.sync_lock = threading.Lock()
+        self.records = {}  # record_id -> AppTableRecord
+        self.by_owner = {}  # open_id -> {status: set(record_id)}
+        self.last_sync = 0  # Seconds, time the last successful sync started
+        self.last_full_sync = 0
+        self.listeners = []  # callables(record_id, record or None), told about every change
+        self._thread = None
+
+    # --- Index maintenance ---
+
+    def _keys(self, record):
+        f = record.fields or {}
+        status = f.get("状态") or "待办"
+        return [(o.get("id"), status) for o in f.get("负责人") or [] if isinstance(o, dict) and o.get("id")]
+
+    def _unindex(self, record_id):
+        old = self.records.pop(record_id, None)
+        if not old: return
+        for owner, status in self._keys(old):
+            ids = self.by_owner.get(owner, {}).get(status)
+            if ids:
+                ids.discard(record_id)
+
+    def _notify(self, record_id, record):
+        for listener in self.listeners:
+            try:
+                listener(record_id, record)
+            except Exception as e:
+                logging.error(f"❌ Task index listener failed: {e}")
+
+    def upsert(self, record):
+        with self.lock:
+            self._unindex(record.record_id)
+            self.records[record.record_id] = record
+            for owner, status in self._keys(record):
+                self.by_owner.setdefault(owner, {}).setdefault(status, set()).add(record.record_id)
+        self._notify(record.record_id, record)
+
+    def upsert_fields(self, record_id, fields):
+        """Write-through for a created record or a partial update."""
+        with self.lock:
+            old = self.records.get(record_id)
+            merged = dict(old.fields) if old else {}
+            merged.update(fields)
+            self.upsert(AppTableRecord.builder().record_id(record_id).fields(merged).build())
+
+    def remove(self, record_id):
+        with self.lock:
+            self._unindex(record_id)
+        self._notify(record_id, None)
+
+    # --- Sync ---
+
+    def sync(self, full=False):
+        """Pull changes from Bitable. Falls back to a full reload when an incremental pull fails."""
+        with self.sync_lock:
+            started = time.time()
+            full = full or not self.last_sync or not self.modified_field \
+                or started - self.last_full_sync >= self.full_sync_interval
+            try:
+                if not full:
+                    try:
+                        self._incremental_sync()
+                    except Exception as e:
+                        # Usually a missing modified-time field: stop trying incremental pulls
+                        logging.warning(f"⚠️ Incremental task sync failed ({e}), using full reloads from now on")
+                        self.modified_field = None
+                        full = True
+                if full:
+                    self._full_sync()
+                    self.last_full_sync = started
+            except Exception as e:
+                logging.error(f"❌ Task index sync failed: {e}")
+                return False
+            self.last_sync = started
+            return True
+
+    def _full_sync(self):
+        records = list(self.task.iter_records(field_names=self.task.task_fields, automatic_fields=True))
+        with self.lock:
+            deleted = set(self.records) - {r.record_id for r in records}
+            self.records = {}
+            self.by_owner = {}
+            for r in records:
+                self.upsert(r)
+        for record_id in deleted:
+            self._notify(record_id, None)
+        logging.info(f"🗂️ Task index loaded: {len(records)} records")
+
+    def _incremental_sync(self):
+        # ExactDate filters compare whole days and isGreater excludes the given day, so
+        # pass noon of the day before the last sync: everything modified on the last
+        # sync's day (in any table timezone within ±12h) is re-read; upserts are idempotent.
+        day_start = time.mktime(time.localtime(self.last_sync)[:3] + (0, 0, 0, 0, 0, -1))
+        since = int(day_start * 1000) - self.DAY_MS // 2
+        changed = 0
+        for r in self.task.iter_records(
+            conditions=[(self.modified_field, "isGreater", ["ExactDate", str(since)])],
+            field_names=self.task.task_fields,
+            automatic_fields=True
+        ):
+            self.upsert(r)
+            changed += 1
+        logging.debug(f"🗂️ Task index refreshed: {changed} changed records")
+
+    def ensure_fresh(self):
+        if time.time() - self.last_sync > self.max_staleness:
+            self.sync()
+
+    def start(self):
+        """Initial load, then keep the index within max_staleness in the background."""
+        self.sync(full=True)
+
+        def loop():
+            while True:
+                # Refresh ahead of the bound so reads rarely have to sync inline
+                time.sleep(max(1, self.max_staleness / 2))
+                self.sync()
+
+        self._thread = threading.Thread(target=loop, name="task-index-sync", daemon=True)
+        self._thread.start()
+
+    # --- Queries ---
+
+    def open_tasks(self, open_id, exclude_status="已完成"):
+        """Same result as TaskService.iter_open_tasks, from memory."""
+        self.ensure_fresh()
+        with self.lock:
+            ids = set()
+            for status, status_ids in self.by_owner.get(open_id, {}).items():
+                if status != exclude_status:
+                    ids |= status_ids
+            tasks = [self.records[i] for i in ids]
+        tasks.sort(key=lambda r: r.fields.get("截止日期") or 0, reverse=True)
+        return tasks
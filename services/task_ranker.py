@@ -0,0 +1,83 @@
+import math
+import re
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"[一-鿿]+|[a-z0-9]+")
+
+
+def tokenize(text):
+    """Chinese runs -> character unigrams + bigrams; latin/digits -> lowercase words."""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if "一" <= run[0] <= "鿿":
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class TaskRanker:
+    """
+    BM25 over character n-grams, scoring a user's candidate tasks against a
+    keyword. Used to pick an obvious match without the LLM, or to cut the
+    candidate list down to the top K before asking it.
+    """
+
+    def __init__(self, k1=1.2, b=0.75, margin=2.0, min_score=1.0, min_coverage=0.6):
+        self.k1 = k1
+        self.b = b
+        self.margin = margin  # Top score must beat the runner-up by this factor
+        self.min_score = min_score
+        self.min_coverage = min_coverage  # Share of query n-grams the winner must contain
+
+    def rank(self, query, candidates, key="name"):
+        """Return [(score, candidate)] best first."""
+        docs = [tokenize(c.get(key)) for c in candidates]
+        if not docs:
+            return []
+        avg_len = sum(len(d) for d in docs) / len(docs) or 1
+        df = Counter()
+        for d in docs:
+            df.update(set(d))
+        n = len(docs)
+        q_terms = set(tokenize(query))
+
+        ranked = []
+        for c, d in zip(candidates, docs):
+            tf = Counter(d)
+            score = 0.0
+            for t in q_terms:
+                if t not in tf: continue
+                idf = math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+                score += idf * tf[t] * (self.k1 + 1) / (tf[t] + self.k1 * (1 - self.b + self.b * len(d) / avg_len))
+            ranked.append((score, c))
+        ranked.sort(key=lambda x: x[0], reverse=True)
+        return ranked
+
+    def clear_winner(self, query, ranked, key="name"):
+        """The candidate that needs no LLM: the only one containing the query, or a dominant BM25 score."""
+        if not ranked:
+            return None
+        query = (query or "").strip().lower()
+        if query:
+            exact = [c for _, c in ranked if query in (c.get(key) or "").lower()]
+            if len(exact) == 1:
+                return exact[0]
+        top = ranked[0][0]
+        second = ranked[1][0] if len(ranked) > 1 else 0.0
+        if top >= self.min_score and top >= second * self.margin and self._covers(query, ranked[0][1].get(key)):
+            return ranked[0][1]
+        return None
+
+    def _covers(self, query, text):
+        """Most of the query's n-grams appear in the text, including a bigram when the query has one."""
+        q_terms = set(tokenize(query))
+        if not q_terms:
+            return False
+        terms = set(tokenize(text))
+        hits = q_terms & terms
+        bigrams = {t for t in q_terms if len(t) == 2 and "一" <= t[0] <= "鿿"}
+        if bigrams and not bigrams & terms:
+            return False
+        return len(hits) >= self.min_coverage * len(q_terms)
@@ -1,10 +1,16 @@
 import logging
+import threading
+import time
 import requests
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from services.task_ranker import TaskRanker
 from lark_oapi.api.bitable.v1.model import (
     CreateAppTableRecordRequest, AppTableRecord,
     SearchAppTableRecordRequest, SearchAppTableRecordRequestBody,
-    UpdateAppTableRecordRequest
+    UpdateAppTableRecordRequest,
+    BatchCreateAppTableRecordRequest, BatchCreateAppTableRecordRequestBody,
+    BatchUpdateAppTableRecordRequest, BatchUpdateAppTableRecordRequestBody,
+    FilterInfo, Condition, Sort
 )
 
 class TaskService:
@@ -17,6 +23,16 @@ class TaskService:
         self.app_id = config.APP_ID
         self.app_secret = config.APP_SECRET
         self.bot_open_id = None
+        self.index = None  # TaskIndex (optional), set up in main
+        self.snapshot = None  # TaskSnapshot (optional), for 周报/统计
+        self.ranker = TaskRanker()
+        self.match_top_k = config.TASK_MATCH_TOP_K  # Candidates sent to the LLM matcher
+        self.guid_field = config.TASK_GUID_FIELD  # Text field holding the linked native task guid
+        self.task_fields = self.TASK_FIELDS + ([self.guid_field] if self.guid_field else [])
+        self.pool = ThreadPoolExecutor(max_workers=4)  # Concurrent Bitable / Task API writes
+        self.token_lock = threading.Lock()
+        self._token = None
+        self._token_expire = 0
 
     def get_bot_id(self):
         # Lazy load Bot ID
@@ -40,21 +56,60 @@ class TaskService:
                 return "".join([item.get("text", "") for item in field_value])
         return str(field_value) if field_value else ""
 
+    SEARCH_PAGE_SIZE = 500  # Max page size of the Bitable search API
+    TASK_FIELDS = ["任务描述", "四象限", "状态", "负责人", "截止日期"]
+
+    def iter_records(self, conditions=None, field_names=None, sort=None, page_size=SEARCH_PAGE_SIZE, automatic_fields=False):
+        """
+        Stream records matching the filter, page by page.
+        conditions: [(field_name, operator, [values])], AND-ed server side.
+        sort: [(field_name, desc)].
+        automatic_fields: also return created_time / last_modified_time.
+        """
+        body = SearchAppTableRecordRequestBody.builder().automatic_fields(automatic_fields)
+        if conditions:
+            body = body.filter(FilterInfo.builder().conjunction("and").conditions([
+                Condition.builder().field_name(f).operator(op).value(v).build() for f, op, v in conditions
+            ]).build())
+        if field_names:
+            body = body.field_names(field_names)
+        if sort:
+            body = body.sort([Sort.builder().field_name(f).desc(desc).build() for f, desc in sort])
+        body = body.build()
+
+        page_token = None
+        while True:
+            builder = SearchAppTableRecordRequest.builder().app_token(self.app_token).table_id(self.table_id) \
+                .page_size(page_size).request_body(body)
+            if page_token:
+                builder = builder.page_token(page_token)
+            resp = self.client.bitable.v1.app_table_record.search(builder.build())
+            if not resp.success():
+                raise RuntimeError(f"Bitable search failed: {resp.code} - {resp.msg}")
+
+            for item in resp.data.items or []:
+                yield item
+            if not resp.data.has_more:
+                return
+            page_token = resp.data.page_token
+
+    def iter_open_tasks(self, open_id, exclude_status="已完成"):
+        """The user's tasks not in exclude_status, latest deadline first."""
+        if self.index and self.index.last_sync:  # Index loaded at least once
+            return self.index.open_tasks(open_id, exclude_status)
+        return self.iter_records(
+            conditions=[("负责人", "contains", [open_id]), ("状态", "isNot", [exclude_status])],
+            field_names=self.task_fields,
+            sort=[("截止日期", True)]
+        )
+
     def handle_query(self, open_id):
-        req = SearchAppTableRecordRequest.builder().app_token(self.app_token).table_id(self.table_id).request_body(SearchAppTableRecordRequestBody.builder().build()).build()
-        resp = self.client.bitable.v1.app_table_record.search(req)
-        if not resp.success(): return "❌ 查询失败"
-        
-        items = resp.data.items or []
-        my_tasks = []
-        for item in items:
-            fields = item.fields
-            if fields.get("状态") == "已完成": continue
-            owners = fields.get("负责人", [])
-            if any(o.get("id") == open_id for o in owners):
-                my_tasks.append(item)
-        
-        my_tasks.sort(key=lambda x: x.fields.get("截止日期", 0) or 0, reverse=True)
+        try:
+            my_tasks = list(self.iter_open_tasks(open_id))
+        except Exception as e:
+            logging.error(f"❌ Query tasks failed: {e}")
+            return "❌ 查询失败"
+
         if not my_tasks: return "🎉 无待办任务"
         
         msg = ["📋 **待办任务:**"]
@@ -64,63 +119,146 @@ class TaskService:
             msg.append(f"- [{f.get('状态','待办')}] {name} ({f.get('四象限','P1')})")
         return "\n".join(msg)
 
-    def handle_update_status(self, open_id, keyword, target_status="已完成"):
-        req = SearchAppTableRecordRequest.builder().app_token(self.app_token).table_id(self.table_id).request_body(SearchAppTableRecordRequestBody.builder().build()).build()
-        resp = self.client.bitable.v1.app_table_record.search(req)
-        if not resp.success(): return "❌ 查找失败"
-        
+    def _report_snapshot(self):
+        """The snapshot, refreshed from Bitable first when no TaskIndex keeps it current."""
+        if not self.index:
+            self.snapshot.load(self.iter_records(field_names=self.task_fields, automatic_fields=True))
+        return self.snapshot
+
+    def handle_stats(self):
+        if not self.snapshot: return "⚠️ 未启用任务统计"
+        try:
+            return self._report_snapshot().stats_text()
+        except Exception as e:
+            logging.error(f"❌ Task stats failed: {e}")
+            return "❌ 统计失败"
+
+    def weekly_report_markdown(self):
+        """Weekly report (完成、负责人、四象限、逾期、吞吐) as Markdown, or None."""
+        if not self.snapshot: return None
+        return self._report_snapshot().weekly_report_markdown()
+
+    def _collect_candidates(self, open_id, exclude_status):
+        """The user's tasks NOT in exclude_status, as match candidates (filtered server side)."""
         candidates = []
-        # 1. Collect all candidates for this user that are NOT in target status
-        for item in resp.data.items or []:
+        for item in self.iter_open_tasks(open_id, exclude_status=exclude_status):
             f = item.fields
-            current_status = f.get("状态")
-            if current_status != target_status and any(o.get("id")==open_id for o in f.get("负责人",[])):
-                name = self.get_text_value(f.get("任务描述"))
-                candidates.append({
-                    "id": item.record_id,
-                    "name": name,
-                    "status": current_status,
-                    "item": item
-                })
-        
-        target_record_id = None
-        target_task_name = ""
+            candidates.append({
+                "id": item.record_id,
+                "name": self.get_text_value(f.get("任务描述")),
+                "status": f.get("状态"),
+                "item": item
+            })
+        return candidates
 
-        # 2. Strategy A: Semantic Match via LLM
+    def _match_candidate(self, keyword, candidates):
+        """Resolve a keyword to one candidate: local pre-rank, then LLM on the top K, then containment."""
+        # 1. Local pre-rank: take an obvious match directly, otherwise narrow the list for the LLM
+        ranked = self.ranker.rank(keyword or "", candidates)
+        winner = self.ranker.clear_winner(keyword, ranked)
+        if winner:
+            logging.info(f"🎯 Local match: '{keyword}' -> {winner['id']}")
+            return winner
+
+        # 2. Strategy A: Semantic Match via LLM (top K only)
         if self.llm and candidates:
+            top = [c for _, c in ranked[:self.match_top_k]]
             # Pass user keyword (query) and candidates to LLM
-            matched_id = self.llm.match_task(keyword, [{"id": c["id"], "name": c["name"], "status": c["status"]} for c in candidates])
+            matched_id = self.llm.match_task(keyword, [{"id": c["id"], "name": c["name"], "status": c["status"]} for c in top])
             if matched_id:
-                target_record_id = matched_id
-                # Find name for response
-                for c in candidates:
+                # Ignore ids the LLM made up
+                for c in top:
                     if c["id"] == matched_id:
-                        target_task_name = c["name"]
-                        break
+                        return c
 
         # 3. Strategy B: Fallback to simple keyword containment (if LLM fails or returns None)
-        if not target_record_id:
+        if keyword:
             for c in candidates:
                 if keyword in c["name"]:
-                    target_record_id = c["id"]
-                    target_task_name = c["name"]
-                    break
-        
-        if not target_record_id: 
+                    return c
+        return None
+
+    def handle_update_status(self, open_id, keyword, target_status="已完成"):
+        try:
+            candidates = self._collect_candidates(open_id, target_status)
+        except Exception as e:
+            logging.error(f"❌ Search tasks failed: {e}")
+            return "❌ 查找失败"
+
+        target = self._match_candidate(keyword, candidates)
+        if not target: 
             return f"🔍 未找到匹配任务: '{keyword}'"
         
-        # 4. Update
-        up_req = UpdateAppTableRecordRequest.builder().app_token(self.app_token).table_id(self.table_id).record_id(target_record_id).request_body(AppTableRecord.builder().fields({"状态": target_status}).build()).build()
+        # Update
+        up_req = UpdateAppTableRecordRequest.builder().app_token(self.app_token).table_id(self.table_id).record_id(target["id"]).request_body(AppTableRecord.builder().fields({"状态": target_status}).build()).build()
         if self.client.bitable.v1.app_table_record.update(up_req).success():
-            return f"✅ 状态更新为[{target_status}]: {target_task_name}"
+            if self.index: self.index.upsert_fields(target["id"], {"状态": target_status})
+            msg = f"✅ 状态更新为[{target_status}]: {target['name']}"
+            native = self._sync_native_status([target], target_status)
+            return f"{msg}\n{native}" if native else msg
         return "❌ 更新失败"
 
+    def batch_update(self, updates):
+        """
+        Update many records with batch_update (one round trip per 500 records).
+        updates: [(record_id, fields)]. Returns a success flag per update.
+        """
+        results = []
+        for i in range(0, len(updates), self.BATCH_LIMIT):
+            chunk = updates[i:i + self.BATCH_LIMIT]
+            records = [AppTableRecord.builder().record_id(rid).fields(fields).build() for rid, fields in chunk]
+            req = BatchUpdateAppTableRecordRequest.builder().app_token(self.app_token).table_id(self.table_id) \
+                .request_body(BatchUpdateAppTableRecordRequestBody.builder().records(records).build()).build()
+            resp = self.client.bitable.v1.app_table_record.batch_update(req)
+            if resp.success():
+                for rid, fields in chunk:
+                    if self.index: self.index.upsert_fields(rid, fields)
+                results.extend([True] * len(chunk))
+            else:
+                logging.error(f"❌ Batch update failed: {resp.code} - {resp.msg}")
+                results.extend([False] * len(chunk))
+        return results
+
+    def handle_batch_update_status(self, open_id, keywords, target_status="已完成"):
+        """Mark several tasks at once: match every keyword, then one batch_update. Reports per keyword."""
+        try:
+            candidates = self._collect_candidates(open_id, target_status)
+        except Exception as e:
+            logging.error(f"❌ Search tasks failed: {e}")
+            return "❌ 查找失败"
+
+        lines = [f"📋 **批量更新为[{target_status}]:**"]
+        updates, targets, seen = [], [], set()
+        for keyword in keywords:
+            target = self._match_candidate(keyword, [c for c in candidates if c["id"] not in seen])
+            if not target:
+                lines.append(f"🔍 未找到匹配任务: '{keyword}'")
+                continue
+            seen.add(target["id"])
+            updates.append((target["id"], {"状态": target_status}))
+            targets.append(target)
+
+        done = []
+        for target, ok in zip(targets, self.batch_update(updates)):
+            lines.append(f"✅ {target['name']}" if ok else f"❌ 更新失败: {target['name']}")
+            if ok: done.append(target)
+        native = self._sync_native_status(done, target_status)
+        if native: lines.append(native)
+        return "\n".join(lines)
+
+    def get_tenant_token(self):
+        """Tenant token, cached until shortly before it expires."""
+        with self.token_lock:
+            if not self._token or time.time() > self._token_expire:
+                url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
+                t_resp = requests.post(url, json={"app_id": self.app_id, "app_secret": self.app_secret})
+                data = t_resp.json()
+                self._token = data.get("tenant_access_token")
+                self._token_expire = time.time() + data.get("expire", 7200) - 300
+            return self._token
+
     def create_native_task(self, task_name, due_ts, owner_ids):
-        # 获取Token
-        url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal"
-        t_resp = requests.post(url, json={"app_id": self.app_id, "app_secret": self.app_secret})
-        token = t_resp.json().get("tenant_access_token")
-        
+        """Create a Task V2 task. Returns its guid, or None."""
         url_task = "https://open.feishu.cn/open-apis/task/v2/tasks"
         payload = {
             "summary": task_name, 
@@ -129,13 +267,13 @@ class TaskService:
         if due_ts: payload["due"] = {"timestamp": str(due_ts)}
         
         try:
-            r = requests.post(url_task, headers={"Authorization": f"Bearer {token}"}, json=payload)
+            r = requests.post(url_task, headers={"Authorization": f"Bearer {self.get_tenant_token()}"}, json=payload, timeout=10)
             logging.info(f"🔗 Create Native Task Response: Code={r.status_code}, Body={r.text}")
             
             if r.status_code == 200:
                 res_json = r.json()
                 if res_json.get("code") == 0:
-                    return "(原生任务✅)"
+                    return res_json.get("data", {}).get("task", {}).get("guid") or ""
                 else:
                     logging.error(f"❌ Create Native Task API Error: {res_json}")
             else:
@@ -143,16 +281,118 @@ class TaskService:
                 
         except Exception as e:
             logging.error(f"❌ Create Native Task Exception: {e}")
-        return "(原生任务❌)"
+        return None
 
-    def handle_create(self, task_name, quadrant, due_ts, owner_ids, create_native=False):
+    def update_native_task_status(self, guid, completed):
+        """Complete (or reopen) a native task. Returns True on success."""
+        url = f"https://open.feishu.cn/open-apis/task/v2/tasks/{guid}"
+        payload = {"task": {"completed_at": str(int(time.time() * 1000)) if completed else "0"}, "update_fields": ["completed_at"]}
+        try:
+            r = requests.patch(url, headers={"Authorization": f"Bearer {self.get_tenant_token()}"}, json=payload, timeout=10)
+            if r.status_code == 200 and r.json().get("code") == 0:
+                return True
+            logging.error(f"❌ Update Native Task {guid} failed: {r.status_code} - {r.text}")
+        except Exception as e:
+            logging.error(f"❌ Update Native Task Exception: {e}")
+        return False
+
+    def _sync_native_status(self, candidates, target_status):
+        """Mirror a Bitable status change onto the linked native tasks, in parallel."""
+        if not self.guid_field: return ""
+        guids = [self.get_text_value(c["item"].fields.get(self.guid_field)) for c in candidates if c.get("item")]
+        guids = [g for g in guids if g]
+        if not guids: return ""
+        results = list(self.pool.map(lambda g: self.update_native_task_status(g, target_status == "已完成"), guids))
+        return "(原生任务✅)" if all(results) else f"(原生任务 {sum(results)}/{len(results)} 同步成功)"
+
+    def _store_guids(self, pairs):
+        """Write native task guids back onto their records: [(record_id, guid)]."""
+        if not self.guid_field or not pairs: return
+        self.batch_update([(rid, {self.guid_field: guid}) for rid, guid in pairs])
+
+    def build_fields(self, task_name, quadrant, due_ts, owner_ids, priority=None):
         fields = {"任务描述": task_name, "四象限": quadrant, "状态": "待办", "负责人": [{"id": o} for o in owner_ids]}
         if due_ts: fields["截止日期"] = due_ts
-        
+        if priority: fields["优先级"] = priority  # Single-select option: 高 / 中 / 低
+        return fields
+
+    BATCH_LIMIT = 500  # Max records per Bitable batch request
+
+    def batch_create(self, rows):
+        """
+        Create many records with batch_create (one round trip per 500 rows).
+        rows: [{"task_name", "quadrant", "due_ts", "owner_ids", "priority"?}]
+        Returns the created record_ids, or None for rows in a failed batch.
+        """
+        record_ids = []
+        for i in range(0, len(rows), self.BATCH_LIMIT):
+            chunk = rows[i:i + self.BATCH_LIMIT]
+            records = [AppTableRecord.builder().fields(self.build_fields(
+                r["task_name"], r.get("quadrant") or "重要不紧急", r.get("due_ts"), r["owner_ids"],
+                r.get("priority"))).build() for r in chunk]
+            req = BatchCreateAppTableRecordRequest.builder().app_token(self.app_token).table_id(self.table_id) \
+                .request_body(BatchCreateAppTableRecordRequestBody.builder().records(records).build()).build()
+            resp = self.client.bitable.v1.app_table_record.batch_create(req)
+            if resp.success():
+                for r in resp.data.records or []:
+                    record_ids.append(r.record_id)
+                    if self.index: self.index.upsert(r)
+            else:
+                logging.error(f"❌ Batch create failed: {resp.code} - {resp.msg}")
+                record_ids.extend([None] * len(chunk))
+        return record_ids
+
+    def handle_batch_create(self, rows):
+        """Create several tasks: one batch_create, with native tasks created alongside. Reports per task."""
+        native_rows = [i for i, r in enumerate(rows) if r.get("create_native")]
+        records_future = self.pool.submit(self.batch_create, rows)
+        native_futures = {i: self.pool.submit(self.create_native_task, rows[i]["task_name"], rows[i].get("due_ts"), rows[i]["owner_ids"])
+                          for i in native_rows}
+        record_ids = records_future.result()
+        guids = {i: f.result() for i, f in native_futures.items()}
+        self._store_guids([(record_ids[i], g) for i, g in guids.items() if record_ids[i] and g])
+
+        lines = [f"🗂️ 批量建任务 ({len(rows)})"]
+        for i, (row, record_id) in enumerate(zip(rows, record_ids)):
+            line = f"{'📌' if record_id else '❌'} {row['task_name']} ({row.get('quadrant') or '重要不紧急'})"
+            if i in guids:
+                line += " (原生任务✅)" if guids[i] is not None else " (原生任务❌)"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def handle_import(self, rows, skipped=0):
+        """Bulk import (pasted list / CSV / XLSX): batch_create in chunks, summary reply instead of one line per task."""
+        record_ids = self.batch_create(rows)
+        failed = [r["task_name"] for r, rid in zip(rows, record_ids) if not rid]
+        lines = [f"📥 批量导入完成: ✅ {len(rows) - len(failed)} 条" + (f", ❌ {len(failed)} 条失败" if failed else "")]
+        if skipped:
+            lines.append(f"⚠️ 跳过 {skipped} 行 (无法识别)")
+        lines.extend(f"❌ {name}" for name in failed[:10])
+        if len(failed) > 10:
+            lines.append(f"... 另有 {len(failed) - 10} 条失败")
+        return "\n".join(lines)
+
+    def _create_record(self, fields):
         req = CreateAppTableRecordRequest.builder().app_token(self.app_token).table_id(self.table_id).request_body(AppTableRecord.builder().fields(fields).build()).build()
         resp = self.client.bitable.v1.app_table_record.create(req)
-        
-        msg = f"✅ 任务已建\n📌 {task_name}\n🎯 {quadrant}"
+        if not resp.success():
+            logging.error(f"❌ Create record failed: {resp.code} - {resp.msg}")
+            return None
+        if self.index:
+            self.index.upsert(resp.data.record)
+        return resp.data.record.record_id
+
+    def handle_create(self, task_name, quadrant, due_ts, owner_ids, create_native=False):
+        fields = self.build_fields(task_name, quadrant, due_ts, owner_ids)
+
+        # Bitable record and native task are independent writes: issue them together
+        record_future = self.pool.submit(self._create_record, fields)
+        guid = self.create_native_task(task_name, due_ts, owner_ids) if create_native else None
+        record_id = record_future.result()
+        if record_id and guid:
+            self._store_guids([(record_id, guid)])
+
+        msg = f"✅ 任务已建\n📌 {task_name}\n🎯 {quadrant}" if record_id else f"❌ 多维表格写入失败\n📌 {task_name}"
         if create_native:
-            msg += f"\n{self.create_native_task(task_name, due_ts, owner_ids)}"
+            msg += "\n(原生任务✅)" if guid is not None else "\n(原生任务❌)"
         return msg
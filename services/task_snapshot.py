@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+DAY_MS = 86400 * 1000
+
+
+class TaskSnapshot:
+    """
+    Local SQLite copy of the task table for reports (周报/统计).
+
+    Fed incrementally as a TaskIndex listener: changes are buffered and
+    written in one transaction before each query (or every `flush_every`
+    changes), so a full index reload costs one commit, not thousands.
+    Owners live in their own table so per-owner counts are a plain GROUP BY.
+    """
+
+    def __init__(self, path="data/task_snapshot.db", flush_every=500):
+        self.path = path
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.pending = {}  # record_id -> AppTableRecord, or None for deletions
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                record_id TEXT PRIMARY KEY,
+                name TEXT,
+                quadrant TEXT,
+                status TEXT,
+                due INTEGER,
+                created_at INTEGER,
+                completed_at INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS task_owners (
+                record_id TEXT NOT NULL,
+                owner_id TEXT NOT NULL,
+                owner_name TEXT,
+                PRIMARY KEY (record_id, owner_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+            CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks (due);
+            CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed_at);
+            CREATE INDEX IF NOT EXISTS idx_owners_owner ON task_owners (owner_id);
+        """)
+        self.conn.commit()
+
+    # --- Maintenance ---
+
+    def on_task_changed(self, record_id, record):
+        """TaskIndex listener; record is None when the task was deleted."""
+        with self.lock:
+            self.pending[record_id] = record
+            full = len(self.pending) >= self.flush_every
+        if full:
+            self.flush()
+
+    def load(self, records):
+        """Replace the snapshot with a full set of records (used without a TaskIndex)."""
+        records = list(records)
+        with self.lock:
+            self.conn.execute("DELETE FROM task_owners")
+            self.conn.execute("DELETE FROM tasks")
+            self.pending = {r.record_id: r for r in records}
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.pending: return
+            pending, self.pending = self.pending, {}
+            ids = [(rid,) for rid in pending]
+            # Write-through records carry no automatic fields: keep what we already know
+            known = {rid: (created, completed) for rid, created, completed in self.conn.execute(
+                "SELECT record_id, created_at, completed_at FROM tasks WHERE record_id IN (SELECT value FROM json_each(?))",
+                (_json_list(pending),)
+            )}
+
+            rows, owners = [], []
+            now = int(time.time() * 1000)
+            for rid, record in pending.items():
+                if record is None: continue
+                f = record.fields or {}
+                status = f.get("状态") or "待办"
+                created_before, completed_before = known.get(rid, (None, None))
+                created = getattr(record, "created_time", None) or created_before or now
+                completed = None
+                if status == "已完成":
+                    # First time it was seen completed
+                    completed = completed_before or getattr(record, "last_modified_time", None) or now
+                rows.append((rid, _text(f.get("任务描述")), f.get("四象限"), status, f.get("截止日期"), created, completed))
+                for o in f.get("负责人") or []:
+                    if isinstance(o, dict) and o.get("id"):
+                        owners.append((rid, o["id"], o.get("name") or o["id"]))
+
+            self.conn.executemany("DELETE FROM tasks WHERE record_id = ?", ids)
+            self.conn.executemany("DELETE FROM task_owners WHERE record_id = ?", ids)
+            self.conn.executemany("INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.executemany("INSERT OR REPLACE INTO task_owners VALUES (?, ?, ?)", owners)
+            self.conn.commit()
+        logging.debug(f"📊 Task snapshot flushed {len(pending)} changes")
+
+    # --- Queries ---
+
+    def _query(self, sql, params=()):
+        self.flush()
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def counts(self, by):
+        """{value: (total, open)} grouped by "owner", "quadrant" or "status"."""
+        if by == "owner":
+            sql = """SELECT MAX(o.owner_name), COUNT(*), SUM(t.status != '已完成')
+                     FROM task_owners o JOIN tasks t USING (record_id) GROUP BY o.owner_id ORDER BY COUNT(*) DESC"""
+        elif by in ("quadrant", "status"):
+            sql = f"SELECT {by}, COUNT(*), SUM(status != '已完成') FROM tasks GROUP BY {by} ORDER BY COUNT(*) DESC"
+        else:
+            raise ValueError(f"Unknown grouping: {by}")
+        return {k or "未设置": (total, open_ or 0) for k, total, open_ in self._query(sql)}
+
+    def overdue(self, now_ms=None, limit=50):
+        """Open tasks past their due date, most overdue first: [(name, due_ms, owners)]."""
+        now_ms = now_ms or int(time.time() * 1000)
+        return self._query("""
+            SELECT t.name, t.due, GROUP_CONCAT(o.owner_name, '、')
+            FROM tasks t LEFT JOIN task_owners o USING (record_id)
+            WHERE t.status != '已完成' AND t.due IS NOT NULL AND t.due < ?
+            GROUP BY t.record_id ORDER BY t.due LIMIT ?
+        """, (now_ms, limit))
+
+    def overdue_count(self, now_ms=None):
+        now_ms = now_ms or int(time.time() * 1000)
+        (count,), = self._query(
+            "SELECT COUNT(*) FROM tasks WHERE status != '已完成' AND due IS NOT NULL AND due < ?", (now_ms,))
+        return count
+
+    def throughput(self, weeks=8, now=None):
+        """Created and completed counts per week, oldest first: [(week_start, created, completed)]."""
+        now = now or datetime.now()
+        week_start = datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+        starts = [week_start - timedelta(weeks=i) for i in range(weeks - 1, -1, -1)]
+        bounds = [int(s.timestamp() * 1000) for s in starts] + [int((week_start + timedelta(weeks=1)).timestamp() * 1000)]
+        result = []
+        for i, start in enumerate(starts):
+            lo, hi = bounds[i], bounds[i + 1]
+            (created,), = self._query("SELECT COUNT(*) FROM tasks WHERE created_at >= ? AND created_at < ?", (lo, hi))
+            (completed,), = self._query("SELECT COUNT(*) FROM tasks WHERE completed_at >= ? AND completed_at < ?", (lo, hi))
+            result.append((start.strftime("%m-%d"), created, completed))
+        return result
+
+    def completed_between(self, start_ms, end_ms):
+        return [r[0] for r in self._query(
+            "SELECT name FROM tasks WHERE completed_at >= ? AND completed_at < ? ORDER BY completed_at", (start_ms, end_ms)
+        )]
+
+    # --- Reports ---
+
+    def stats_text(self):
+        lines = ["📊 **任务统计** (总数/未完成)"]
+        for title, by in [("👤 负责人", "owner"), ("🎯 四象限", "quadrant"), ("📌 状态", "status")]:
+            counts = self.counts(by)
+            lines.append(f"\n{title}:")
+            lines.extend(f"- {k}: {total}/{open_}" for k, (total, open_) in counts.items())
+        now_ms = int(time.time() * 1000)
+        overdue = self.overdue(now_ms, limit=10)
+        if overdue:
+            total = self.overdue_count(now_ms)
+            lines.append(f"\n⚠️ 已逾期 ({total}):")
+            lines.extend(f"- {name} ({_date(due)}, {owners or '-'})" for name, due, owners in overdue)
+            if total > len(overdue):
+                lines.append(f"- …另有 {total - len(overdue)} 个")
+        return "\n".join(lines)
+
+    def weekly_report_markdown(self, now=None):
+        now = now or datetime.now()
+        week_start = datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+        lo = int(week_start.timestamp() * 1000)
+        hi = lo + 7 * DAY_MS
+
+        md = [f"# 任务周报 {week_start.strftime('%Y-%m-%d')} ~ {(week_start + timedelta(days=6)).strftime('%Y-%m-%d')}", ""]
+        done = self.completed_between(lo, hi)
+        md += [f"## ✅ 本周完成 ({len(done)})", ""] + [f"- {n}" for n in done] + [""]
+
+        md += ["## 👤 负责人", "", "| 负责人 | 总数 | 未完成 |", "| --- | --- | --- |"]
+        md += [f"| {k} | {t} | {o} |" for k, (t, o) in self.counts("owner").items()] + [""]
+        md += ["## 🎯 四象限", "", "| 四象限 | 总数 | 未完成 |", "| --- | --- | --- |"]
+        md += [f"| {k} | {t} | {o} |" for k, (t, o) in self.counts("quadrant").items()] + [""]
+
+        now_ms = int(now.timestamp() * 1000)
+        overdue, total = self.overdue(now_ms), self.overdue_count(now_ms)
+        md += [f"## ⚠️ 已逾期 ({total})", ""]
+        md += [f"- {name}（截止 {_date(due)}，{owners or '-'}）" for name, due, owners in overdue]
+        if total > len(overdue):
+            md.append(f"- …另有 {total - len(overdue)} 个（仅列出最早逾期的 {len(overdue)} 个）")
+        md.append("")
+
+        md += ["## 📈 近 8 周吞吐", "", "| 周 | 新建 | 完成 |", "| --- | --- | --- |"]
+        md += [f"| {w} | {c} | {d} |" for w, c, d in self.throughput(8, now)]
+        return "\n".join(md)
+
+
+def _text(value):
+    if isinstance(value, list):
+        return "".join(item.get("text", "") for item in value if isinstance(item, dict))
+    return value or ""
+
+
+def _date(ms):
+    return datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d") if ms else "-"
+
+
+def _json_list(values):
+    return json.dumps(list(values))
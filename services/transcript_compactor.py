@@ -0,0 +1,100 @@
+import logging
+import re
+
+_LINE_RE = re.compile(r"^\[(\d+):(\d{2})(?::(\d{2}))?\]\s*(?:(?P<speaker>[^\s:：\[\]]{1,20})[:：]\s*)?(?P<content>.*)$")
+
+# Pure fillers: dropped wherever they stand alone between punctuation/spaces
+FILLERS = ["嗯", "啊", "呃", "额", "哦", "唔", "诶", "um", "umm", "uh", "uhh", "erm", "hmm", "ah", "er"]
+# Discourse fillers: only dropped at the start of a phrase, where they carry no meaning
+# (not 这个/那个: they are demonstratives, "这个方案不行" must keep them)
+LEADING_FILLERS = ["就是说", "就是", "然后呢", "然后", "对对对", "对对", "you know", "i mean", "so yeah", "like"]
+
+_PUNCT = r"[，。！？、,.!?;；\s]"
+
+
+class TranscriptCompactor:
+    """
+    Shrinks a `[mm:ss] speaker: content` transcript before it goes to the LLM:
+    merges consecutive lines of the same speaker, coarsens timestamps to
+    `granularity` seconds, strips filler words and collapses exact repeats.
+    """
+
+    def __init__(self, granularity=30, fillers=None, leading_fillers=None):
+        self.granularity = max(1, int(granularity))
+        fillers = fillers or FILLERS
+        leading = leading_fillers or LEADING_FILLERS
+        words = "|".join(re.escape(f) + "+" if len(f) == 1 else re.escape(f) for f in sorted(fillers, key=len, reverse=True))
+        self._filler_re = re.compile(rf"(?:(?<={_PUNCT})|^)(?:{words})(?={_PUNCT}|$){_PUNCT}*", re.IGNORECASE)
+        lead = "|".join(re.escape(f) for f in sorted(leading, key=len, reverse=True))
+        self._leading_re = re.compile(rf"(?:(?<=[，。！？,.!?;；])|^)\s*(?:(?:{lead})(?![A-Za-z]){_PUNCT}*)+", re.IGNORECASE)
+        self._stutter_re = re.compile(r"([\u4e00-\u9fff]{1,2})\1{2,}")
+
+    def clean(self, content):
+        content = self._filler_re.sub("", content)
+        content = self._leading_re.sub("", content)
+        content = self._stutter_re.sub(r"\1", content)
+        content = re.sub(r"([，。！？,.!?])[，,\s]*(?=[，。！？,.!?])", "", content)
+        return content.strip(" ，,")
+
+    def compact(self, text):
+        """text: a string or a stream of lines. Returns (compacted_text, stats)."""
+        if not text:
+            return text, {"original_chars": 0, "compacted_chars": 0, "ratio": 1.0}
+        lines = text.split("\n") if isinstance(text, str) else text
+        original_chars = 0
+
+        out_lines = []
+        group = None  # [bucket_seconds, speaker, [contents]]
+        last_content = None
+
+        def flush():
+            if group and group[2]:
+                out_lines.append(self._format_line(*group))
+
+        for line in lines:
+            original_chars += len(line) + 1
+            m = _LINE_RE.match(line.strip())
+            if not m:
+                # Untimed text (plain-text fallback): keep, cleaned
+                cleaned = self.clean(line)
+                if cleaned and cleaned != last_content:
+                    flush()
+                    group = None
+                    out_lines.append(cleaned)
+                    last_content = cleaned
+                continue
+
+            parts = [int(p) for p in m.groups()[:3] if p is not None]
+            seconds = 0
+            for p in parts:
+                seconds = seconds * 60 + p
+            bucket = seconds - seconds % self.granularity
+            speaker = m.group("speaker")
+            content = self.clean(m.group("content"))
+            if not content or content == last_content:
+                continue  # Filler-only or exact repeat
+            last_content = content
+
+            if group and group[1] == speaker and group[0] == bucket:
+                group[2].append(content)
+            else:
+                flush()
+                group = [bucket, speaker, [content]]
+        flush()
+
+        compacted = "\n".join(out_lines)
+        original_chars = max(original_chars - 1, 0)  # No newline after the last line
+        stats = {
+            "original_chars": original_chars,
+            "compacted_chars": len(compacted),
+            "ratio": round(len(compacted) / original_chars, 3) if original_chars else 1.0,
+        }
+        logging.info(f"🗜️ Transcript compacted: {stats['original_chars']} -> {stats['compacted_chars']} chars (ratio {stats['ratio']})")
+        return compacted, stats
+
+    def _format_line(self, seconds, speaker, contents):
+        m, s = divmod(seconds, 60)
+        body = " ".join(contents)
+        if speaker:
+            return f"[{m:02d}:{s:02d}] {speaker}: {body}"
+        return f"[{m:02d}:{s:02d}] {body}"
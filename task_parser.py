@@ -1,6 +1,218 @@
 import re
+import io
+import csv
 import json
-from datetime import datetime
+from datetime import datetime, date
+from utils.date_parser import DateParser, DueDate
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl is optional, only needed for .xlsx imports
+    openpyxl = None
+
+_dates = DateParser()
+
+PRIORITY_MAP = {"高": "High", "中": "Medium", "低": "Low"}
+PRIORITY_LABELS = {v: k for k, v in PRIORITY_MAP.items()}  # -> "优先级" 单选项
+QUADRANTS = ["重要且紧急", "重要不紧急", "紧急不重要", "不重要不紧急"]
+# 四象限关键词，与 LLM prompt 中的规则一致
+QUADRANT_KEYWORDS = [
+    ("重要且紧急", ["紧急", "报错", "马上", "立刻", "线上", "asap", "crash", "bug", "urgent"]),
+    ("重要不紧急", ["方案", "调研", "规划", "复盘", "plan", "review", "research"]),
+    ("紧急不重要", ["发邮件", "开会", "会议", "约", "报销", "email", "meeting", "schedule"]),
+    ("不重要不紧急", ["看看", "文章", "阅读", "read", "article", "check out"]),
+]
+PRIORITY_QUADRANT = {"High": "重要且紧急", "Medium": "重要不紧急", "Low": "不重要不紧急"}
+
+# 列表前缀: "- ", "* ", "• ", "1. ", "2)", "3、", "[ ] "
+_BULLET_RE = re.compile(r"^\s*(?:[-*•·]\s*|\d{1,4}(?:[.)]\s+|、\s*)|\[\s?\]\s*)")
+_AT_RE = re.compile(r"@(\S+)")
+
+# 表格列名 -> 字段
+COLUMN_ALIASES = {
+    "task_name": ["任务", "任务描述", "任务名", "任务名称", "内容", "task", "title", "name", "summary"],
+    "owners": ["负责人", "执行人", "owner", "owners", "assignee"],
+    "priority": ["优先级", "priority"],
+    "due": ["截止日期", "截止时间", "截止", "due", "due date", "deadline"],
+    "quadrant": ["四象限", "象限", "quadrant"],
+}
+
+
+def guess_quadrant(text, priority=None):
+    """关键词优先，其次按优先级映射，默认 重要不紧急"""
+    lowered = (text or "").lower()
+    for quadrant, keywords in QUADRANT_KEYWORDS:
+        if any(k in lowered for k in keywords):
+            return quadrant
+    return PRIORITY_QUADRANT.get(priority, "重要不紧急")
+
+
+def _due_fields(due):
+    if not due:
+        return None, None
+    return due.when.strftime("%Y-%m-%d %H:%M:%S" if due.has_time else "%Y-%m-%d"), _dates.to_millis(due)
+
+
+def parse_task_line(line, owner_lookup=None, now=None):
+    """
+    解析单行任务，例如 "@张三 修复登录Bug 高 明天下午三点"。
+
+    Args:
+        line (str): 一行文本 (可带 "- " / "1. " 等列表前缀)
+        owner_lookup (dict): {"@_user_1" 或 姓名: open_id}
+        now (datetime): 相对日期的基准时间
+
+    Returns:
+        dict: task_name, owners, unknown_owners, priority, quadrant, due_date, due_ts；空行返回 None
+    """
+    owner_lookup = owner_lookup or {}
+    text = _BULLET_RE.sub("", line).strip()
+    if not text:
+        return None
+
+    # 1. 负责人: 飞书 @ 占位符 (@_user_1) 或纯文本 @姓名
+    owners, unknown = [], []
+
+    def _owner(match):
+        token = match.group(0)
+        open_id = owner_lookup.get(token) or owner_lookup.get(match.group(1))
+        if open_id:
+            if open_id not in owners: owners.append(open_id)
+        else:
+            unknown.append(match.group(1))
+        return " "
+
+    text = _AT_RE.sub(_owner, text)
+
+    # 2. 优先级 / 四象限 关键词 (独立的词)
+    priority, quadrant, tokens = None, None, []
+    for token in text.split():
+        if token in PRIORITY_MAP:
+            priority = PRIORITY_MAP[token]
+        elif token in QUADRANTS:
+            quadrant = token
+        else:
+            tokens.append(token)
+
+    # 3. 日期
+    due, rest = _dates.extract(" ".join(tokens), now, strict=True)
+    task_name = rest if due else " ".join(tokens)
+    if not task_name:
+        return None
+
+    due_date, due_ts = _due_fields(due)
+    return {
+        "task_name": task_name,
+        "owners": owners,
+        "unknown_owners": unknown,
+        "priority": priority,
+        "quadrant": quadrant or guess_quadrant(task_name, priority),
+        "due_date": due_date,
+        "due_ts": due_ts,
+    }
+
+
+def parse_task_lines(text, owner_lookup=None, now=None):
+    """多行文本 (每行一个任务) -> [row]，跳过空行"""
+    now = now or _dates.now()
+    rows = []
+    for line in text.splitlines():
+        row = parse_task_line(line, owner_lookup, now)
+        if row:
+            rows.append(row)
+    return rows
+
+
+def read_table(data, file_name):
+    """CSV / XLSX 文件内容 -> 行列表 (每行是单元格列表)"""
+    name = (file_name or "").lower()
+    if name.endswith(".xlsx"):
+        if openpyxl is None:
+            raise ValueError("需要安装 openpyxl 才能导入 .xlsx")
+        wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        try:
+            return [list(r) for r in wb.active.iter_rows(values_only=True)]
+        finally:
+            wb.close()
+    if name.endswith(".csv") or name.endswith(".txt"):
+        for encoding in ("utf-8-sig", "gb18030"):
+            try:
+                text = data.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise ValueError("无法识别文件编码")
+        return list(csv.reader(io.StringIO(text)))
+    raise ValueError(f"不支持的文件类型: {file_name}")
+
+
+def _header_columns(header):
+    columns = {}
+    for i, cell in enumerate(header):
+        key = str(cell or "").strip().lower()
+        for field, aliases in COLUMN_ALIASES.items():
+            if key in aliases and field not in columns:
+                columns[field] = i
+    return columns if "task_name" in columns else None
+
+
+def _cell_due(value, now):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return DueDate(value, bool(value.hour or value.minute), [])
+    if isinstance(value, date):
+        return DueDate(datetime(value.year, value.month, value.day), False, [])
+    return _dates.parse(str(value), now)
+
+
+def parse_task_table(rows, owner_lookup=None, now=None):
+    """
+    表格行 -> [row]。首行若是表头 (任务/负责人/优先级/截止日期/四象限) 则按列解析，
+    否则每行各单元格拼成一行文本，按 parse_task_line 解析。
+    """
+    owner_lookup = owner_lookup or {}
+    now = now or _dates.now()
+    if not rows:
+        return []
+    columns = _header_columns(rows[0])
+    if not columns:
+        return parse_task_lines("\n".join(" ".join(str(c) for c in r if c not in (None, "")) for r in rows),
+                                owner_lookup, now)
+
+    def cell(r, field):
+        i = columns.get(field)
+        return r[i] if i is not None and i < len(r) else None
+
+    result = []
+    for r in rows[1:]:
+        task_name = str(cell(r, "task_name") or "").strip()
+        if not task_name:
+            continue
+        owners, unknown = [], []
+        for name in re.split(r"[,，、;；\s]+", str(cell(r, "owners") or "")):
+            name = name.lstrip("@")
+            if not name: continue
+            open_id = owner_lookup.get(name)
+            if open_id:
+                if open_id not in owners: owners.append(open_id)
+            else:
+                unknown.append(name)
+        value = str(cell(r, "priority") or "").strip()
+        priority = PRIORITY_MAP.get(value) or (value.capitalize() if value.capitalize() in PRIORITY_QUADRANT else None)
+        quadrant = str(cell(r, "quadrant") or "").strip()
+        due_date, due_ts = _due_fields(_cell_due(cell(r, "due"), now))
+        result.append({
+            "task_name": task_name,
+            "owners": owners,
+            "unknown_owners": unknown,
+            "priority": priority,
+            "quadrant": quadrant if quadrant in QUADRANTS else guess_quadrant(task_name, priority),
+            "due_date": due_date,
+            "due_ts": due_ts,
+        })
+    return result
 
 def parse_task_command(event_data):
     """
@@ -54,7 +266,7 @@ def parse_task_command(event_data):
             clean_text = clean_text.replace(key, "").strip()
 
     # 4. 提取优先级 (高/中/低)
-    priority_map = {"高": "High", "中": "Medium", "低": "Low"}
+    priority_map = PRIORITY_MAP
     found_priority = None
     
     # 简单的关键词匹配，从后往前找，避免任务名里包含字
@@ -65,16 +277,14 @@ def parse_task_command(event_data):
     for token in tokens:
         if token in priority_map:
             parsed_data["priority"] = priority_map[token]
-        elif re.match(r"^\d{4}-\d{1,2}-\d{1,2}$", token):
-            # 5. 提取日期 (YYYY-MM-DD)
-            # 简单校验日期合法性
-            try:
-                datetime.strptime(token, "%Y-%m-%d")
-                parsed_data["due_date"] = token # 飞书多维表格通常接受毫秒时间戳或标准字符串
-            except ValueError:
-                remaining_tokens.append(token)
         else:
             remaining_tokens.append(token)
+
+    # 5. 提取日期: 绝对日期 (YYYY-MM-DD) 与相对时间 ("明天下午三点", "下周五", "月底前", "tomorrow 3pm")
+    due, rest = _dates.extract(" ".join(remaining_tokens), strict=True)
+    if due:
+        parsed_data["due_date"] = due.when.strftime("%Y-%m-%d %H:%M:%S" if due.has_time else "%Y-%m-%d")
+        remaining_tokens = rest.split()
             
     # 6. 剩余部分作为任务名
     parsed_data["task_name"] = " ".join(remaining_tokens)
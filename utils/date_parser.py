@@ -0,0 +1,406 @@
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+# when: naive local datetime; has_time: False for date-only expressions;
+# spans: [(start, end)] of the matched text, for removing it from a task name
+DueDate = namedtuple("DueDate", ["when", "has_time", "spans"])
+
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CN_NUM_CHARS = "".join(_CN_DIGITS) + "十"  # Everything cn_to_int accepts
+_CN_NUM = rf"(?:\d{{1,2}}|[{_CN_NUM_CHARS}]{{1,3}})"
+# Strict mode: what may surround a number-led or bare-weekday date inside a task name
+_DELIMITERS = " \t\n,，。.:：;；!！?？()（）、-~"
+_BARE_WEEKDAY_RE = re.compile(r"(?:周|星期|礼拜)[一二三四五六日天1-7]")
+_WEEKDAYS = {"一": 0, "1": 0, "二": 1, "2": 1, "三": 2, "3": 2, "四": 3, "4": 3, "五": 4, "5": 4,
+             "六": 5, "6": 5, "日": 6, "天": 6, "7": 6}
+_EN_WEEKDAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+_EN_MONTHS = {"jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+              "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12}
+# Default hour for a period of the day given without a clock time
+_PERIOD_HOURS = {"凌晨": 6, "早上": 9, "早晨": 9, "上午": 10, "中午": 12, "下午": 15, "傍晚": 18,
+                 "晚上": 20, "夜里": 22, "今晚": 20, "明晚": 20, "今早": 9, "明早": 9, "早": 9, "晚": 20,
+                 "morning": 9, "noon": 12, "afternoon": 15, "evening": 19, "tonight": 20}
+# Word boundaries for English tokens (\b fails between CJK and ASCII, e.g. "明天3pm")
+_B = r"(?<![A-Za-z0-9])"
+_E = r"(?![A-Za-z0-9])"
+_EN_WD = r"(?P<wd>mon(?:day)?|tue(?:s(?:day)?)?|wed(?:nesday)?|thu(?:rs(?:day)?)?|fri(?:day)?|saturday|sunday)"
+_PM_PERIODS = {"下午", "傍晚", "晚上", "夜里", "今晚", "明晚", "晚", "afternoon", "evening", "tonight"}
+
+
+def cn_to_int(text):
+    """Parse Arabic or Chinese numerals up to 99 (e.g. "12", "十二", "二十三", "两")."""
+    if text.isdigit():
+        return int(text)
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        return (_CN_DIGITS.get(tens, 1) if tens else 1) * 10 + (_CN_DIGITS.get(ones, 0) if ones else 0)
+    value = 0
+    for ch in text:
+        if ch not in _CN_DIGITS:
+            return None
+        value = value * 10 + _CN_DIGITS[ch]
+    return value
+
+
+def _month_end(year, month):
+    first_next = datetime(year + month // 12, month % 12 + 1, 1)
+    return first_next - timedelta(days=1)
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, _month_end(year, month).day))
+
+
+class DateParser:
+    """
+    Rule-based parser for due dates in Chinese and English task messages
+    ("明天下午三点", "下周五", "月底前", "tomorrow 3pm", "in 2 days", "2025-12-31").
+
+    Dates are resolved against `now` in the configured timezone; the result is
+    a naive local datetime. Expressions without a day refer to today, or to
+    the next occurrence if that time has already passed.
+    """
+
+    def __init__(self, timezone=None):
+        self.tz = ZoneInfo(timezone) if timezone and ZoneInfo else None
+        n = _CN_NUM
+        # Day expressions, tried in order; each maps a match to a date (midnight)
+        # Not "一定/一起..." and not the hour of "周三点" / "周1 10:30"-style clock times
+        wd = r"(?P<wd>[一二三四五六日天](?![定起直样切共般些点时])|[1-7](?![0-9:：点时]))"
+        self._day_rules = [
+            (re.compile(r"(?P<y>\d{4})[-/.年](?P<m>\d{1,2})[-/.月](?P<d>\d{1,2})[日号]?"), self._absolute),
+            (re.compile(rf"(?:(?P<y>\d{{4}})年)?(?P<m>{n})月(?P<d>{n})[日号]?"), self._absolute),
+            (re.compile(rf"(?P<rel>下下|下|这|本|上)?个?(?:周|星期|礼拜){wd}"), self._cn_weekday),
+            (re.compile(r"(?P<rel>下下|下|这|本)个?(?:周|星期|礼拜)末"), self._cn_weekend),
+            (re.compile(r"(?<![下这本])(?:周|星期|礼拜)末"), self._cn_weekend),
+            (re.compile(rf"(?P<n>{n}|半|几)个?(?P<unit>天|日|周|星期|礼拜|月)(?:之?后|以后)"), self._cn_offset),
+            (re.compile(r"(?P<rel>下个?|本|这个?)?(?:月底|月末)"), self._cn_month_end),
+            (re.compile(r"(?P<rel>下个?)月初"), self._cn_month_start),
+            (re.compile(rf"(?P<rel>下个?|本|这个?)月(?P<d>{n})[日号]"), self._cn_month_day),
+            (re.compile(r"(?P<rel>下个?)(?:周|星期|礼拜)(?!末)"), self._cn_next_week),
+            (re.compile(r"(?P<rel>下个?)月(?![初底末])"), self._cn_next_month),
+            (re.compile(r"年底|年末"), lambda m, now: datetime(now.year, 12, 31)),
+            (re.compile(r"大后天"), lambda m, now: self._today(now) + timedelta(days=3)),
+            (re.compile(r"后天"), lambda m, now: self._today(now) + timedelta(days=2)),
+            (re.compile(r"明天|明日|明早|明晚"), lambda m, now: self._today(now) + timedelta(days=1)),
+            (re.compile(r"今天|今日|今早|今晚|今儿"), lambda m, now: self._today(now)),
+            (re.compile(rf"(?<![月0-9零〇一二两三四五六七八九十])(?P<d>{n})[号]"), self._cn_day_of_month),
+            # English
+            (re.compile(_B + r"(?P<m>\d{1,2})/(?P<d>\d{1,2})(?![/0-9])"), self._absolute),
+            (re.compile(_B + r"(?P<mon>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(?P<d>\d{1,2})(?:st|nd|rd|th)?(?![:0-9])" + _E, re.I), self._en_month_day),
+            (re.compile(_B + r"(?P<d>\d{1,2})(?:st|nd|rd|th)?\s+(?P<mon>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*" + _E, re.I), self._en_month_day),
+            (re.compile(_B + r"(?:the\s+)?day\s+after\s+tomorrow" + _E, re.I), lambda m, now: self._today(now) + timedelta(days=2)),
+            (re.compile(_B + r"(?:tomorrow|tmr)" + _E, re.I), lambda m, now: self._today(now) + timedelta(days=1)),
+            (re.compile(_B + r"(?:today|tonight|eod)" + _E, re.I), lambda m, now: self._today(now)),
+            (re.compile(_B + r"in\s+(?P<n>\d+|a|an|one|two|three)\s+(?P<unit>day|week|month)s?" + _E, re.I), self._en_offset),
+            (re.compile(_B + r"(?:end\s+of\s+(?:the\s+)?(?P<rel>next\s+)?month|eom)" + _E, re.I), self._en_month_end),
+            (re.compile(_B + r"(?:end\s+of\s+(?:the\s+)?week|eow)" + _E, re.I), self._en_week_end),
+            (re.compile(_B + r"next\s+week" + _E, re.I), lambda m, now: self._today(now) + timedelta(days=7 - now.weekday())),
+            (re.compile(_B + r"next\s+month" + _E, re.I), lambda m, now: _add_months(self._today(now).replace(day=1), 1)),
+            (re.compile(_B + r"(?:(?P<rel>next|this)\s+)?" + _EN_WD + _E, re.I), self._en_weekday),
+        ]
+        # Relative times ("半小时后", "in 2 hours") set day and time at once
+        self._relative_time = [
+            re.compile(rf"(?P<n>{n}|半|一个半)个?(?P<unit>小时|钟头|分钟|分)(?:之?后|以后)"),
+            re.compile(_B + r"in\s+(?P<n>\d+|an|a|half\s+an)\s+(?P<unit>hour|hr|minute|min)s?" + _E, re.I),
+        ]
+        self._time_rules = [
+            re.compile(rf"(?P<p>凌晨|早上|早晨|上午|中午|下午|傍晚|晚上|夜里|今晚|明晚|今早|明早|早|晚)?\s*(?<![0-9.])(?P<h>\d{{1,2}})[:：](?P<mi>\d{{2}})(?![0-9])(?:\s*(?P<ampm>am|pm|a\.m\.|p\.m\.))?", re.I),
+            re.compile(rf"(?P<p>凌晨|早上|早晨|上午|中午|下午|傍晚|晚上|夜里|今晚|明晚|今早|明早|早|晚)?\s*(?P<h>{n})[点时](?:(?P<half>半)|(?P<q>一刻|三刻)|(?P<mi>{n})分?)?(?:钟)?"),
+            re.compile(_B + r"(?:at\s+)?(?P<h>\d{1,2})(?::(?P<mi>\d{2}))?\s*(?P<ampm>am|pm|a\.m\.|p\.m\.)", re.I),
+            re.compile(r"(?P<p>凌晨|早上|早晨|上午|中午|下午|傍晚|晚上|夜里|今晚|明晚|今早|明早)|" + _B + r"(?P<ep>morning|noon|afternoon|evening|tonight)" + _E, re.I),
+        ]
+
+    # --- Public API ---
+
+    def now(self):
+        return datetime.now(self.tz).replace(tzinfo=None) if self.tz else datetime.now()
+
+    def parse(self, text, now=None):
+        """Find the due date in text. Returns a DueDate, or None."""
+        if not text:
+            return None
+        now = now or self.now()
+
+        for rule in self._relative_time:
+            m = rule.search(text)
+            if m:
+                when = self._apply_relative_time(m, now)
+                if when:
+                    return DueDate(when.replace(second=0, microsecond=0), True, [m.span()])
+
+        day, day_span = None, None
+        for rule, resolve in self._day_rules:
+            m = rule.search(text)
+            if m:
+                day = resolve(m, now)
+                if day:
+                    day_span = m.span()
+                    break
+
+        clock, period, time_span = self._parse_time(text, day_span)
+        if day is None and clock is None:
+            return None
+
+        spans = [s for s in (day_span, time_span) if s]
+        if clock is None:
+            return DueDate(day, False, spans)
+
+        hour, minute = clock
+        if day is None:
+            # Time only: today, or the next time that clock time comes round
+            when = now.replace(hour=hour % 24, minute=minute, second=0, microsecond=0)
+            if when <= now and not period and hour < 12 and (when + timedelta(hours=12)).date() == now.date() \
+                    and when + timedelta(hours=12) > now:
+                when += timedelta(hours=12)
+            elif when <= now:
+                when += timedelta(days=1)
+            return DueDate(when, True, spans)
+        return DueDate(day.replace(hour=hour % 24, minute=minute), True, spans)
+
+    def extract(self, text, now=None, strict=False):
+        """
+        Parse and strip the date expression. Returns (DueDate or None, remaining_text).
+        strict: ignore number-led matches glued to surrounding words ("修复3号楼", "写5点建议"),
+        which are more likely part of the task name than a date.
+        """
+        due = self.parse(text, now)
+        if not due:
+            return None, text
+        merged = []
+        for start, end in sorted(due.spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+            else:
+                merged.append((start, end))
+        if strict and not all(self._delimited(text, start, end) for start, end in merged):
+            return None, text
+        remaining = text
+        for start, end in reversed(merged):
+            before, after = remaining[:start], remaining[end:]
+            after = re.sub(r"^\s*(?:之前|以前|前|before)", "", after, flags=re.I)
+            before = re.sub(r"(?:\b(?:by|before|on|at|due)\s*|在|于)$", "", before, flags=re.I)
+            remaining = before + after
+        remaining = re.sub(r"\s{2,}", " ", remaining).strip(" ，,。:：")
+        return due, remaining
+
+    @staticmethod
+    def _delimited(text, start, end):
+        left_ok = start == 0 or text[start - 1] in _DELIMITERS or re.search(r"(?:在|于|by |before |on |at |due )$", text[:start], re.I)
+        # A bare weekday glued to the previous word is part of the name ("修复周五发现的bug")
+        if _BARE_WEEKDAY_RE.match(text, start):
+            return bool(left_ok or text[start - 1] == "下")
+        if not (text[start].isdigit() or text[start] in _CN_NUM_CHARS):
+            return True
+        right_ok = end == len(text) or text[end] in _DELIMITERS or re.match(r"(?:之前|以前|前)", text[end:])
+        return bool(left_ok and right_ok)
+
+    def to_millis(self, due):
+        """Epoch milliseconds for a DueDate (interpreted in the configured timezone)."""
+        when = due.when.replace(tzinfo=self.tz) if self.tz else due.when
+        return int(when.timestamp() * 1000)
+
+    # --- Day resolvers ---
+
+    @staticmethod
+    def _today(now):
+        return datetime(now.year, now.month, now.day)
+
+    def _absolute(self, m, now):
+        groups = m.groupdict()
+        month, day = cn_to_int(groups["m"]), cn_to_int(groups["d"])
+        year = int(groups["y"]) if groups.get("y") else now.year
+        try:
+            result = datetime(year, month, day)
+        except (TypeError, ValueError):
+            return None
+        if not groups.get("y") and result < self._today(now):
+            result = result.replace(year=year + 1)  # "3月1日" said in December: next year
+        return result
+
+    def _cn_weekday(self, m, now):
+        target = _WEEKDAYS[m.group("wd")]
+        today = self._today(now)
+        monday = today - timedelta(days=now.weekday())
+        rel = m.group("rel")
+        if rel == "下":
+            return monday + timedelta(days=7 + target)
+        if rel == "下下":
+            return monday + timedelta(days=14 + target)
+        if rel == "上":
+            return monday + timedelta(days=target - 7)
+        if rel in ("这", "本"):
+            return monday + timedelta(days=target)
+        # Bare "周五": the coming one (today counts)
+        return today + timedelta(days=(target - now.weekday()) % 7)
+
+    def _cn_weekend(self, m, now):
+        monday = self._today(now) - timedelta(days=now.weekday())
+        rel = m.groupdict().get("rel")
+        weeks = {"下": 1, "下下": 2}.get(rel, 0)
+        return monday + timedelta(days=7 * weeks + 5)
+
+    def _cn_offset(self, m, now):
+        raw = m.group("n")
+        count = 0.5 if raw == "半" else 3 if raw == "几" else cn_to_int(raw)
+        if count is None:
+            return None
+        unit = m.group("unit")
+        today = self._today(now)
+        if unit in ("天", "日"):
+            return today + timedelta(days=int(count))
+        if unit == "月":
+            return today + timedelta(days=15) if count == 0.5 else _add_months(today, int(count))
+        return today + timedelta(days=int(count * 7))
+
+    def _cn_month_end(self, m, now):
+        months = 1 if (m.group("rel") or "").startswith("下") else 0
+        first = _add_months(self._today(now).replace(day=1), months)
+        return _month_end(first.year, first.month)
+
+    def _cn_month_start(self, m, now):
+        return _add_months(self._today(now).replace(day=1), 1)
+
+    def _cn_month_day(self, m, now):
+        months = 1 if m.group("rel").startswith("下") else 0
+        first = _add_months(self._today(now).replace(day=1), months)
+        try:
+            return first.replace(day=cn_to_int(m.group("d")))
+        except (TypeError, ValueError):
+            return None
+
+    def _cn_next_week(self, m, now):
+        return self._today(now) + timedelta(days=7 - now.weekday())  # Next Monday
+
+    def _cn_next_month(self, m, now):
+        return _add_months(self._today(now).replace(day=1), 1)
+
+    def _cn_day_of_month(self, m, now):
+        day = cn_to_int(m.group("d"))
+        today = self._today(now)
+        try:
+            result = today.replace(day=day)
+        except (TypeError, ValueError):
+            return None
+        if result < today:
+            try:
+                result = _add_months(today.replace(day=1), 1).replace(day=day)
+            except ValueError:
+                return None
+        return result
+
+    def _en_month_day(self, m, now):
+        month = _EN_MONTHS[m.group("mon").lower()[:3]]
+        try:
+            result = datetime(now.year, month, int(m.group("d")))
+        except ValueError:
+            return None
+        return result if result >= self._today(now) else result.replace(year=now.year + 1)
+
+    def _en_weekday(self, m, now):
+        target = _EN_WEEKDAYS[m.group("wd").lower()[:3]]
+        today = self._today(now)
+        rel = (m.group("rel") or "").lower()
+        if rel == "next":
+            return today - timedelta(days=now.weekday()) + timedelta(days=7 + target)
+        if rel == "this":
+            return today - timedelta(days=now.weekday()) + timedelta(days=target)
+        return today + timedelta(days=(target - now.weekday()) % 7)
+
+    def _en_offset(self, m, now):
+        raw = m.group("n").lower()
+        count = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3}.get(raw) or int(raw)
+        unit = m.group("unit").lower()
+        today = self._today(now)
+        if unit == "day":
+            return today + timedelta(days=count)
+        if unit == "week":
+            return today + timedelta(weeks=count)
+        return _add_months(today, count)
+
+    def _en_week_end(self, m, now):
+        return self._today(now) + timedelta(days=max(4 - now.weekday(), 0) if now.weekday() <= 4 else 6 - now.weekday())
+
+    def _en_month_end(self, m, now):
+        months = 1 if m.groupdict().get("rel") else 0
+        first = _add_months(self._today(now).replace(day=1), months)
+        return _month_end(first.year, first.month)
+
+    # --- Times ---
+
+    def _apply_relative_time(self, m, now):
+        raw = m.group("n").lower()
+        unit = m.group("unit").lower()
+        if raw == "半" or raw.startswith("half"):
+            count = 0.5
+        elif raw == "一个半":
+            count = 1.5
+        elif raw in ("a", "an"):
+            count = 1
+        else:
+            count = cn_to_int(raw)
+        if count is None:
+            return None
+        if unit in ("小时", "钟头", "hour", "hr"):
+            return now + timedelta(hours=count)
+        return now + timedelta(minutes=count)
+
+    def _parse_time(self, text, day_span):
+        """Returns ((hour, minute) or None, period, span)."""
+        # Blank out the day expression so its numerals ("周五", "12月") can't run into the clock
+        # time ("周五九点"); a day word that implies a period ("明晚") still sets the period.
+        day_period = None
+        if day_span:
+            day_text = text[day_span[0]:day_span[1]].lower()
+            day_period = day_text if day_text in _PERIOD_HOURS else None
+            text = text[:day_span[0]] + " " * (day_span[1] - day_span[0]) + text[day_span[1]:]
+
+        for rule in self._time_rules:
+            for m in rule.finditer(text):
+                groups = m.groupdict()
+                period = groups.get("p") or (groups.get("ep") or "").lower() or day_period
+                if groups.get("h") is None:
+                    if not period:
+                        continue
+                    return (_PERIOD_HOURS[period], 0), period, m.span()
+
+                hour = cn_to_int(groups["h"])
+                if hour is None or hour > 24:
+                    continue
+                # "快一点" / "早一点": not a clock time without a stronger cue
+                if groups["h"] == "一" and period in (None, "早", "晚") and not (groups.get("half") or groups.get("q") or groups.get("mi")):
+                    continue
+                minute = 0
+                if groups.get("half"):
+                    minute = 30
+                elif groups.get("q"):
+                    minute = 15 if groups["q"] == "一刻" else 45
+                elif groups.get("mi"):
+                    minute = cn_to_int(groups["mi"])
+                if minute is None or minute > 59:
+                    continue
+
+                ampm = (groups.get("ampm") or "").lower().replace(".", "")
+                if ampm == "pm" and hour < 12:
+                    hour += 12
+                elif ampm == "am" and hour == 12:
+                    hour = 0
+                elif period in _PM_PERIODS and hour < 12:
+                    hour += 12
+                elif period == "中午" and hour < 6:
+                    hour += 12
+                elif period == "凌晨" and hour == 12:
+                    hour = 0
+                return (hour, minute), period, m.span()
+        if day_period:
+            return (_PERIOD_HOURS[day_period], 0), day_period, None
+        return None, None, None
+